@@ -1,7 +1,8 @@
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.responses import HTMLResponse, RedirectResponse
@@ -10,10 +11,21 @@ from uvicorn import run as app_run
 from typing import Optional
 
 from us_visa.constants import APP_HOST, APP_PORT
-from us_visa.pipline.prediction_pipeline import USvisaData, USvisaClassifier
+from us_visa.pipline.prediction_pipeline import InvalidInputError, USvisaData, USvisaClassifier
 from us_visa.pipline.training_pipeline import TrainPipeline
 
-app = FastAPI()
+model_predictor = USvisaClassifier()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # load the model and keep polling the registry without blocking request handling
+    await model_predictor.start()
+    yield
+    await model_predictor.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -77,6 +89,18 @@ async def trainRouteClient():
         return Response(f"Error Occurred! {e}")
 
 
+@app.get("/drift")
+async def driftRouteClient():
+    # drift scores of the prediction inputs against the reference sketch of the served model
+    return model_predictor.drift_monitor.get_report()
+
+
+@app.get("/metrics")
+async def metricsRouteClient():
+    return PlainTextResponse(model_predictor.drift_monitor.get_metrics(),
+                             media_type="text/plain; version=0.0.4")
+
+
 @app.post("/")
 async def predictRouteClient(request: Request):
     try:
@@ -98,9 +122,7 @@ async def predictRouteClient(request: Request):
         
         usvisa_df = usvisa_data.get_usvisa_input_data_frame()
 
-        model_predictor = USvisaClassifier()
-
-        value = model_predictor.predict(dataframe=usvisa_df)[0]
+        value = (await model_predictor.predict_async(dataframe=usvisa_df))[0]
 
         status = None
         if value == 1:
@@ -112,7 +134,10 @@ async def predictRouteClient(request: Request):
             "usvisa.html",
             {"request": request, "context": status},
         )
-        
+
+    except InvalidInputError as e:
+        # values outside the schema domains or ranges are the client's error
+        return JSONResponse({"status": False, "error": f"{e}"}, status_code=422)
     except Exception as e:
         return {"status": False, "error": f"{e}"}
 
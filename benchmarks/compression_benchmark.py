@@ -0,0 +1,94 @@
+"""
+Compares model artifact codecs by size, download time and decode time.
+
+    python benchmarks/compression_benchmark.py --model-path artifact/<timestamp>/model_trainer/trained_model/model.pkl
+    STORAGE_BACKEND=local python benchmarks/compression_benchmark.py --bandwidth-mbps 50 200 1000
+
+Without --model-path a RandomForest is fitted on notebook/Visadataset.csv as a stand-in artifact.
+Every variant is published to the configured storage backend and downloaded again, and the cold start
+time on slower links is modelled from the artifact size for each --bandwidth-mbps value.
+"""
+import argparse
+import io
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from us_visa.cloud_storage.storage_factory import get_storage_service
+from us_visa.constants import MODEL_BUCKET_NAME
+from us_visa.utils.compression import SUPPORTED_CODECS, detect_codec, open_decompressed_reader
+from us_visa.utils.main_utils import load_object, save_object
+
+
+def build_stand_in_model(data_path: str) -> object:
+    import pandas as pd
+    from sklearn.ensemble import RandomForestClassifier
+
+    df = pd.read_csv(data_path)
+    y = (df.pop("case_status") == "Denied").astype(int)
+    x = pd.get_dummies(df.drop(columns=["case_id"]), dtype=float)
+    return RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1).fit(x, y)
+
+
+def decode(data: bytes) -> object:
+    with open_decompressed_reader(io.BytesIO(data), detect_codec(data[:4])) as reader:
+        return pickle.load(reader)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", help="dill/pickle artifact to benchmark")
+    parser.add_argument("--data-path", default=os.path.join("notebook", "Visadataset.csv"))
+    parser.add_argument("--bandwidth-mbps", type=float, nargs="*", default=[100.0, 1000.0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    model = load_object(args.model_path) if args.model_path else build_stand_in_model(args.data_path)
+    storage = get_storage_service()
+
+    codecs = [None]
+    for codec in SUPPORTED_CODECS:
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                save_object(os.path.join(tmp_dir, "probe.pkl"), 0, codec=codec)
+            codecs.append(codec)
+        except Exception:
+            print(f"skipping {codec}: codec library is not installed")
+
+    header = f"{'codec':<8}{'size MB':>10}{'encode s':>10}{'download s':>12}{'decode s':>10}"
+    header += "".join(f"{f'@{bw:g}Mbps s':>14}" for bw in args.bandwidth_mbps)
+    print(header)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for codec in codecs:
+            name = codec or "none"
+            file_path = os.path.join(tmp_dir, f"model.{name}.pkl")
+            start = time.perf_counter()
+            save_object(file_path, model, codec=codec)
+            encode_s = time.perf_counter() - start
+            size = os.path.getsize(file_path)
+
+            key = f"benchmarks/compression/model.{name}.pkl"
+            storage.upload_file(file_path, to_filename=key, bucket_name=MODEL_BUCKET_NAME, remove=False)
+
+            download_s, decode_s = float("inf"), float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                data = storage.read_object_bytes(key, bucket_name=MODEL_BUCKET_NAME)
+                download_s = min(download_s, time.perf_counter() - start)
+                start = time.perf_counter()
+                decode(data)
+                decode_s = min(decode_s, time.perf_counter() - start)
+
+            row = f"{name:<8}{size / 1e6:>10.2f}{encode_s:>10.3f}{download_s:>12.3f}{decode_s:>10.3f}"
+            # modelled cold start on the link: transfer time of the artifact plus decode time
+            row += "".join(f"{size * 8 / (bw * 1e6) + decode_s:>14.3f}" for bw in args.bandwidth_mbps)
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
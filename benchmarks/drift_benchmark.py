@@ -0,0 +1,97 @@
+"""
+Times the drift check of data validation on a scaled copy of the visa data.
+
+    python benchmarks/drift_benchmark.py --scale 10
+
+notebook/Visadataset.csv (or --data-path) is replicated --scale times with unique case_ids, split into a
+reference and a current half and compared with DataValidation.detect_dataset_drift and with the sampled
+check (DataValidation.detect_dataset_drift_sampled). When evidently 0.2.x is installed the evidently
+Profile the drift check used to run is timed on the same frames. --shift multiplies prevailing_wage of
+the current half, to time the sampled check on drifted data.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from us_visa.components.data_validation import DataValidation
+from us_visa.constants import SCHEMA_FILE_PATH
+from us_visa.data_access.feature_store import apply_schema_dtypes
+from us_visa.entity.config_entity import DataValidationConfig
+from us_visa.utils.main_utils import read_yaml_file
+
+
+def build_dataset(data_path: str, scale: int) -> pd.DataFrame:
+    df = pd.read_csv(data_path)
+    copies = []
+    for i in range(scale):
+        copy = df.copy()
+        copy["case_id"] = copy["case_id"].astype(str) + f"-{i}"
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def read_drifted_features(report_file_path: str) -> list:
+    with open(report_file_path) as file:
+        report = json.load(file)
+    return [column for column, feature in report["features"].items() if feature["drift_detected"]]
+
+
+def run_evidently(reference_df: pd.DataFrame, current_df: pd.DataFrame) -> float:
+    from evidently.model_profile import Profile
+    from evidently.model_profile.sections import DataDriftProfileSection
+
+    start = time.perf_counter()
+    profile = Profile(sections=[DataDriftProfileSection()])
+    profile.calculate(reference_df, current_df)
+    profile.json()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-path", default=os.path.join("notebook", "Visadataset.csv"))
+    parser.add_argument("--scale", type=int, default=10, help="number of copies of the dataset")
+    parser.add_argument("--shift", type=float, default=1.0, help="factor applied to prevailing_wage of the current half")
+    args = parser.parse_args()
+
+    schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+    dataset = apply_schema_dtypes(build_dataset(args.data_path, args.scale), schema_config)
+    shuffled = np.random.default_rng(0).permutation(len(dataset))
+    reference_df = dataset.iloc[shuffled[: len(dataset) // 2]].reset_index(drop=True)
+    current_df = dataset.iloc[shuffled[len(dataset) // 2:]].reset_index(drop=True)
+    current_df["prevailing_wage"] = current_df["prevailing_wage"] * args.shift
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config = DataValidationConfig(drift_report_file_path=os.path.join(tmp_dir, "report.json"))
+        data_validation = DataValidation(data_ingestion_artifact=None, data_validation_config=config)
+        start = time.perf_counter()
+        drift_status = data_validation.detect_dataset_drift(reference_df, current_df)
+        native_s = time.perf_counter() - start
+        native_drifted = read_drifted_features(config.drift_report_file_path)
+
+        start = time.perf_counter()
+        sampled_status = data_validation.detect_dataset_drift_sampled(reference_df, current_df)
+        sampled_s = time.perf_counter() - start
+        sampled_drifted = read_drifted_features(config.drift_report_file_path)
+
+    print(f"{len(reference_df)} reference rows, {len(current_df)} current rows")
+    print(f"native drift check {native_s:.3f}s, dataset drift: {drift_status}, drifted features: {native_drifted}")
+    print(f"sampled drift check {sampled_s:.3f}s, dataset drift: {sampled_status}, "
+          f"drifted features: {sampled_drifted}")
+    try:
+        evidently_s = run_evidently(reference_df, current_df)
+        print(f"evidently profile {evidently_s:.3f}s ({native_s / evidently_s:.1%} of it)")
+    except ImportError:
+        print("evidently is not installed, skipping the evidently profile")
+
+
+if __name__ == "__main__":
+    main()
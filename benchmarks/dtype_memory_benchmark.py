@@ -0,0 +1,73 @@
+"""
+Reports the memory of the visa data with the default pandas dtypes and with the schema driven compact dtypes.
+
+    python benchmarks/dtype_memory_benchmark.py --scale 40
+    python benchmarks/dtype_memory_benchmark.py --format parquet --data-path artifact/<timestamp>/data_ingestion/feature_store/usvisa.parquet
+
+notebook/Visadataset.csv (or --data-path) is replicated --scale times with unique case_ids, written as a feature
+store file and loaded once with read_feature_store and once with read_visa_data (category columns, downcast
+numerics, int8 target).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from us_visa.constants import SCHEMA_FILE_PATH
+from us_visa.data_access.feature_store import get_arrow_schema, read_feature_store, read_visa_data, write_feature_store
+from us_visa.utils.main_utils import read_yaml_file
+
+
+def build_dataset(data_path: str, scale: int) -> pd.DataFrame:
+    df = read_feature_store(data_path) if data_path.endswith(".parquet") else pd.read_csv(data_path)
+    copies = []
+    for i in range(scale):
+        copy = df.copy()
+        copy["case_id"] = copy["case_id"].astype(str) + f"-{i}"
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-path", default=os.path.join("notebook", "Visadataset.csv"))
+    parser.add_argument("--scale", type=int, default=20, help="number of copies of the dataset")
+    # csv reproduces the text loads of the stages, parquet already restores categoricals by itself
+    parser.add_argument("--format", choices=["parquet", "csv"], default="csv")
+    args = parser.parse_args()
+
+    schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+    dataset = build_dataset(args.data_path, args.scale)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, f"usvisa.{args.format}")
+        write_feature_store(dataset, file_path, get_arrow_schema(schema_config, columns=list(dataset.columns)))
+        del dataset
+
+        start = time.perf_counter()
+        default_df = read_feature_store(file_path)
+        default_s = time.perf_counter() - start
+        start = time.perf_counter()
+        compact_df = read_visa_data(file_path, schema_config, encode_target=True)
+        compact_s = time.perf_counter() - start
+
+    default_memory = default_df.memory_usage(deep=True, index=False)
+    compact_memory = compact_df.memory_usage(deep=True, index=False)
+
+    print(f"{len(default_df)} rows, {args.format} feature store")
+    print(f"{'column':<24}{'default dtype':>16}{'MB':>10}{'compact dtype':>16}{'MB':>10}")
+    for column in default_df.columns:
+        print(f"{column:<24}{str(default_df[column].dtype):>16}{default_memory[column] / 1e6:>10.2f}"
+              f"{str(compact_df[column].dtype):>16}{compact_memory[column] / 1e6:>10.2f}")
+    print(f"{'total':<24}{'':>16}{default_memory.sum() / 1e6:>10.2f}{'':>16}{compact_memory.sum() / 1e6:>10.2f}")
+    print(f"reduction {1 - compact_memory.sum() / default_memory.sum():.1%}, "
+          f"load time {default_s:.2f}s default, {compact_s:.2f}s compact")
+
+
+if __name__ == "__main__":
+    main()
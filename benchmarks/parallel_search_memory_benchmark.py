@@ -0,0 +1,127 @@
+"""
+Memory of a parallel grid search over in-memory versus memory-mapped training features (Linux only).
+
+    python benchmarks/parallel_search_memory_benchmark.py --rows 1000000 --n-jobs 1 2 4
+
+A C contiguous float32 feature matrix of --rows rows and 24 columns (the width of the transformed visa
+features) and an int8 target are written as .npy files. For every mode and number of workers a fresh
+process loads them, in memory (load_numpy_array_data) or memory-mapped read-only (mmap_mode='r' as
+ModelTrainer does), and runs a RandomForest GridSearchCV. The peak proportional set size (PSS, shared
+pages are split between the processes sharing them) of the process and its joblib workers is sampled
+from /proc. Every worker still materializes its own cross validation folds.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import GridSearchCV
+
+from us_visa.utils.main_utils import load_numpy_array_data, save_numpy_array_data
+
+MODES = ("memory", "mmap")
+NUM_FEATURES = 24
+
+
+def get_pss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as file:
+            return next(int(line.split()[1]) for line in file if line.startswith("Pss:"))
+    except (OSError, StopIteration):
+        return 0
+
+
+def get_process_tree(pid: int) -> list:
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as file:
+                    parents[int(entry)] = int(file.read().rsplit(")", 1)[1].split()[1])
+            except OSError:
+                continue
+    tree, frontier = [pid], [pid]
+    while frontier:
+        children = [child for child, parent in parents.items() if parent in frontier]
+        tree += children
+        frontier = children
+    return tree
+
+
+class PeakPssSampler(threading.Thread):
+    def __init__(self, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            self.peak_kb = max(self.peak_kb, sum(get_pss_kb(pid) for pid in get_process_tree(os.getpid())))
+            time.sleep(self.interval)
+
+    def stop(self) -> int:
+        self._stop_event.set()
+        self.join()
+        return self.peak_kb
+
+
+def run_search(args) -> dict:
+    x_train = load_numpy_array_data(args.features_path, mmap_mode="r" if args.mode == "mmap" else None)
+    y_train = load_numpy_array_data(args.target_path)
+    grid_search = GridSearchCV(RandomForestClassifier(n_estimators=5, random_state=0),
+                               param_grid={"max_depth": [6, 8], "max_features": ["sqrt", "log2"]},
+                               cv=3, n_jobs=args.n_jobs)
+    sampler = PeakPssSampler()
+    sampler.start()
+    start = time.perf_counter()
+    grid_search.fit(x_train, y_train)
+    elapsed_s = time.perf_counter() - start
+    return {"mode": args.mode, "n_jobs": args.n_jobs, "elapsed_s": elapsed_s, "peak_pss_mb": sampler.stop() / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--n-jobs", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--mode", choices=MODES, help="run a single search in this process")
+    parser.add_argument("--features-path")
+    parser.add_argument("--target-path")
+    args = parser.parse_args()
+
+    if args.mode is not None:
+        args.n_jobs = args.n_jobs[0]
+        print(json.dumps(run_search(args)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        rng = np.random.default_rng(0)
+        features = rng.standard_normal((args.rows, NUM_FEATURES), dtype=np.float32)
+        target = (features[:, 0] + rng.standard_normal(args.rows, dtype=np.float32) > 0).astype(np.int8)
+        features_path, target_path = os.path.join(tmp_dir, "train.npy"), os.path.join(tmp_dir, "train_target.npy")
+        save_numpy_array_data(features_path, features)
+        save_numpy_array_data(target_path, target)
+        print(f"{features.nbytes / 2 ** 20:.0f}MB of features")
+        del features, target
+
+        for mode in MODES:
+            for n_jobs in args.n_jobs:
+                completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--mode", mode,
+                                            "--n-jobs", str(n_jobs), "--features-path", features_path,
+                                            "--target-path", target_path], capture_output=True, text=True,
+                                           check=True)
+                result = json.loads(completed.stdout.strip().splitlines()[-1])
+                print(f"{result['mode']:>6} n_jobs={result['n_jobs']}: {result['elapsed_s']:.1f}s, "
+                      f"peak PSS {result['peak_pss_mb']:.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Time, memory and F1 of the class rebalancing strategies of config/resampling.yaml.
+
+    python benchmarks/resampling_benchmark.py --strategies smoteenn smote class_weight
+
+notebook/Visadataset.csv (or --data-path) is replicated --scale times, split into train and test, and
+transformed with the preprocessor of data transformation. Every strategy resamples the training features
+only (time and tracemalloc peak of the resampling), then a RandomForest and a KNN classifier are trained
+on the result and scored (F1 of the Denied class) on the untouched test features. With class_weight the
+RandomForest is weighted and the KNN classifier, which has no class_weight, trains unweighted.
+Copies of a row can land in both train and test when --scale is above 1, so compare F1 at --scale 1.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import f1_score
+from sklearn.model_selection import train_test_split
+from sklearn.neighbors import KNeighborsClassifier
+
+from drift_benchmark import build_dataset
+from us_visa.components.data_transformation import DataTransformation
+from us_visa.constants import TARGET_COLUMN
+from us_visa.data_access.feature_store import apply_schema_dtypes
+from us_visa.entity.config_entity import DataTransformationConfig
+from us_visa.entity.resampler import RESAMPLING_STRATEGIES, Resampler
+from us_visa.utils.main_utils import drop_columns, read_yaml_file
+
+
+def get_features(data_transformation: DataTransformation, df, preprocessor, fit: bool):
+    features = data_transformation.add_age_columns(df.drop(columns=[TARGET_COLUMN]))
+    drop_cols = data_transformation._schema_config["drop_columns"]
+    features = drop_columns(df=features, cols=[col for col in drop_cols if col in features])
+    transformed = preprocessor.fit_transform(features) if fit else preprocessor.transform(features)
+    return data_transformation.to_feature_matrix(transformed), np.asarray(df[TARGET_COLUMN], dtype=np.int8)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-path", default=os.path.join("notebook", "Visadataset.csv"))
+    parser.add_argument("--scale", type=int, default=1, help="number of copies of the dataset")
+    parser.add_argument("--strategies", nargs="+", choices=RESAMPLING_STRATEGIES, default=list(RESAMPLING_STRATEGIES))
+    args = parser.parse_args()
+
+    config = DataTransformationConfig()
+    data_transformation = DataTransformation(data_ingestion_artifact=None, data_transformation_config=config,
+                                             data_validation_artifact=None)
+    dataset = apply_schema_dtypes(build_dataset(args.data_path, args.scale), data_transformation._schema_config,
+                                  encode_target=True)
+    train_df, test_df = train_test_split(dataset, test_size=0.2, random_state=42)
+    preprocessor = data_transformation.get_data_transformer_object()
+    x_train, y_train = get_features(data_transformation, train_df, preprocessor, fit=True)
+    x_test, y_test = get_features(data_transformation, test_df, preprocessor, fit=False)
+    resampling_config = read_yaml_file(file_path=config.resampling_config_file_path)
+    print(f"{x_train.shape[0]} training rows, {x_test.shape[0]} test rows, "
+          f"{x_train.nbytes / 2 ** 20:.1f}MB of training features")
+
+    for strategy in args.strategies:
+        resampler = Resampler(resampling_config=resampling_config, strategy=strategy)
+        tracemalloc.start()
+        start = time.perf_counter()
+        x_resampled, y_resampled = resampler.fit_resample(x_train, y_train)
+        resampling_s = time.perf_counter() - start
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+
+        scores = {}
+        for name, model in (("random_forest", RandomForestClassifier(n_estimators=100, max_depth=15, n_jobs=-1,
+                                                                     random_state=0,
+                                                                     class_weight=resampler.class_weight)),
+                            ("knn", KNeighborsClassifier(n_neighbors=5, n_jobs=-1))):
+            start = time.perf_counter()
+            model.fit(x_resampled, y_resampled)
+            scores[name] = (f1_score(y_test, model.predict(x_test)), time.perf_counter() - start)
+
+        print(f"{strategy:>12}: resampling {resampling_s:6.2f}s peak {peak_mb:6.1f}MB, "
+              f"{x_resampled.shape[0]} rows, "
+              + ", ".join(f"{name} F1 {f1:.3f} ({fit_s:.1f}s)" for name, (f1, fit_s) in scores.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Peak memory of data transformation plus model training on a scaled copy of the visa data.
+
+    python benchmarks/training_memory_benchmark.py --scale 4
+
+notebook/Visadataset.csv (or --data-path) is replicated --scale times and split into train and test files.
+Each layout runs in its own process so the peak RSS is its own:
+
+    packed  float64 features with the target appended as a last column (np.c_) and sliced apart again
+            for training, the layout data transformation used to write
+    split   C contiguous float32 features and a separate int8 target, what data transformation writes now
+
+The Python heap peak (tracemalloc, numpy buffers included) is reported per stage. --model-config points
+to a lighter model.yaml to keep the grid search short.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sklearn.model_selection import train_test_split
+
+from drift_benchmark import build_dataset
+from us_visa.components.data_transformation import DataTransformation
+from us_visa.components.model_trainer import ModelTrainer
+from us_visa.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact
+from us_visa.entity.config_entity import DataTransformationConfig, ModelTrainerConfig
+from us_visa.utils.artifact_store import ArtifactStore
+from us_visa.utils.main_utils import load_feature_matrix, load_numpy_array_data
+
+LAYOUTS = ("packed", "split")
+
+
+def run_layout(args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        train_df, test_df = train_test_split(build_dataset(args.data_path, args.scale), test_size=0.2,
+                                             random_state=42)
+        data_ingestion_artifact = DataIngestionArtifact(trained_file_path=os.path.join(tmp_dir, "train.parquet"),
+                                                        test_file_path=os.path.join(tmp_dir, "test.parquet"))
+        train_df.to_parquet(data_ingestion_artifact.trained_file_path)
+        test_df.to_parquet(data_ingestion_artifact.test_file_path)
+        del train_df, test_df
+
+        transformed_dir = os.path.join(tmp_dir, "transformed")
+        transformation_config = DataTransformationConfig(
+            transformed_train_file_path=os.path.join(transformed_dir, "train.npy"),
+            transformed_test_file_path=os.path.join(transformed_dir, "test.npy"),
+            transformed_train_target_file_path=os.path.join(transformed_dir, "train_target.npy"),
+            transformed_test_target_file_path=os.path.join(transformed_dir, "test_target.npy"),
+            transformed_object_file_path=os.path.join(transformed_dir, "preprocessing.pkl"),
+            reference_sketch_file_path=os.path.join(transformed_dir, "reference_sketch.json"),
+            feature_dtype="float64" if args.layout == "packed" else "float32")
+        artifact_store = ArtifactStore(background=False)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        data_transformation_artifact = DataTransformation(
+            data_ingestion_artifact=data_ingestion_artifact, data_transformation_config=transformation_config,
+            data_validation_artifact=DataValidationArtifact(validation_status=True, message="",
+                                                            drift_report_file_path=""),
+            artifact_store=artifact_store).initiate_data_transformation()
+        transformation_s = time.perf_counter() - start
+
+        model_trainer = ModelTrainer(data_transformation_artifact=data_transformation_artifact,
+                                     model_trainer_config=ModelTrainerConfig(model_config_file_path=args.model_config))
+        x_train = artifact_store.get(data_transformation_artifact.transformed_train_file_path, load_feature_matrix)
+        x_test = artifact_store.get(data_transformation_artifact.transformed_test_file_path, load_feature_matrix)
+        y_train = artifact_store.get(data_transformation_artifact.transformed_train_target_file_path,
+                                     load_numpy_array_data)
+        y_test = artifact_store.get(data_transformation_artifact.transformed_test_target_file_path,
+                                    load_numpy_array_data)
+        del artifact_store
+        transformation_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+        if args.layout == "packed":
+            train, test = np.c_[x_train, y_train], np.c_[x_test, y_test]
+            del x_train, y_train, x_test, y_test
+            x_train, y_train, x_test, y_test = train[:, :-1], train[:, -1], test[:, :-1], test[:, -1]
+        model_trainer.get_model_object_and_report(x_train=x_train, y_train=y_train, x_test=x_test, y_test=y_test)
+        training_s = time.perf_counter() - start
+        training_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        return {"layout": args.layout, "train_shape": list(x_train.shape),
+                "feature_bytes": int(x_train.nbytes + x_test.nbytes), "transformation_s": transformation_s,
+                "training_s": training_s, "transformation_peak_mb": transformation_peak / 2 ** 20,
+                "training_peak_mb": training_peak / 2 ** 20,
+                "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-path", default=os.path.join("notebook", "Visadataset.csv"))
+    parser.add_argument("--scale", type=int, default=1, help="number of copies of the dataset")
+    parser.add_argument("--model-config", default=os.path.join("config", "model.yaml"))
+    parser.add_argument("--layout", choices=LAYOUTS, help="run a single layout in this process")
+    args = parser.parse_args()
+
+    if args.layout is not None:
+        print(json.dumps(run_layout(args)))
+        return
+
+    for layout in LAYOUTS:
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--data-path", args.data_path,
+                                    "--scale", str(args.scale), "--model-config", args.model_config,
+                                    "--layout", layout], capture_output=True, text=True, check=True)
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(f"{result['layout']:>6}: train features {result['train_shape']}, "
+              f"{result['feature_bytes'] / 2 ** 20:.1f}MB of features, "
+              f"transformation {result['transformation_s']:.1f}s peak {result['transformation_peak_mb']:.0f}MB, "
+              f"training {result['training_s']:.1f}s peak {result['training_peak_mb']:.0f}MB, "
+              f"max RSS {result['max_rss_mb']:.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Loads a csv or parquet file of visa cases into the Mongo collection read by the training pipeline.
+
+    python bulk_load.py notebook/Visadataset.csv
+    python bulk_load.py new_cases.parquet --upsert --workers 8
+
+MONGODB_URL must be set. Without --upsert existing case_ids are skipped, with --upsert they are replaced.
+--upsert needs DATA_INGESTION_WATERMARK_FIELD (e.g. updated_at) set here and for the training pipeline:
+replaced documents keep their _id, incremental ingestion only sees them through the stamped field.
+"""
+import argparse
+
+from us_visa.constants import BULK_LOAD_BATCH_SIZE, BULK_LOAD_MAX_WORKERS, DATA_INGESTION_COLLECTION_NAME, DATABASE_NAME
+from us_visa.data_access.bulk_loader import USvisaBulkLoader
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file_path", help="csv or parquet file to load")
+    parser.add_argument("--database", default=DATABASE_NAME)
+    parser.add_argument("--collection", default=DATA_INGESTION_COLLECTION_NAME)
+    parser.add_argument("--batch-size", type=int, default=BULK_LOAD_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=BULK_LOAD_MAX_WORKERS)
+    parser.add_argument("--upsert", action="store_true", help="replace documents with an existing case_id")
+    args = parser.parse_args()
+
+    loader = USvisaBulkLoader(collection_name=args.collection, database_name=args.database,
+                              batch_size=args.batch_size, max_workers=args.workers)
+    report = loader.load_file(args.file_path, upsert=args.upsert)
+    print(f"{report.num_documents} documents read, {report.num_written} written, {report.num_skipped} skipped "
+          f"in {report.elapsed_seconds:.2f}s ({report.docs_per_second:,.0f} docs/sec)")
+
+
+if __name__ == "__main__":
+    main()
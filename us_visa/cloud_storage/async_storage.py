@@ -0,0 +1,75 @@
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional
+
+from us_visa.cloud_storage.base_storage import StorageService
+from us_visa.constants import STORAGE_TIMEOUT_SECONDS, STORAGE_MAX_WORKERS
+from us_visa.exception import USvisaException
+
+
+class AsyncStorageService:
+    """
+    asyncio wrapper around a synchronous storage backend for the serving process.
+
+    Every call runs on a dedicated thread pool so blocking boto3/file system calls never stall the
+    event loop, and is bounded by a timeout. A timed out or cancelled call returns control to the
+    caller immediately, the underlying request finishes in its worker thread and its result is dropped.
+    """
+
+    def __init__(self, storage: StorageService, timeout: float = STORAGE_TIMEOUT_SECONDS,
+                 executor: Optional[ThreadPoolExecutor] = None):
+        """
+        :param storage: Synchronous storage backend
+        :param timeout: Seconds after which a storage call raises asyncio.TimeoutError
+        :param executor: Thread pool running the storage calls, a private one is created by default
+        """
+        self.storage = storage
+        self.timeout = timeout
+        self.executor = executor if executor is not None else ThreadPoolExecutor(
+            max_workers=STORAGE_MAX_WORKERS, thread_name_prefix="storage")
+
+    def submit(self, func, *args, **kwargs) -> asyncio.Future:
+        """
+        Starts func(*args, **kwargs) on the storage thread pool, the returned future is not bounded by a timeout
+        """
+        return asyncio.get_running_loop().run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def run(self, func, *args, timeout: Optional[float] = None, **kwargs):
+        """
+        Runs func(*args, **kwargs) on the storage thread pool and awaits its result
+        """
+        future = self.submit(func, *args, **kwargs)
+        return await asyncio.wait_for(future, timeout=self.timeout if timeout is None else timeout)
+
+    async def key_path_available(self, bucket_name: str, key: str) -> bool:
+        return await self.run(self.storage.key_path_available, bucket_name=bucket_name, key=key)
+
+    async def get_version_token(self, key: str, bucket_name: str) -> Optional[str]:
+        return await self.run(self.storage.get_version_token, key, bucket_name=bucket_name)
+
+    async def get_object_metadata(self, key: str, bucket_name: str) -> Optional[dict]:
+        return await self.run(self.storage.get_object_metadata, key, bucket_name=bucket_name)
+
+    async def read_object_bytes(self, key: str, bucket_name: str) -> bytes:
+        return await self.run(self.storage.read_object_bytes, key, bucket_name=bucket_name)
+
+    async def put_object_bytes(self, data: bytes, key: str, bucket_name: str) -> str:
+        return await self.run(self.storage.put_object_bytes, data, key, bucket_name=bucket_name)
+
+    async def upload_file(self, from_filename: str, to_filename: str, bucket_name: str, remove: bool = True,
+                          metadata: Optional[dict] = None):
+        return await self.run(self.storage.upload_file, from_filename, to_filename, bucket_name,
+                              remove=remove, metadata=metadata)
+
+    async def load_model(self, model_name: str, bucket_name: str, model_dir: str = None,
+                         expected_sha256: Optional[str] = None) -> object:
+        return await self.run(self.storage.load_model, model_name, bucket_name, model_dir=model_dir,
+                              expected_sha256=expected_sha256)
+
+    def shutdown(self) -> None:
+        try:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        except Exception as e:
+            raise USvisaException(e, sys) from e
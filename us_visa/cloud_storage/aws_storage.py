@@ -1,17 +1,17 @@
 import boto3
 from us_visa.configuration.aws_connection import S3Client
+from us_visa.cloud_storage.base_storage import StorageService
 from io import StringIO
-from typing import Union,List
+from typing import Union,List,Optional
 import os,sys
 from us_visa.logger import logging
 from mypy_boto3_s3.service_resource import Bucket
 from us_visa.exception import USvisaException
 from botocore.exceptions import ClientError
 from pandas import DataFrame,read_csv
-import pickle
 
 
-class SimpleStorageService:
+class SimpleStorageService(StorageService):
 
     def __init__(self):
         s3_client = S3Client()
@@ -28,8 +28,64 @@ class SimpleStorageService:
                 return False
         except Exception as e:
             raise USvisaException(e,sys)
-        
-        
+
+    def key_path_available(self, bucket_name: str, key: str) -> bool:
+        return self.s3_key_path_available(bucket_name=bucket_name, s3_key=key)
+
+    def get_version_token(self, key: str, bucket_name: str) -> Optional[str]:
+        """
+        Method Name :   get_version_token
+        Description :   This method returns the ETag of the key object in bucket_name bucket
+
+        Output      :   ETag of the object or None if the object does not exist
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            response = self.s3_client.head_object(Bucket=bucket_name, Key=key)
+            return response["ETag"].strip('"')
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise USvisaException(e, sys) from e
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def read_object_bytes(self, key: str, bucket_name: str) -> bytes:
+        """
+        Method Name :   read_object_bytes
+        Description :   This method reads the content of the key object in bucket_name bucket
+
+        Output      :   Content of the object as bytes
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            return self.s3_client.get_object(Bucket=bucket_name, Key=key)["Body"].read()
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def open_object_stream(self, key: str, bucket_name: str):
+        """
+        Returns the streaming body of the key object in bucket_name bucket, read in chunks as it is consumed
+        """
+        try:
+            return self.s3_client.get_object(Bucket=bucket_name, Key=key)["Body"]
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def put_object_bytes(self, data: bytes, key: str, bucket_name: str) -> str:
+        """
+        Method Name :   put_object_bytes
+        Description :   This method publishes data as the key object in bucket_name bucket,
+                        a single PUT is atomic in s3
+
+        Output      :   ETag of the published object
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            response = self.s3_client.put_object(Bucket=bucket_name, Key=key, Body=data)
+            return response["ETag"].strip('"')
+        except Exception as e:
+            raise USvisaException(e, sys) from e
 
     @staticmethod
     def read_object(object_name: str, decode: bool = True, make_readable: bool = False) -> Union[StringIO, str]:
@@ -106,35 +162,6 @@ class SimpleStorageService:
         except Exception as e:
             raise USvisaException(e, sys) from e
 
-    def load_model(self, model_name: str, bucket_name: str, model_dir: str = None) -> object:
-        """
-        Method Name :   load_model
-        Description :   This method loads the model_name model from bucket_name bucket with kwargs
-
-        Output      :   list of objects or object is returned based on filename
-        On Failure  :   Write an exception log and then raise an exception
-
-        Version     :   1.2
-        Revisions   :   moved setup to cloud
-        """
-        logging.info("Entered the load_model method of S3Operations class")
-
-        try:
-            func = (
-                lambda: model_name
-                if model_dir is None
-                else model_dir + "/" + model_name
-            )
-            model_file = func()
-            file_object = self.get_file_object(model_file, bucket_name)
-            model_obj = self.read_object(file_object, decode=False)
-            model = pickle.loads(model_obj)
-            logging.info("Exited the load_model method of S3Operations class")
-            return model
-
-        except Exception as e:
-            raise USvisaException(e, sys) from e
-
     def create_folder(self, folder_name: str, bucket_name: str) -> None:
         """
         Method Name :   create_folder
@@ -159,7 +186,25 @@ class SimpleStorageService:
                 pass
             logging.info("Exited the create_folder method of S3Operations class")
 
-    def upload_file(self, from_filename: str, to_filename: str,  bucket_name: str,  remove: bool = True):
+    def get_object_metadata(self, key: str, bucket_name: str) -> Optional[dict]:
+        """
+        Method Name :   get_object_metadata
+        Description :   This method reads the user metadata of the key object with a HEAD request
+
+        Output      :   Metadata as dict or None if the object does not exist
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            return self.s3_client.head_object(Bucket=bucket_name, Key=key)["Metadata"]
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise USvisaException(e, sys) from e
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def upload_file(self, from_filename: str, to_filename: str,  bucket_name: str,  remove: bool = True,
+                    metadata: Optional[dict] = None):
         """
         Method Name :   upload_file
         Description :   This method uploads the from_filename file to bucket_name bucket with to_filename as bucket filename
@@ -177,8 +222,9 @@ class SimpleStorageService:
                 f"Uploading {from_filename} file to {to_filename} file in {bucket_name} bucket"
             )
 
+            extra_args = None if not metadata else {"Metadata": {k: str(v) for k, v in metadata.items()}}
             self.s3_resource.meta.client.upload_file(
-                from_filename, bucket_name, to_filename
+                from_filename, bucket_name, to_filename, ExtraArgs=extra_args
             )
 
             logging.info(
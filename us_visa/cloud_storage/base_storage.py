@@ -0,0 +1,109 @@
+import hashlib
+import io
+import pickle
+import shutil
+import sys
+import tempfile
+from abc import ABC, abstractmethod
+from contextlib import ExitStack, closing
+from typing import BinaryIO, Optional
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+from us_visa.utils.compression import detect_codec, open_decompressed_reader
+
+
+class StorageService(ABC):
+    """
+    Common interface of the model storage backends (s3 bucket, local/shared volume).
+
+    Every backend addresses objects by bucket_name and key and has the same semantics:
+    - every stored object has a version token (ETag like) which changes whenever the object is replaced
+    - objects are published atomically, a reader never sees a partially written object
+    """
+
+    @abstractmethod
+    def key_path_available(self, bucket_name: str, key: str) -> bool:
+        """
+        Returns True if at least one object exists under the key prefix
+        """
+
+    @abstractmethod
+    def get_version_token(self, key: str, bucket_name: str) -> Optional[str]:
+        """
+        Returns the version token of the object, None if the object does not exist
+        """
+
+    @abstractmethod
+    def read_object_bytes(self, key: str, bucket_name: str) -> bytes:
+        """
+        Returns the content of the object
+        """
+
+    def open_object_stream(self, key: str, bucket_name: str) -> BinaryIO:
+        """
+        Returns a readable binary file object of the object content, the caller closes it.
+        Backends override it to stream the object instead of reading it into memory
+        """
+        return io.BytesIO(self.read_object_bytes(key, bucket_name=bucket_name))
+
+    @abstractmethod
+    def put_object_bytes(self, data: bytes, key: str, bucket_name: str) -> str:
+        """
+        Atomically publishes data as the object and returns its version token
+        """
+
+    @abstractmethod
+    def upload_file(self, from_filename: str, to_filename: str, bucket_name: str, remove: bool = True,
+                    metadata: Optional[dict] = None):
+        """
+        Atomically publishes the local from_filename file as the to_filename object,
+        metadata is stored with the object as string key/value pairs
+        """
+
+    @abstractmethod
+    def get_object_metadata(self, key: str, bucket_name: str) -> Optional[dict]:
+        """
+        Returns the metadata stored with the object without downloading it, None if the object does not exist
+        """
+
+    def load_model(self, model_name: str, bucket_name: str, model_dir: str = None,
+                   expected_sha256: Optional[str] = None) -> object:
+        """
+        Method Name :   load_model
+        Description :   This method loads the model_name model from bucket_name bucket. The object is read
+                        as a stream: a non seekable stream (s3 body) is spooled to a temporary file chunk
+                        by chunk, its content is checked against expected_sha256 before unpickling when it
+                        is given and decompressed on the fly when the model was saved with a compression codec
+
+        Output      :   Model object is returned
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        logging.info(f"Entered the load_model method of {type(self).__name__} class")
+
+        try:
+            model_file = model_name if model_dir is None else model_dir + "/" + model_name
+            with ExitStack() as stack:
+                model_stream = stack.enter_context(closing(self.open_object_stream(model_file, bucket_name=bucket_name)))
+                if not (hasattr(model_stream, "seekable") and model_stream.seekable()):
+                    spool = stack.enter_context(tempfile.TemporaryFile())
+                    shutil.copyfileobj(model_stream, spool, 1024 * 1024)
+                    model_stream = spool
+                    model_stream.seek(0)
+                if expected_sha256 is not None:
+                    content_hash = hashlib.sha256()
+                    for chunk in iter(lambda: model_stream.read(1024 * 1024), b""):
+                        content_hash.update(chunk)
+                    if content_hash.hexdigest() != expected_sha256:
+                        raise Exception(f"Content hash of {model_file} does not match the expected hash {expected_sha256}")
+                    model_stream.seek(0)
+                codec = detect_codec(model_stream.read(4))
+                model_stream.seek(0)
+                # compressed models are decompressed chunk by chunk while unpickling
+                with open_decompressed_reader(model_stream, codec) as reader:
+                    model = pickle.load(reader)
+            logging.info(f"Exited the load_model method of {type(self).__name__} class")
+            return model
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
@@ -0,0 +1,191 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+from typing import Optional
+
+from us_visa.cloud_storage.base_storage import StorageService
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+class LocalStorageService(StorageService):
+    """
+    Storage backend keeping the model bucket on a local or shared volume (e.g. NVMe path, NFS mount).
+    A bucket is a directory below root_dir and a key is a relative path inside the bucket.
+    """
+
+    def __init__(self, root_dir: str):
+        """
+        :param root_dir: Directory holding one sub directory per bucket
+        """
+        try:
+            self.root_dir = root_dir
+            os.makedirs(self.root_dir, exist_ok=True)
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def get_object_path(self, key: str, bucket_name: str) -> str:
+        return os.path.join(self.root_dir, bucket_name, *key.split("/"))
+
+    def get_metadata_path(self, key: str, bucket_name: str) -> str:
+        dir_path, file_name = os.path.split(self.get_object_path(key, bucket_name))
+        return os.path.join(dir_path, f".{file_name}.metadata.json")
+
+    def key_path_available(self, bucket_name: str, key: str) -> bool:
+        """
+        Method Name :   key_path_available
+        Description :   This method checks whether any object exists under the key prefix
+
+        Output      :   Returns bool value
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            object_path = self.get_object_path(key, bucket_name)
+            if os.path.exists(object_path):
+                return True
+            dir_path, prefix = os.path.split(object_path)
+            if not os.path.isdir(dir_path):
+                return False
+            return any(name.startswith(prefix) and not name.startswith(".") for name in os.listdir(dir_path))
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def get_version_token(self, key: str, bucket_name: str) -> Optional[str]:
+        """
+        Method Name :   get_version_token
+        Description :   This method returns an ETag like token of the object. Every publish replaces
+                        the file with a new inode, so inode, mtime and size change with each version
+
+        Output      :   Version token or None if the object does not exist
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            stat = os.stat(self.get_object_path(key, bucket_name))
+            return f"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def read_object_bytes(self, key: str, bucket_name: str) -> bytes:
+        """
+        Method Name :   read_object_bytes
+        Description :   This method reads the content of the object
+
+        Output      :   Content of the object as bytes
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            with open(self.get_object_path(key, bucket_name), "rb") as file_obj:
+                return file_obj.read()
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def open_object_stream(self, key: str, bucket_name: str):
+        """
+        Opens the object file for reading, the caller closes it
+        """
+        try:
+            return open(self.get_object_path(key, bucket_name), "rb")
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def _publish(self, write_func, key: str, bucket_name: str) -> str:
+        """
+        Writes the object into a temporary file next to its final path and renames it into place,
+        os.replace is atomic on the same file system so readers see either the old or the new object
+        """
+        object_path = self.get_object_path(key, bucket_name)
+        dir_path = os.path.dirname(object_path)
+        os.makedirs(dir_path, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(object_path)}.", dir=dir_path)
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                write_func(tmp_file)
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+            # mkstemp creates the file as 0600, serving workers on a shared volume need to read it
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, object_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return self.get_version_token(key, bucket_name)
+
+    def put_object_bytes(self, data: bytes, key: str, bucket_name: str) -> str:
+        """
+        Method Name :   put_object_bytes
+        Description :   This method atomically publishes data as the key object in bucket_name bucket
+
+        Output      :   Version token of the published object
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            return self._publish(lambda file_obj: file_obj.write(data), key, bucket_name)
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def get_object_metadata(self, key: str, bucket_name: str) -> Optional[dict]:
+        """
+        Method Name :   get_object_metadata
+        Description :   This method reads the metadata sidecar file of the object
+
+        Output      :   Metadata as dict, empty if the object has none, None if the object does not exist
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            if not os.path.isfile(self.get_object_path(key, bucket_name)):
+                return None
+            try:
+                with open(self.get_metadata_path(key, bucket_name)) as metadata_file:
+                    return json.load(metadata_file)
+            except FileNotFoundError:
+                return {}
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def upload_file(self, from_filename: str, to_filename: str, bucket_name: str, remove: bool = True,
+                    metadata: Optional[dict] = None):
+        """
+        Method Name :   upload_file
+        Description :   This method atomically publishes the from_filename file to bucket_name bucket
+                        with to_filename as key. Metadata goes to a hidden sidecar file which is
+                        published before the object itself
+
+        Output      :   File is published in the bucket directory
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        logging.info("Entered the upload_file method of LocalStorageService class")
+
+        try:
+            logging.info(f"Uploading {from_filename} file to {to_filename} file in {bucket_name} bucket")
+
+            def copy_file(file_obj):
+                with open(from_filename, "rb") as src_file:
+                    shutil.copyfileobj(src_file, file_obj, length=1024 * 1024)
+
+            metadata_path = self.get_metadata_path(to_filename, bucket_name)
+            if metadata:
+                metadata_key = os.path.relpath(metadata_path, os.path.join(self.root_dir, bucket_name))
+                data = json.dumps({k: str(v) for k, v in metadata.items()}).encode()
+                self._publish(lambda file_obj: file_obj.write(data), metadata_key.replace(os.sep, "/"), bucket_name)
+            elif os.path.exists(metadata_path):
+                os.remove(metadata_path)
+
+            self._publish(copy_file, to_filename, bucket_name)
+
+            logging.info(f"Uploaded {from_filename} file to {to_filename} file in {bucket_name} bucket")
+
+            if remove is True:
+                os.remove(from_filename)
+                logging.info(f"Remove is set to {remove}, deleted the file")
+            else:
+                logging.info(f"Remove is set to {remove}, not deleted the file")
+
+            logging.info("Exited the upload_file method of LocalStorageService class")
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
@@ -0,0 +1,206 @@
+import json
+import sys
+from datetime import datetime, timezone
+from typing import Optional
+
+from us_visa.cloud_storage.base_storage import StorageService
+from us_visa.constants import (MODEL_PUSHER_S3_KEY, MODEL_FILE_NAME, MODEL_REGISTRY_MANIFEST_FILE_NAME,
+                               MODEL_REGISTRY_REFERENCE_SKETCH_FILE_NAME, MODEL_REGISTRY_VERSIONS_DIR,
+                               MODEL_REGISTRY_HISTORY_SIZE, MODEL_REGISTRY_CONTENT_HASH_METADATA_KEY,
+                               MODEL_REGISTRY_CODEC_METADATA_KEY)
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+from us_visa.utils.main_utils import get_file_hash
+from us_visa.utils.compression import detect_codec
+
+
+class ModelRegistry:
+    """
+    Versioned model registry on top of a storage backend.
+
+    Every pushed model is written once to an immutable key
+        <registry_prefix>/versions/<version>/model.pkl
+    next to the reference sketch of its training data
+        <registry_prefix>/versions/<version>/reference_sketch.json
+    and a small manifest object
+        <registry_prefix>/manifest.json
+    points to the latest and previous versions together with their metrics and content hash.
+    Readers resolve the latest model with one manifest read, rollback only rewrites the manifest.
+    """
+
+    def __init__(self, storage: StorageService, bucket_name: str, registry_prefix: str = MODEL_PUSHER_S3_KEY):
+        """
+        :param storage: Storage backend holding the registry
+        :param bucket_name: Name of your model bucket
+        :param registry_prefix: Key prefix of the registry in the bucket
+        """
+        self.storage = storage
+        self.bucket_name = bucket_name
+        self.registry_prefix = registry_prefix.rstrip("/")
+        self.manifest_key = f"{self.registry_prefix}/{MODEL_REGISTRY_MANIFEST_FILE_NAME}"
+        self._manifest_token: Optional[str] = None
+        self._manifest: Optional[dict] = None
+
+    def get_version_key(self, version: str) -> str:
+        return f"{self.registry_prefix}/{MODEL_REGISTRY_VERSIONS_DIR}/{version}/{MODEL_FILE_NAME}"
+
+    def get_reference_sketch_key(self, version: str) -> str:
+        return (f"{self.registry_prefix}/{MODEL_REGISTRY_VERSIONS_DIR}/{version}/"
+                f"{MODEL_REGISTRY_REFERENCE_SKETCH_FILE_NAME}")
+
+    def get_manifest_token(self) -> Optional[str]:
+        """
+        Returns the version token of the manifest, it changes whenever a model is pushed or rolled back
+        """
+        return self.storage.get_version_token(self.manifest_key, bucket_name=self.bucket_name)
+
+    def read_manifest(self) -> Optional[dict]:
+        """
+        Method Name :   read_manifest
+        Description :   This method reads the registry manifest, the content is cached and only
+                        downloaded again when the version token of the manifest changes
+
+        Output      :   Manifest as dict or None if nothing was pushed yet
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            token = self.get_manifest_token()
+            if token is None:
+                return None
+            if token != self._manifest_token:
+                self._manifest = json.loads(self.storage.read_object_bytes(self.manifest_key,
+                                                                           bucket_name=self.bucket_name))
+                self._manifest_token = token
+            return self._manifest
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def write_manifest(self, manifest: dict) -> None:
+        manifest["updated_at"] = datetime.now(timezone.utc).isoformat()
+        data = json.dumps(manifest, indent=2).encode()
+        self._manifest_token = self.storage.put_object_bytes(data, self.manifest_key, bucket_name=self.bucket_name)
+        self._manifest = manifest
+
+    def get_latest(self) -> Optional[dict]:
+        """
+        Returns the manifest entry of the latest model version, None if the registry is empty
+        """
+        manifest = self.read_manifest()
+        return None if manifest is None else manifest.get("latest")
+
+    def get_latest_content_hash(self) -> Optional[str]:
+        """
+        Returns the content hash of the latest version, taken from the manifest or else from the
+        metadata of the latest model object. None if the registry is empty
+        """
+        latest = self.get_latest()
+        if latest is None:
+            return None
+        if latest.get("content_hash"):
+            return latest["content_hash"]
+        metadata = self.storage.get_object_metadata(latest["key"], bucket_name=self.bucket_name) or {}
+        return metadata.get(MODEL_REGISTRY_CONTENT_HASH_METADATA_KEY)
+
+    def get_latest_reference_sketch(self) -> Optional[dict]:
+        """
+        Returns the reference sketch (JSON content) published with the latest version, None if the
+        registry is empty or the latest version was registered without sketch. The model is not downloaded
+        """
+        try:
+            latest = self.get_latest()
+            if latest is None or not latest.get("reference_sketch_key"):
+                return None
+            return json.loads(self.storage.read_object_bytes(latest["reference_sketch_key"],
+                                                             bucket_name=self.bucket_name))
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def register_model(self, from_file: str, metrics: Optional[dict] = None, remove: bool = False,
+                       content_hash: Optional[str] = None, reference_sketch_file: Optional[str] = None) -> dict:
+        """
+        Method Name :   register_model
+        Description :   This method uploads the model file to a new immutable version key and
+                        makes it the latest version in the manifest. The sha256 and compression codec
+                        of the file are stored in the manifest and as object metadata. The reference
+                        sketch file, when given, is published next to the model before the manifest
+
+        Output      :   Manifest entry of the new version
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        logging.info("Entered the register_model method of ModelRegistry class")
+
+        try:
+            if content_hash is None:
+                content_hash = get_file_hash(from_file)
+            version = f"{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}-{content_hash[:8]}"
+            key = self.get_version_key(version)
+
+            with open(from_file, "rb") as file_obj:
+                codec = detect_codec(file_obj.read(4))
+
+            metadata = {MODEL_REGISTRY_CONTENT_HASH_METADATA_KEY: content_hash}
+            if codec is not None:
+                metadata[MODEL_REGISTRY_CODEC_METADATA_KEY] = codec
+            self.storage.upload_file(from_file, to_filename=key, bucket_name=self.bucket_name, remove=remove,
+                                     metadata=metadata)
+            reference_sketch_key = None
+            if reference_sketch_file is not None:
+                reference_sketch_key = self.get_reference_sketch_key(version)
+                self.storage.upload_file(reference_sketch_file, to_filename=reference_sketch_key,
+                                         bucket_name=self.bucket_name, remove=False)
+
+            entry = {
+                "version": version,
+                "key": key,
+                "content_hash": content_hash,
+                "codec": codec,
+                "reference_sketch_key": reference_sketch_key,
+                "metrics": metrics or {},
+                "created_at": datetime.now(timezone.utc).isoformat(),
+            }
+
+            manifest = self.read_manifest() or {"latest": None, "previous": None, "history": []}
+            manifest["previous"] = manifest["latest"]
+            manifest["latest"] = entry
+            manifest["history"] = ([entry] + manifest["history"])[:MODEL_REGISTRY_HISTORY_SIZE]
+            self.write_manifest(manifest)
+
+            logging.info(f"Registered model version {version} at {key}")
+            logging.info("Exited the register_model method of ModelRegistry class")
+            return entry
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def rollback(self, version: Optional[str] = None) -> dict:
+        """
+        Method Name :   rollback
+        Description :   This method points latest back to the previous version (or to the given version
+                        from the manifest history). Only the manifest is rewritten, no model is uploaded
+
+        Output      :   Manifest entry of the version which is now latest
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        logging.info("Entered the rollback method of ModelRegistry class")
+
+        try:
+            manifest = self.read_manifest()
+            if manifest is None or manifest["latest"] is None:
+                raise Exception("Model registry is empty, nothing to roll back")
+
+            if version is None:
+                target = manifest["previous"]
+                if target is None:
+                    raise Exception("No previous model version to roll back to")
+            else:
+                target = next((entry for entry in manifest["history"] if entry["version"] == version), None)
+                if target is None:
+                    raise Exception(f"Model version {version} not found in registry history")
+
+            manifest["previous"], manifest["latest"] = manifest["latest"], target
+            self.write_manifest(manifest)
+
+            logging.info(f"Rolled back model registry to version {target['version']}")
+            logging.info("Exited the rollback method of ModelRegistry class")
+            return target
+        except Exception as e:
+            raise USvisaException(e, sys) from e
@@ -0,0 +1,34 @@
+import sys
+
+from us_visa.cloud_storage.base_storage import StorageService
+from us_visa.constants import STORAGE_BACKEND_S3, STORAGE_BACKEND_LOCAL
+from us_visa.entity.config_entity import StorageConfig
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+def get_storage_service(storage_config: StorageConfig = None) -> StorageService:
+    """
+    Returns the storage backend selected by storage_config (STORAGE_BACKEND env variable by default).
+    The s3 backend is imported lazily so the local backend works without boto3 and aws credentials.
+
+    :param storage_config: Configuration of the storage backend
+    :return: StorageService object
+    """
+    try:
+        if storage_config is None:
+            storage_config = StorageConfig()
+
+        if storage_config.backend == STORAGE_BACKEND_S3:
+            from us_visa.cloud_storage.aws_storage import SimpleStorageService
+            return SimpleStorageService()
+
+        if storage_config.backend == STORAGE_BACKEND_LOCAL:
+            from us_visa.cloud_storage.local_storage import LocalStorageService
+            logging.info(f"Using local storage backend at {storage_config.local_storage_root}")
+            return LocalStorageService(root_dir=storage_config.local_storage_root)
+
+        raise Exception(f"Unknown storage backend: {storage_config.backend}, "
+                        f"expected one of {[STORAGE_BACKEND_S3, STORAGE_BACKEND_LOCAL]}")
+    except Exception as e:
+        raise USvisaException(e, sys) from e
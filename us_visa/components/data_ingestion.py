@@ -1,85 +1,241 @@
+import hashlib
+import json
 import os
+import shutil
 import sys
+from datetime import datetime
+from typing import Optional
 
+import numpy as np
+import pandas as pd
+from bson import ObjectId
 from pandas import DataFrame
-from sklearn.model_selection import train_test_split
 
 # Importing custom exception, logging, and data access utilities
 from us_visa.entity.config_entity import DataIngestionConfig
 from us_visa.entity.artifact_entity import DataIngestionArtifact
 from us_visa.exception import USvisaException
 from us_visa.logger import logging
-from us_visa.data_access.usvisa_data import USvisaData
+from us_visa.constants import SCHEMA_FILE_PATH
+from us_visa.data_access.data_source import get_data_source_connector
+from us_visa.data_access.aggregation import get_shaped_columns
+from us_visa.data_access.feature_store import (apply_schema_dtypes, get_arrow_schema, read_feature_store,
+                                               write_feature_store)
+from us_visa.utils.main_utils import read_yaml_file
+from us_visa.utils.artifact_store import ArtifactStore
+
+
+# Watermark values are persisted as JSON, ObjectId and datetime need an explicit round trip
+def encode_watermark_value(value) -> dict:
+    if isinstance(value, ObjectId):
+        return {"type": "objectid", "value": str(value)}
+    if isinstance(value, datetime):
+        return {"type": "datetime", "value": value.isoformat()}
+    return {"type": "raw", "value": value}
+
+
+def decode_watermark_value(encoded: dict):
+    if encoded["type"] == "objectid":
+        return ObjectId(encoded["value"])
+    if encoded["type"] == "datetime":
+        return datetime.fromisoformat(encoded["value"])
+    return encoded["value"]
 
 # Class responsible for the process of data ingestion
 class DataIngestion:
     
     # Constructor method to initialize the class with a configuration object
-    def __init__(self, data_ingestion_config: DataIngestionConfig = DataIngestionConfig()):
+    def __init__(self, data_ingestion_config: DataIngestionConfig = DataIngestionConfig(),
+                 artifact_store: Optional[ArtifactStore] = None):
         """
         :param data_ingestion_config: Configuration for data ingestion
+        :param artifact_store: Hands the train and test sets to the next stages in memory
         """
         try:
             self.data_ingestion_config = data_ingestion_config  # Storing configuration
+            self.artifact_store = artifact_store if artifact_store is not None else ArtifactStore(background=False)
+            self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
         except Exception as e:
             # Handling exceptions by logging and raising a custom exception
             raise USvisaException(e, sys)
     
-    # Method to export data from MongoDB to a CSV file and return the data as a pandas DataFrame
+    def get_schema_hash(self) -> str:
+        """
+        Fingerprint of the exported columns and the watermark field, a change invalidates the snapshot
+        """
+        schema = {"columns": self._schema_config["columns"], "watermark_field": self.data_ingestion_config.watermark_field,
+                  "shaped_columns": get_shaped_columns(self._schema_config) if self.data_ingestion_config.shape_in_database else None}
+        return hashlib.sha256(json.dumps(schema, sort_keys=True).encode()).hexdigest()
+
+    def read_watermark(self) -> Optional[dict]:
+        """
+        Method Name :   read_watermark
+        Description :   This method reads the watermark of the last ingestion, None when the snapshot
+                        cannot be extended incrementally (no watermark or snapshot, schema changed)
+        
+        Output      :   Watermark dict or None
+        On Failure  :   Logs the error and raises a custom exception
+        """
+        try:
+            watermark_file_path = self.data_ingestion_config.watermark_file_path
+            if not self.data_ingestion_config.incremental:
+                return None
+            if not (os.path.exists(watermark_file_path) and os.path.exists(self.data_ingestion_config.snapshot_file_path)):
+                logging.info("No feature store snapshot found, running a full export")
+                return None
+
+            with open(watermark_file_path) as watermark_file:
+                watermark = json.load(watermark_file)
+            if watermark.get("schema_hash") != self.get_schema_hash():
+                logging.info("Schema or watermark field changed since the last ingestion, running a full export")
+                return None
+            return watermark
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def write_watermark(self, high_watermark, num_records: int) -> None:
+        try:
+            watermark = {
+                "field": self.data_ingestion_config.watermark_field,
+                "high_watermark": encode_watermark_value(high_watermark),
+                "schema_hash": self.get_schema_hash(),
+                "num_records": num_records,
+                "updated_at": datetime.utcnow().isoformat(),
+            }
+            watermark_file_path = self.data_ingestion_config.watermark_file_path
+            with open(f"{watermark_file_path}.tmp", "w") as watermark_file:
+                json.dump(watermark, watermark_file, indent=2)
+            os.replace(f"{watermark_file_path}.tmp", watermark_file_path)
+            logging.info(f"Saved ingestion watermark: {watermark}")
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    # Method to export data from the data source to the feature store file and return the data as a pandas DataFrame
     def export_data_into_feature_store(self) -> DataFrame:
         """
         Method Name :   export_data_into_feature_store
-        Description :   This method exports data from MongoDB to a CSV file
+        Description :   This method streams the configured data source into this run's feature store file.
+                        For MongoDB the feature store snapshot is brought up to date instead: only the
+                        documents above the persisted watermark are fetched and merged into the snapshot
+                        (deduplicated on the id columns, newest wins), with a full export when there is no
+                        usable snapshot. The snapshot is then copied into this run's feature store file
         
-        Output      :   Data is returned as a DataFrame and saved as a CSV file
+        Output      :   Data is returned as a DataFrame and saved as a feature store file
         On Failure  :   Logs the error and raises a custom exception
         """
         try:
-            logging.info(f"Exporting data from MongoDB")
-            
-            # Fetching the data from MongoDB using a custom data access class
-            usvisa_data = USvisaData()
-            dataframe = usvisa_data.export_collection_as_dataframe(collection_name=
-                                                                   self.data_ingestion_config.collection_name)
-            logging.info(f"Shape of dataframe: {dataframe.shape}")
+            logging.info(f"Exporting data from the data source")
             
-            # Saving the data to the specified file path
-            feature_store_file_path = self.data_ingestion_config.feature_store_file_path
-            dir_path = os.path.dirname(feature_store_file_path)  # Creating directory if it doesn't exist
-            os.makedirs(dir_path, exist_ok=True)
+            config = self.data_ingestion_config
+            connector = get_data_source_connector(config, self._schema_config)
+            feature_store_file_path = config.feature_store_file_path
             logging.info(f"Saving exported data into feature store file path: {feature_store_file_path}")
-            
-            # Writing the DataFrame to a CSV file
-            dataframe.to_csv(feature_store_file_path, index=False, header=True)
+
+            # Read before exporting, documents inserted during the export are picked up by the next run
+            high_watermark = connector.get_high_watermark(config.watermark_field)
+
+            dataframe = None
+            if high_watermark is None:
+                # Source without incremental reads (files, s3) or an empty collection
+                num_records = connector.export_to_feature_store(feature_store_file_path,
+                                                                batch_size=config.export_batch_size)
+            else:
+                snapshot_file_path = config.snapshot_file_path
+                os.makedirs(os.path.dirname(snapshot_file_path), exist_ok=True)
+                watermark = self.read_watermark()
+
+                if watermark is not None:
+                    low_watermark = decode_watermark_value(watermark["high_watermark"])
+                    snapshot_root, snapshot_extension = os.path.splitext(snapshot_file_path)
+                    delta_file_path = f"{snapshot_root}.delta{snapshot_extension}"
+                    num_delta = connector.export_to_feature_store(
+                        delta_file_path,
+                        batch_size=config.export_batch_size,
+                        query={config.watermark_field: {"$gt": low_watermark, "$lte": high_watermark}})
+                    logging.info(f"Fetched {num_delta} records above watermark {low_watermark}")
+
+                    dataframe = read_feature_store(snapshot_file_path)
+                    if num_delta:
+                        # Updated documents replace their snapshot rows
+                        dataframe = pd.concat([dataframe, read_feature_store(delta_file_path)], ignore_index=True)
+                        dataframe = dataframe.drop_duplicates(subset=self._schema_config["id_columns"], keep="last")
+                        arrow_schema = get_arrow_schema(self._schema_config,
+                                                        columns=connector.get_feature_store_columns())
+                        write_feature_store(dataframe, snapshot_file_path, arrow_schema)
+                    os.remove(delta_file_path)
+                    num_records = len(dataframe)
+                else:
+                    num_records = connector.export_to_feature_store(snapshot_file_path,
+                                                                    batch_size=config.export_batch_size)
+                logging.info(f"Feature store snapshot holds {num_records} records")
+                self.write_watermark(high_watermark, num_records)
+
+                # Every run keeps its own copy of the feature store it was trained on
+                os.makedirs(os.path.dirname(feature_store_file_path), exist_ok=True)
+                shutil.copyfile(snapshot_file_path, feature_store_file_path)
+            logging.info(f"Exported {num_records} records into the feature store")
+
+            if dataframe is None:
+                # Reading the typed feature store back for the train-test split
+                dataframe = read_feature_store(feature_store_file_path)
+            dataframe = apply_schema_dtypes(dataframe.reset_index(drop=True), self._schema_config)
+            logging.info(f"Shape of dataframe: {dataframe.shape}, "
+                         f"memory usage: {dataframe.memory_usage(deep=True).sum() / 1e6:.1f} MB")
             return dataframe
 
         except Exception as e:
             raise USvisaException(e, sys)  # Raising a custom exception if any error occurs
 
-    # Method to split the data into training and testing sets and save them as CSV files
+    def get_test_mask(self, dataframe: DataFrame) -> np.ndarray:
+        """
+        Method Name :   get_test_mask
+        Description :   This method hashes the id columns of every row into split_buckets buckets, the rows
+                        of the first train_test_split_ratio share of the buckets form the test set.
+                        The assignment only depends on the row's ids, so a case always lands in the same
+                        split and appended data only adds rows to each side
+        
+        Output      :   Boolean numpy array, True for test rows
+        On Failure  :   Logs the error and raises a custom exception
+        """
+        try:
+            config = self.data_ingestion_config
+            # category and string columns hash alike, the split does not depend on the file format
+            hashes = pd.util.hash_pandas_object(dataframe[self._schema_config["id_columns"]].astype(str),
+                                                index=False, hash_key=config.split_hash_key).to_numpy()
+            buckets = hashes % np.uint64(config.split_buckets)
+            return buckets < np.uint64(round(config.train_test_split_ratio * config.split_buckets))
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    # Method to split the data into training and testing sets and save them as feature store files
     def split_data_as_train_test(self, dataframe: DataFrame) -> None:
         """
         Method Name :   split_data_as_train_test
-        Description :   This method splits the dataframe into train and test sets based on a split ratio
+        Description :   This method splits the dataframe into train and test sets based on a split ratio,
+                        deterministically from the hash of the id columns
         
-        Output      :   Train and test sets are saved as CSV files
+        Output      :   Train and test sets are saved as parquet (or debug csv) files
         On Failure  :   Logs the error and raises a custom exception
         """
         logging.info("Entered split_data_as_train_test method of Data_Ingestion class")
 
         try:
             # Splitting the data into training and testing sets
-            train_set, test_set = train_test_split(dataframe, test_size=self.data_ingestion_config.train_test_split_ratio)
-            logging.info("Performed train-test split on the dataframe")
+            test_mask = self.get_test_mask(dataframe)
+            train_set, test_set = dataframe[~test_mask], dataframe[test_mask]
+            logging.info(f"Performed train-test split on the dataframe: {len(train_set)} train rows, "
+                         f"{len(test_set)} test rows")
             
             # Creating directories for saving the train and test files if they don't exist
             dir_path = os.path.dirname(self.data_ingestion_config.training_file_path)
             os.makedirs(dir_path, exist_ok=True)
             
-            # Saving the train and test sets as CSV files
+            # Saving the train and test sets with the schema dtypes
             logging.info(f"Exporting train and test data to file paths.")
-            train_set.to_csv(self.data_ingestion_config.training_file_path, index=False, header=True)
-            test_set.to_csv(self.data_ingestion_config.testing_file_path, index=False, header=True)
+            arrow_schema = get_arrow_schema(self._schema_config, columns=list(dataframe.columns))
+            persist = lambda file_path, df: write_feature_store(df, file_path, arrow_schema)
+            self.artifact_store.put(self.data_ingestion_config.training_file_path, train_set, persist)
+            self.artifact_store.put(self.data_ingestion_config.testing_file_path, test_set, persist)
 
             logging.info(f"Exported train and test data successfully.")
         except Exception as e:
@@ -90,7 +246,7 @@ class DataIngestion:
         """
         Method Name :   initiate_data_ingestion
         Description :   This method initiates the data ingestion process by:
-                        - Exporting data from MongoDB
+                        - Exporting data from the data source
                         - Splitting it into train and test sets
                         
         Output      :   Returns the file paths of the train and test datasets as an artifact
@@ -1,32 +1,57 @@
+import hashlib
+import json
+import os
+import shutil
 import sys
+from functools import partial
+from typing import Optional
 
+import imblearn
 import numpy as np
 import pandas as pd
-from imblearn.combine import SMOTEENN
+import scipy
+import scipy.sparse
+import sklearn
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler, OneHotEncoder, OrdinalEncoder, PowerTransformer
 from sklearn.compose import ColumnTransformer
 
-from us_visa.constants import TARGET_COLUMN, SCHEMA_FILE_PATH, CURRENT_YEAR
+from us_visa.constants import TARGET_COLUMN, SCHEMA_FILE_PATH, CURRENT_YEAR, DATA_TRANSFORMATION_CACHE_MANIFEST_FILE_NAME
+from us_visa.data_access.feature_store import apply_schema_dtypes, get_transformer_columns, read_feature_store
 from us_visa.entity.config_entity import DataTransformationConfig
 from us_visa.entity.artifact_entity import DataTransformationArtifact, DataIngestionArtifact, DataValidationArtifact
+from us_visa.entity.reference_sketch import ReferenceSketch, save_reference_sketch
+from us_visa.entity.resampler import Resampler
 from us_visa.exception import USvisaException
 from us_visa.logger import logging
-from us_visa.utils.main_utils import save_object, save_numpy_array_data, read_yaml_file, drop_columns
-from us_visa.entity.estimator import TargetValueMapping
+from us_visa.utils.main_utils import (save_object, save_numpy_array_data, save_feature_matrix,
+                                     get_feature_matrix_file_path, read_yaml_file, drop_columns, add_age_columns,
+                                     get_file_hash, copy_file, write_json_file)
+from us_visa.utils.artifact_store import ArtifactStore
+
+# modules whose code shapes the transformation outputs, part of the cache fingerprint
+FINGERPRINT_MODULES = (__name__, Resampler.__module__, ReferenceSketch.__module__, apply_schema_dtypes.__module__,
+                       save_object.__module__)
+# DataTransformationArtifact fields of the cached files, DataTransformationConfig has the same fields
+CACHED_ARTIFACT_FIELDS = ("transformed_object_file_path", "transformed_train_file_path", "transformed_test_file_path",
+                          "transformed_train_target_file_path", "transformed_test_target_file_path",
+                          "reference_sketch_file_path")
 
 
 
 class DataTransformation:
     def __init__(self, data_ingestion_artifact: DataIngestionArtifact,
                  data_transformation_config: DataTransformationConfig,
-                 data_validation_artifact: DataValidationArtifact):
+                 data_validation_artifact: DataValidationArtifact,
+                 artifact_store: Optional[ArtifactStore] = None):
         """
         :param data_ingestion_artifact: Output reference of data ingestion artifact stage
         :param data_transformation_config: configuration for data transformation
+        :param artifact_store: Hands the preprocessor and arrays to the next stages in memory
         """
         try:
             self.data_ingestion_artifact = data_ingestion_artifact
+            self.artifact_store = artifact_store if artifact_store is not None else ArtifactStore(background=False)
             self.data_transformation_config = data_transformation_config
             self.data_validation_artifact = data_validation_artifact
             self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
@@ -34,17 +59,150 @@ class DataTransformation:
             raise USvisaException(e, sys)
 
     @staticmethod
-    def read_data(file_path) -> pd.DataFrame:
+    def read_data(file_path, columns: Optional[list] = None) -> pd.DataFrame:
         try:
-            return pd.read_csv(file_path)
+            return read_feature_store(file_path, columns=columns)
         except Exception as e:
             raise USvisaException(e, sys)
 
+    def get_data(self, file_path, columns: list) -> pd.DataFrame:
+        """
+        Returns the columns of the in-memory split of data ingestion, read from file_path when resuming,
+        with the compact schema dtypes and the target encoded as int8 TargetValueMapping codes
+        """
+        try:
+            df = self.artifact_store.get(file_path, lambda path: DataTransformation.read_data(path, columns=columns))
+            return apply_schema_dtypes(df[[column for column in df.columns if column in columns]],
+                                       self._schema_config, encode_target=True)
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def add_age_columns(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Derives company_age from yr_of_estab, data shaped by the ingestion pipeline already has it
+        """
+        return add_age_columns(df=df, age_columns=self._schema_config.get('age_columns', {}))
     
+    def get_reference_sketch(self, df: pd.DataFrame) -> ReferenceSketch:
+        """
+        Method Name :   get_reference_sketch
+        Description :   This method sketches the training features: histograms and quantiles of num_features,
+                        frequency tables of the one-hot and ordinal encoded columns, null rates of both
+        
+        Output      :   Returns the ReferenceSketch of the training features
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            categorical_columns = self._schema_config['oh_columns'] + [
+                column for column in self._schema_config['or_columns'] if column not in self._schema_config['oh_columns']]
+            return ReferenceSketch.from_dataframe(df, numerical_columns=self._schema_config['num_features'],
+                                                  categorical_columns=categorical_columns,
+                                                  bins=self.data_transformation_config.sketch_bins,
+                                                  quantiles=self.data_transformation_config.sketch_quantiles)
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def to_feature_matrix(self, features):
+        """
+        Casts the preprocessor output to the feature dtype, as a C contiguous array or a CSR matrix
+        """
+        dtype = self.data_transformation_config.feature_dtype
+        if scipy.sparse.issparse(features):
+            return features.tocsr().astype(dtype, copy=False)
+        return np.ascontiguousarray(features, dtype=dtype)
+
+    def get_fingerprint(self, preprocessor: ColumnTransformer) -> str:
+        """
+        Method Name :   get_fingerprint
+        Description :   This method hashes everything the transformation outputs depend on: the content of the
+                        train and test files, schema.yaml, resampling.yaml, the unfitted preprocessor, the
+                        transformation config, the transformation code and the library versions
+        
+        Output      :   Returns the fingerprint as a sha256 hex digest
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            config = self.data_transformation_config
+            input_file_paths = [self.data_ingestion_artifact.trained_file_path, self.data_ingestion_artifact.test_file_path]
+            for file_path in input_file_paths:
+                # the splits may still be written in the background
+                self.artifact_store.wait(file_path)
+            content = {
+                "data": [get_file_hash(file_path) for file_path in input_file_paths],
+                "schema": get_file_hash(SCHEMA_FILE_PATH),
+                "resampling": get_file_hash(config.resampling_config_file_path),
+                "preprocessor": preprocessor.get_params(deep=True),
+                "config": [config.feature_dtype, config.target_dtype, config.sketch_bins, list(config.sketch_quantiles),
+                           CURRENT_YEAR],
+                "code": [get_file_hash(sys.modules[module].__file__) for module in FINGERPRINT_MODULES],
+                "versions": [np.__version__, pd.__version__, scipy.__version__, sklearn.__version__,
+                             imblearn.__version__],
+            }
+            return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def load_from_cache(self, fingerprint: str) -> Optional[DataTransformationArtifact]:
+        """
+        Copies the cached outputs of fingerprint into this run's artifact directory
+        return the artifact, None when fingerprint is not cached
+        """
+        try:
+            entry_dir = os.path.join(self.data_transformation_config.cache_dir, fingerprint)
+            manifest_file_path = os.path.join(entry_dir, DATA_TRANSFORMATION_CACHE_MANIFEST_FILE_NAME)
+            if not os.path.exists(manifest_file_path):
+                return None
+            with open(manifest_file_path) as file:
+                manifest = json.load(file)
+            file_paths = {}
+            for field, file_name in manifest.items():
+                # the features file name carries their format (.npy / .npz)
+                file_paths[field] = os.path.join(os.path.dirname(getattr(self.data_transformation_config, field)),
+                                                 file_name)
+                copy_file(os.path.join(entry_dir, file_name), file_paths[field])
+            # recently used entries are pruned last
+            os.utime(entry_dir)
+            return DataTransformationArtifact(**file_paths)
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def save_to_cache(self, fingerprint: str, data_transformation_artifact: DataTransformationArtifact) -> None:
+        """
+        Copies the outputs of this run into the cache entry of fingerprint, once they are written, and removes
+        the least recently used entries beyond cache_max_entries. Failures are only logged.
+        """
+        config = self.data_transformation_config
+        entry_dir = os.path.join(config.cache_dir, fingerprint)
+        tmp_dir = f"{entry_dir}.tmp-{os.getpid()}"
+        try:
+            if os.path.exists(entry_dir):
+                return
+            manifest = {}
+            for field in CACHED_ARTIFACT_FIELDS:
+                file_path = getattr(data_transformation_artifact, field)
+                self.artifact_store.wait(file_path)
+                copy_file(file_path, os.path.join(tmp_dir, os.path.basename(file_path)))
+                manifest[field] = os.path.basename(file_path)
+            # the manifest is written last and the entry renamed into place, readers never see a partial entry
+            write_json_file(os.path.join(tmp_dir, DATA_TRANSFORMATION_CACHE_MANIFEST_FILE_NAME), manifest)
+            os.rename(tmp_dir, entry_dir)
+            logging.info(f"Cached the transformation outputs under {entry_dir}")
+
+            entries = sorted((os.path.join(config.cache_dir, name) for name in os.listdir(config.cache_dir)
+                              if ".tmp-" not in name), key=os.path.getmtime, reverse=True)
+            for stale_entry in entries[config.cache_max_entries:]:
+                shutil.rmtree(stale_entry, ignore_errors=True)
+        except Exception as e:
+            logging.info(f"Could not cache the transformation outputs: {e}")
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
     def get_data_transformer_object(self) -> Pipeline:
         """
         Method Name :   get_data_transformer_object
-        Description :   This method creates and returns a data transformer object for the data
+        Description :   This method creates and returns a data transformer object for the data, its output is
+                        a CSR matrix (the one-hot columns stay sparse) when the density of the output is below
+                        DATA_TRANSFORMATION_SPARSE_THRESHOLD
         
         Output      :   data transformer object is created and returned 
         On Failure  :   Write an exception log and then raise an exception
@@ -78,7 +236,8 @@ class DataTransformation:
                     ("Ordinal_Encoder", ordinal_encoder, or_columns),
                     ("Transformer", transform_pipe, transform_columns),
                     ("StandardScaler", numeric_transformer, num_features)
-                ]
+                ],
+                sparse_threshold=self.data_transformation_config.sparse_threshold
             )
 
             logging.info("Created preprocessor object from ColumnTransformer")
@@ -105,93 +264,110 @@ class DataTransformation:
                 preprocessor = self.get_data_transformer_object()
                 logging.info("Got the preprocessor object")
 
-                train_df = DataTransformation.read_data(file_path=self.data_ingestion_artifact.trained_file_path)
-                test_df = DataTransformation.read_data(file_path=self.data_ingestion_artifact.test_file_path)
+                fingerprint = self.get_fingerprint(preprocessor) if self.data_transformation_config.cache_enabled else None
+                cached_artifact = self.load_from_cache(fingerprint) if fingerprint is not None else None
+                if cached_artifact is not None:
+                    logging.info(f"Reusing the cached preprocessor and arrays of fingerprint {fingerprint}")
+                    return cached_artifact
+
+                # Only the columns used by the preprocessor are parsed
+                columns = get_transformer_columns(self._schema_config) + [TARGET_COLUMN]
+                train_df = self.get_data(file_path=self.data_ingestion_artifact.trained_file_path, columns=columns)
+                test_df = self.get_data(file_path=self.data_ingestion_artifact.test_file_path, columns=columns)
 
-                input_feature_train_df = train_df.drop(columns=[TARGET_COLUMN], axis=1)
+                input_feature_train_df = train_df.drop(columns=[TARGET_COLUMN])
                 target_feature_train_df = train_df[TARGET_COLUMN]
 
                 logging.info("Got train features and test features of Training dataset")
 
-                input_feature_train_df['company_age'] = CURRENT_YEAR-input_feature_train_df['yr_of_estab']
+                input_feature_train_df = self.add_age_columns(input_feature_train_df)
 
                 logging.info("Added company_age column to the Training dataset")
 
+                reference_sketch = self.get_reference_sketch(input_feature_train_df)
+
                 drop_cols = self._schema_config['drop_columns']
 
                 logging.info("drop the columns in drop_cols of Training dataset")
 
-                input_feature_train_df = drop_columns(df=input_feature_train_df, cols = drop_cols)
+                input_feature_train_df = drop_columns(df=input_feature_train_df,
+                                                       cols = [col for col in drop_cols if col in input_feature_train_df])
                 
-                target_feature_train_df = target_feature_train_df.replace(
-                    TargetValueMapping()._asdict()
-                )
 
-
-                input_feature_test_df = test_df.drop(columns=[TARGET_COLUMN], axis=1)
+                input_feature_test_df = test_df.drop(columns=[TARGET_COLUMN])
 
                 target_feature_test_df = test_df[TARGET_COLUMN]
 
 
-                input_feature_test_df['company_age'] = CURRENT_YEAR-input_feature_test_df['yr_of_estab']
+                input_feature_test_df = self.add_age_columns(input_feature_test_df)
 
                 logging.info("Added company_age column to the Test dataset")
 
-                input_feature_test_df = drop_columns(df=input_feature_test_df, cols = drop_cols)
+                input_feature_test_df = drop_columns(df=input_feature_test_df,
+                                                       cols = [col for col in drop_cols if col in input_feature_test_df])
 
                 logging.info("drop the columns in drop_cols of Test dataset")
 
-                target_feature_test_df = target_feature_test_df.replace(
-                TargetValueMapping()._asdict()
-                )
-
                 logging.info("Got train features and test features of Testing dataset")
 
                 logging.info(
                     "Applying preprocessing object on training dataframe and testing dataframe"
                 )
 
-                input_feature_train_arr = preprocessor.fit_transform(input_feature_train_df)
+                # cast before resampling, the samplers keep the dtype
+                input_feature_train_arr = self.to_feature_matrix(preprocessor.fit_transform(input_feature_train_df))
 
                 logging.info(
                     "Used the preprocessor object to fit transform the train features"
                 )
 
-                input_feature_test_arr = preprocessor.transform(input_feature_test_df)
+                input_feature_test_arr = self.to_feature_matrix(preprocessor.transform(input_feature_test_df))
 
                 logging.info("Used the preprocessor object to transform the test features")
 
-                logging.info("Applying SMOTEENN on Training dataset")
+                resampler = Resampler(resampling_config=read_yaml_file(
+                    file_path=self.data_transformation_config.resampling_config_file_path))
 
-                smt = SMOTEENN(sampling_strategy="minority")
+                logging.info(f"Applying {resampler.strategy} resampling on Training dataset")
 
-                input_feature_train_final, target_feature_train_final = smt.fit_resample(
+                input_feature_train_final, target_feature_train_final = resampler.fit_resample(
                     input_feature_train_arr, target_feature_train_df
                 )
 
-                logging.info("Applied SMOTEENN on training dataset")
-
-                logging.info("Applying SMOTEENN on testing dataset")
-
-                input_feature_test_final, target_feature_test_final = smt.fit_resample(
-                    input_feature_test_arr, target_feature_test_df
-                )
-
-                logging.info("Applied SMOTEENN on testing dataset")
-
-                logging.info("Created train array and test array")
-
-                train_arr = np.c_[
-                    input_feature_train_final, np.array(target_feature_train_final)
-                ]
-
-                test_arr = np.c_[
-                    input_feature_test_final, np.array(target_feature_test_final)
-                ]
-
-                save_object(self.data_transformation_config.transformed_object_file_path, preprocessor)
-                save_numpy_array_data(self.data_transformation_config.transformed_train_file_path, array=train_arr)
-                save_numpy_array_data(self.data_transformation_config.transformed_test_file_path, array=test_arr)
+                logging.info(f"Applied {resampler.strategy} resampling on training dataset, "
+                             "the testing dataset keeps its class balance")
+
+                input_feature_test_final, target_feature_test_final = input_feature_test_arr, target_feature_test_df
+
+                input_feature_train_final = self.to_feature_matrix(input_feature_train_final)
+                input_feature_test_final = self.to_feature_matrix(input_feature_test_final)
+                target_feature_train_final = np.asarray(target_feature_train_final,
+                                                        dtype=self.data_transformation_config.target_dtype)
+                target_feature_test_final = np.asarray(target_feature_test_final,
+                                                       dtype=self.data_transformation_config.target_dtype)
+
+                logging.info(f"Created {'sparse' if scipy.sparse.issparse(input_feature_train_final) else 'dense'} "
+                             f"train features {input_feature_train_final.shape} and test features "
+                             f"{input_feature_test_final.shape}, the targets are kept apart")
+
+                # features and targets are stored separately, sparse features as CSR .npz files
+                transformed_train_file_path = get_feature_matrix_file_path(
+                    self.data_transformation_config.transformed_train_file_path,
+                    sparse=scipy.sparse.issparse(input_feature_train_final))
+                transformed_test_file_path = get_feature_matrix_file_path(
+                    self.data_transformation_config.transformed_test_file_path,
+                    sparse=scipy.sparse.issparse(input_feature_test_final))
+
+                self.artifact_store.put(self.data_transformation_config.transformed_object_file_path, preprocessor,
+                                        partial(save_object, codec=self.data_transformation_config.transformed_object_codec))
+                self.artifact_store.put(self.data_transformation_config.reference_sketch_file_path, reference_sketch,
+                                        save_reference_sketch)
+                self.artifact_store.put(transformed_train_file_path, input_feature_train_final, save_feature_matrix)
+                self.artifact_store.put(transformed_test_file_path, input_feature_test_final, save_feature_matrix)
+                self.artifact_store.put(self.data_transformation_config.transformed_train_target_file_path,
+                                        target_feature_train_final, save_numpy_array_data)
+                self.artifact_store.put(self.data_transformation_config.transformed_test_target_file_path,
+                                        target_feature_test_final, save_numpy_array_data)
 
                 logging.info("Saved the preprocessor object")
 
@@ -201,9 +377,14 @@ class DataTransformation:
 
                 data_transformation_artifact = DataTransformationArtifact(
                     transformed_object_file_path=self.data_transformation_config.transformed_object_file_path,
-                    transformed_train_file_path=self.data_transformation_config.transformed_train_file_path,
-                    transformed_test_file_path=self.data_transformation_config.transformed_test_file_path
+                    transformed_train_file_path=transformed_train_file_path,
+                    transformed_test_file_path=transformed_test_file_path,
+                    transformed_train_target_file_path=self.data_transformation_config.transformed_train_target_file_path,
+                    transformed_test_target_file_path=self.data_transformation_config.transformed_test_target_file_path,
+                    reference_sketch_file_path=self.data_transformation_config.reference_sketch_file_path
                 )
+                if fingerprint is not None:
+                    self.save_to_cache(fingerprint, data_transformation_artifact)
                 return data_transformation_artifact
             else:
                 raise Exception(self.data_validation_artifact.message)
@@ -1,33 +1,114 @@
-import json
 import sys
+from typing import List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
-from evidently.model_profile import Profile
-from evidently.model_profile.sections import DataDriftProfileSection
-
 from pandas import DataFrame
 
 from us_visa.exception import USvisaException
 from us_visa.logger import logging
-from us_visa.utils.main_utils import read_yaml_file, write_yaml_file
+from us_visa.utils.main_utils import read_yaml_file, write_json_file, add_age_columns
+from us_visa.utils.artifact_store import ArtifactStore
 from us_visa.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact
 from us_visa.entity.config_entity import DataValidationConfig
-from us_visa.constants import SCHEMA_FILE_PATH
+from us_visa.entity.reference_sketch import ReferenceSketch
+from us_visa.cloud_storage.model_registry import ModelRegistry
+from us_visa.cloud_storage.storage_factory import get_storage_service
+from us_visa.entity.schema_validator import SchemaValidator
+from us_visa.constants import (SCHEMA_FILE_PATH, TARGET_COLUMN, DATA_VALIDATION_DRIFT_MODE_FULL,
+                               DATA_VALIDATION_DRIFT_MODE_SAMPLE)
+from us_visa.data_access.aggregation import get_shaped_columns
+from us_visa.data_access.feature_store import get_schema_columns, read_visa_data
+from us_visa.utils.drift import (DRIFT_TEST_KS, DRIFT_TEST_TV, binned_ks_test, categorical_drift, get_category_counts,
+                                 ks_2samp_test, population_stability_index)
+
+DRIFT_SAMPLING_UNIFORM = "uniform"
+DRIFT_SAMPLING_STRATIFIED = "stratified"
+
+
+def get_sample_orders(num_rows: int, rng: np.random.Generator, strata: Optional[np.ndarray] = None) -> List[np.ndarray]:
+    """
+    Random orders of the rows of every stratum (strata holds one code per row), of all the rows when
+    strata is None. take_sample draws nested samples of growing size from them.
+    """
+    if strata is None:
+        return [rng.permutation(num_rows)]
+    return [rng.permutation(np.flatnonzero(strata == stratum)) for stratum in np.unique(strata)]
+
+
+def take_sample(orders: List[np.ndarray], sample_size: int) -> np.ndarray:
+    """
+    Rows of a sample of about sample_size rows: the same prefix share of every order, so strata keep their
+    proportions and a sample contains every smaller one
+    """
+    num_rows = sum(len(order) for order in orders)
+    if sample_size >= num_rows:
+        return np.concatenate(orders)
+    return np.concatenate([order[:int(round(sample_size * len(order) / num_rows))] for order in orders])
+
+
+def dkw_epsilon(num_values: int, delta: float) -> float:
+    """
+    Dvoretzky-Kiefer-Wolfowitz bound: the empirical CDF of num_values values is within epsilon of the
+    true CDF everywhere with probability 1 - delta
+    """
+    return float(np.sqrt(np.log(2 / delta) / (2 * num_values))) if num_values else 1.0
+
+
+def l1_epsilon(num_values: int, num_categories: int, delta: float) -> float:
+    """
+    Bretagnolle-Huber-Carol bound: the empirical category frequencies of num_values values are within
+    epsilon of the true ones in L1 distance with probability 1 - delta
+    """
+    return float(np.sqrt(2 * (num_categories * np.log(2) + np.log(1 / delta)) / num_values)) if num_values else 2.0
+
+
+def ks_critical_value(reference_size: int, current_size: int, p_value_threshold: float) -> float:
+    """
+    KS distance above which the asymptotic two sample test of these sizes rejects at p_value_threshold
+    """
+    if not reference_size or not current_size:
+        return 1.0
+    return float(np.sqrt(-np.log(p_value_threshold / 2) / 2 * (reference_size + current_size) /
+                         (reference_size * current_size)))
 
 
 class DataValidation:
-    def __init__(self, data_ingestion_artifact: DataIngestionArtifact, data_validation_config: DataValidationConfig):
+    def __init__(self, data_ingestion_artifact: DataIngestionArtifact, data_validation_config: DataValidationConfig,
+                 artifact_store: Optional[ArtifactStore] = None):
         """
         :param data_ingestion_artifact: Output reference of data ingestion artifact stage
         :param data_validation_config: configuration for data validation
+        :param artifact_store: In-memory train and test sets of data ingestion
         """
         try:
             self.data_ingestion_artifact = data_ingestion_artifact
             self.data_validation_config = data_validation_config
+            self.artifact_store = artifact_store if artifact_store is not None else ArtifactStore(background=False)
             self._schema_config =read_yaml_file(file_path=SCHEMA_FILE_PATH)
+            self.schema_validator = SchemaValidator(self._schema_config,
+                                                    max_null_rate=data_validation_config.max_null_rate,
+                                                    max_out_of_range_rate=data_validation_config.max_out_of_range_rate)
         except Exception as e:
             raise USvisaException(e,sys)
 
+    def get_expected_columns(self, dataframe: DataFrame) -> list:
+        """
+        Method Name :   get_expected_columns
+        Description :   This method returns the schema columns, or the columns of the shaping pipeline
+                        when the data was shaped in the database during ingestion (age columns present)
+        
+        Output      :   Returns list of expected column names
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            age_columns = self._schema_config.get("age_columns", {})
+            if age_columns and all(column in dataframe.columns for column in age_columns):
+                return get_shaped_columns(self._schema_config)
+            return get_schema_columns(self._schema_config)
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
     def validate_number_of_columns(self, dataframe: DataFrame) -> bool:
         """
         Method Name :   validate_number_of_columns
@@ -37,7 +118,7 @@ class DataValidation:
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
-            status = len(dataframe.columns) == len(self._schema_config["columns"])
+            status = len(dataframe.columns) == len(self.get_expected_columns(dataframe))
             logging.info(f"Is required column present: [{status}]")
             return status
         except Exception as e:
@@ -53,9 +134,11 @@ class DataValidation:
         """
         try:
             dataframe_columns = df.columns
+            expected_columns = self.get_expected_columns(df)
             missing_numerical_columns = []
             missing_categorical_columns = []
-            for column in self._schema_config["numerical_columns"]:
+            numerical_columns = self._schema_config["numerical_columns"] + list(self._schema_config.get("age_columns", {}))
+            for column in [column for column in numerical_columns if column in expected_columns]:
                 if column not in dataframe_columns:
                     missing_numerical_columns.append(column)
 
@@ -63,7 +146,7 @@ class DataValidation:
                 logging.info(f"Missing numerical column: {missing_numerical_columns}")
 
 
-            for column in self._schema_config["categorical_columns"]:
+            for column in [column for column in self._schema_config["categorical_columns"] if column in expected_columns]:
                 if column not in dataframe_columns:
                     missing_categorical_columns.append(column)
 
@@ -74,40 +157,277 @@ class DataValidation:
         except Exception as e:
             raise USvisaException(e, sys) from e
 
-    @staticmethod
-    def read_data(file_path) -> DataFrame:
+    def read_data(self, file_path) -> DataFrame:
         try:
-            return pd.read_csv(file_path)
+            return read_visa_data(file_path, self._schema_config)
         except Exception as e:
             raise USvisaException(e, sys)
 
+    def get_drift_columns(self, reference_df: DataFrame, current_df: DataFrame) -> Tuple[List[str], List[str]]:
+        """
+        Method Name :   get_drift_columns
+        Description :   This method returns the numerical and categorical columns compared for drift, taken
+                        from the schema column roles. Identifier columns are unique per row and never compared
+        
+        Output      :   Returns the numerical and the categorical column names present in both dataframes
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            id_columns = self._schema_config.get("id_columns", [])
+            numerical_columns = self._schema_config["numerical_columns"] + list(self._schema_config.get("age_columns", {}))
+            categorical_columns = self._schema_config["categorical_columns"]
+
+            def is_compared(column: str) -> bool:
+                return column not in id_columns and column in reference_df.columns and column in current_df.columns
+
+            return ([column for column in numerical_columns if is_compared(column)],
+                    [column for column in categorical_columns if is_compared(column)])
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def get_categorical_drift(self, reference_counts: np.ndarray, current_counts: np.ndarray) -> dict:
+        """
+        Chi-square test and PSI of two aligned category count vectors, drift decided by the configured test
+        """
+        config = self.data_validation_config
+        return categorical_drift(reference_counts, current_counts, test=config.categorical_drift_test,
+                                 p_value_threshold=config.drift_p_value_threshold, psi_threshold=config.psi_threshold)
+
+    def write_drift_report(self, features: dict, reference_rows: int, current_rows: int,
+                           details: Optional[dict] = None, file_path: Optional[str] = None) -> bool:
+        """
+        Method Name :   write_drift_report
+        Description :   This method decides dataset drift from the per column results (drifted share of the
+                        compared columns) and writes the JSON drift report to file_path (by default the
+                        train/test drift report)
+        
+        Output      :   Returns bool value, True when the dataset drifted
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            config = self.data_validation_config
+            n_features = len(features)
+            n_drifted_features = sum(feature["drift_detected"] for feature in features.values())
+            share_of_drifted_features = n_drifted_features / n_features if n_features else 0.0
+            drift_status = n_features > 0 and share_of_drifted_features >= config.drift_share_threshold
+
+            report = {
+                "dataset_drift": drift_status,
+                "n_features": n_features,
+                "n_drifted_features": n_drifted_features,
+                "share_of_drifted_features": share_of_drifted_features,
+                "reference_rows": reference_rows,
+                "current_rows": current_rows,
+                "thresholds": {"p_value": config.drift_p_value_threshold, "psi": config.psi_threshold,
+                               "drift_share": config.drift_share_threshold},
+                **(details or {}),
+                "features": features,
+            }
+            write_json_file(file_path=file_path or config.drift_report_file_path, content=report)
+
+            logging.info(f"{n_drifted_features}/{n_features} drift detected.")
+            return drift_status
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
     def detect_dataset_drift(self, reference_df: DataFrame, current_df: DataFrame, ) -> bool:
         """
         Method Name :   detect_dataset_drift
-        Description :   This method validates if drift is detected
+        Description :   This method compares every numerical column with a KS test and every categorical
+                        column with a chi-square test (or PSI, see DATA_VALIDATION_CATEGORICAL_DRIFT_TEST)
+                        and writes the per column results into the JSON drift report
         
         Output      :   Returns bool value based on validation results
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
-            data_drift_profile = Profile(sections=[DataDriftProfileSection()])
+            numerical_columns, categorical_columns = self.get_drift_columns(reference_df, current_df)
+            features = {}
 
-            data_drift_profile.calculate(reference_df, current_df)
+            for column in numerical_columns:
+                statistic, p_value = ks_2samp_test(reference_df[column].to_numpy(dtype="float64", na_value=np.nan),
+                                                   current_df[column].to_numpy(dtype="float64", na_value=np.nan))
+                features[column] = {"type": "numerical", "test": DRIFT_TEST_KS, "statistic": statistic,
+                                    "p_value": p_value,
+                                    "drift_detected": p_value < self.data_validation_config.drift_p_value_threshold}
 
-            report = data_drift_profile.json()
-            json_report = json.loads(report)
+            for column in categorical_columns:
+                _, reference_counts, current_counts = get_category_counts(reference_df[column], current_df[column])
+                features[column] = self.get_categorical_drift(reference_counts, current_counts)
 
-            write_yaml_file(file_path=self.data_validation_config.drift_report_file_path, content=json_report)
+            return self.write_drift_report(features, reference_rows=len(reference_df), current_rows=len(current_df),
+                                           details={"mode": DATA_VALIDATION_DRIFT_MODE_FULL})
+        except Exception as e:
+            raise USvisaException(e, sys) from e
 
-            n_features = json_report["data_drift"]["data"]["metrics"]["n_features"]
-            n_drifted_features = json_report["data_drift"]["data"]["metrics"]["n_drifted_features"]
+    def detect_dataset_drift_sampled(self, reference_df: DataFrame, current_df: DataFrame) -> bool:
+        """
+        Method Name :   detect_dataset_drift_sampled
+        Description :   This method compares nested uniform or stratified (by the target) samples of growing size.
+                        Every column gets a confidence interval of its distance between the two datasets, KS
+                        distance with DKW bounds for numerical columns and total variation distance with
+                        Bretagnolle-Huber-Carol bounds for categorical ones. A column is settled once its
+                        interval is above or below its threshold (DATA_VALIDATION_DRIFT_MIN_EFFECT, or the KS
+                        critical value of the full data sizes when larger), and sampling stops once every column
+                        or the dataset verdict is settled. The bounds hold jointly over all the sample rounds.
+        
+        Output      :   Returns bool value based on validation results
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            config = self.data_validation_config
+            numerical_columns, categorical_columns = self.get_drift_columns(reference_df, current_df)
+            rng = np.random.default_rng(config.drift_sample_seed)
+            stratify = (config.drift_sampling == DRIFT_SAMPLING_STRATIFIED and TARGET_COLUMN in reference_df.columns
+                        and TARGET_COLUMN in current_df.columns)
 
-            logging.info(f"{n_drifted_features}/{n_features} drift detected.")
-            drift_status = json_report["data_drift"]["data"]["metrics"]["dataset_drift"]
-            return drift_status
+            def sample_orders(dataframe: DataFrame) -> List[np.ndarray]:
+                strata = pd.factorize(dataframe[TARGET_COLUMN])[0] if stratify else None
+                return get_sample_orders(len(dataframe), rng, strata)
+
+            reference_orders, current_orders = sample_orders(reference_df), sample_orders(current_df)
+
+            # per column values (numerical) or category codes over the union of categories (categorical)
+            columns, thresholds = {}, {}
+            for column in numerical_columns:
+                reference = reference_df[column].to_numpy(dtype="float64", na_value=np.nan)
+                current = current_df[column].to_numpy(dtype="float64", na_value=np.nan)
+                columns[column] = (reference, current)
+                critical_value = ks_critical_value(int((~np.isnan(reference)).sum()), int((~np.isnan(current)).sum()),
+                                                   config.drift_p_value_threshold)
+                thresholds[column] = max(config.drift_min_effect, critical_value)
+            for column in categorical_columns:
+                categories = reference_df[column].astype("category").cat.categories.union(
+                    current_df[column].astype("category").cat.categories)
+                columns[column] = (pd.Categorical(reference_df[column], categories=categories).codes,
+                                   pd.Categorical(current_df[column], categories=categories).codes)
+                thresholds[column] = config.drift_min_effect
+
+            max_size = max(len(reference_df), len(current_df), 1)
+            initial_size = max(config.drift_initial_sample_size, 1)
+            num_rounds = 1 + max(0, int(np.ceil(np.log(max_size / initial_size) / np.log(config.drift_sample_growth))))
+            # union bound over the two samples and every round
+            delta = (1 - config.drift_confidence) / (2 * num_rounds)
+
+            features, pending = {}, list(columns)
+            sample_size = initial_size
+            share_threshold = config.drift_share_threshold * len(columns)
+            while pending:
+                reference_rows = take_sample(reference_orders, sample_size)
+                current_rows = take_sample(current_orders, sample_size)
+                exhausted = len(reference_rows) == len(reference_df) and len(current_rows) == len(current_df)
+
+                for column in list(pending):
+                    reference, current = columns[column]
+                    if column in numerical_columns:
+                        reference, current = reference[reference_rows], current[current_rows]
+                        statistic, _ = ks_2samp_test(reference, current)
+                        margin = (dkw_epsilon(int((~np.isnan(reference)).sum()), delta) +
+                                  dkw_epsilon(int((~np.isnan(current)).sum()), delta))
+                        feature = {"type": "numerical", "test": DRIFT_TEST_KS}
+                    else:
+                        num_categories = max(int(max(reference.max(initial=-1), current.max(initial=-1))) + 1, 1)
+                        reference, current = reference[reference_rows], current[current_rows]
+                        reference_counts = np.bincount(reference[reference >= 0], minlength=num_categories)
+                        current_counts = np.bincount(current[current >= 0], minlength=num_categories)
+                        statistic = 0.5 * float(np.abs(reference_counts / max(reference_counts.sum(), 1) -
+                                                       current_counts / max(current_counts.sum(), 1)).sum())
+                        margin = (l1_epsilon(int(reference_counts.sum()), num_categories, delta) +
+                                  l1_epsilon(int(current_counts.sum()), num_categories, delta)) / 2
+                        feature = {"type": "categorical", "test": DRIFT_TEST_TV}
+
+                    threshold = thresholds[column]
+                    lower_bound, upper_bound = max(statistic - margin, 0.0), min(statistic + margin, 1.0)
+                    settled = lower_bound > threshold or upper_bound <= threshold
+                    features[column] = {**feature, "statistic": statistic, "lower_bound": lower_bound,
+                                        "upper_bound": upper_bound, "threshold": threshold,
+                                        "sample_rows": [len(reference_rows), len(current_rows)],
+                                        "settled": settled,
+                                        # unsettled columns fall back to the point estimate
+                                        "drift_detected": lower_bound > threshold if settled else statistic > threshold}
+                    if settled:
+                        pending.remove(column)
+
+                settled_drift = sum(f["settled"] and f["drift_detected"] for f in features.values())
+                settled_no_drift = sum(f["settled"] and not f["drift_detected"] for f in features.values())
+                if settled_drift >= share_threshold or len(columns) - settled_no_drift < share_threshold:
+                    logging.info(f"Dataset drift verdict settled with samples of {sample_size} rows")
+                    break
+                if exhausted:
+                    break
+                sample_size *= config.drift_sample_growth
+
+            return self.write_drift_report(features, reference_rows=len(reference_df), current_rows=len(current_df),
+                                           details={"mode": DATA_VALIDATION_DRIFT_MODE_SAMPLE,
+                                                    "sampling": DRIFT_SAMPLING_STRATIFIED if stratify
+                                                    else DRIFT_SAMPLING_UNIFORM,
+                                                    "confidence": config.drift_confidence,
+                                                    "min_effect": config.drift_min_effect})
         except Exception as e:
             raise USvisaException(e, sys) from e
 
+    def detect_sketch_drift(self, reference_sketch: ReferenceSketch, current_df: DataFrame) -> bool:
+        """
+        Method Name :   detect_sketch_drift
+        Description :   This method compares current_df with the reference sketch stored with a model instead of
+                        the training data: the current values are counted into the sketch bins and categories,
+                        then a binned KS test per numerical column and the categorical tests run in O(bins)
+        
+        Output      :   Returns bool value, True when the dataset drifted
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            current_df = add_age_columns(df=current_df.copy(deep=False), age_columns={
+                age_column: year_column for age_column, year_column in self._schema_config.get("age_columns", {}).items()
+                if year_column in current_df.columns})
+            features = {}
+
+            for column, sketch in reference_sketch.numerical.items():
+                if column not in current_df.columns:
+                    continue
+                values = current_df[column].to_numpy(dtype="float64", na_value=np.nan)
+                reference_counts, current_counts = np.asarray(sketch.counts), sketch.histogram(values)
+                statistic, p_value = binned_ks_test(reference_counts, current_counts)
+                features[column] = {"type": "numerical", "test": DRIFT_TEST_KS, "statistic": statistic,
+                                    "p_value": p_value, "psi": population_stability_index(reference_counts, current_counts),
+                                    "null_rate": float(np.isnan(values).mean()) if len(values) else 0.0,
+                                    "reference_null_rate": sketch.null_rate,
+                                    "drift_detected": p_value < self.data_validation_config.drift_p_value_threshold}
+
+            for column, sketch in reference_sketch.categorical.items():
+                if column not in current_df.columns:
+                    continue
+                _, reference_counts, current_counts = sketch.frequency_counts(current_df[column])
+                features[column] = {**self.get_categorical_drift(reference_counts, current_counts),
+                                    "null_rate": float(current_df[column].isna().mean()) if len(current_df) else 0.0,
+                                    "reference_null_rate": sketch.null_rate}
+
+            return self.write_drift_report(features, reference_rows=reference_sketch.num_rows,
+                                           current_rows=len(current_df),
+                                           file_path=self.data_validation_config.production_drift_report_file_path)
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def get_production_sketch(self) -> Optional[ReferenceSketch]:
+        """
+        Method Name :   get_production_sketch
+        Description :   This method returns the reference sketch published with the latest model of the model
+                        registry, only the small sketch object is read, not the model. None without production
+                        model, for versions registered without sketch or when the registry is unreachable (the
+                        production drift check is skipped, it never fails the validation)
+        
+        Output      :   Returns the ReferenceSketch of the production model or None
+        """
+        try:
+            config = self.data_validation_config
+            registry = ModelRegistry(storage=get_storage_service(), bucket_name=config.model_bucket_name,
+                                     registry_prefix=config.s3_model_key_path)
+            content = registry.get_latest_reference_sketch()
+            return ReferenceSketch.from_dict(content) if content is not None else None
+        except Exception as e:
+            logging.info(f"Could not load the reference sketch of the production model: {e}")
+            return None
+
     def initiate_data_validation(self) -> DataValidationArtifact:
         """
         Method Name :   initiate_data_validation
@@ -120,8 +440,8 @@ class DataValidation:
         try:
             validation_error_msg = ""
             logging.info("Starting data validation")
-            train_df, test_df = (DataValidation.read_data(file_path=self.data_ingestion_artifact.trained_file_path),
-                                 DataValidation.read_data(file_path=self.data_ingestion_artifact.test_file_path))
+            train_df, test_df = (self.artifact_store.get(self.data_ingestion_artifact.trained_file_path, self.read_data),
+                                 self.artifact_store.get(self.data_ingestion_artifact.test_file_path, self.read_data))
 
             status = self.validate_number_of_columns(dataframe=train_df)
             logging.info(f"All required columns present in training dataframe: {status}")
@@ -142,15 +462,35 @@ class DataValidation:
             if not status:
                 validation_error_msg += f"columns are missing in test dataframe."
 
+            # Types, category domains, ranges, null rates and id uniqueness
+            schema_report = {"train": self.schema_validator.validate(train_df, self.get_expected_columns(train_df)),
+                             "test": self.schema_validator.validate(test_df, self.get_expected_columns(test_df))}
+            write_json_file(file_path=self.data_validation_config.schema_report_file_path, content=schema_report)
+            for split, report in schema_report.items():
+                if report["failed_columns"]:
+                    validation_error_msg += f"Schema validation failed for {report['failed_columns']} in {split} dataframe."
+
             validation_status = len(validation_error_msg) == 0
 
             if validation_status:
-                drift_status = self.detect_dataset_drift(train_df, test_df)
+                if self.data_validation_config.drift_mode == DATA_VALIDATION_DRIFT_MODE_SAMPLE:
+                    drift_status = self.detect_dataset_drift_sampled(train_df, test_df)
+                else:
+                    drift_status = self.detect_dataset_drift(train_df, test_df)
                 if drift_status:
                     logging.info(f"Drift detected.")
                     validation_error_msg = "Drift detected"
                 else:
                     validation_error_msg = "Drift not detected"
+
+                # the ingested data against the training data of the production model, through its sketch
+                production_sketch = self.get_production_sketch() if self.data_validation_config.production_drift else None
+                if production_sketch is not None:
+                    if self.detect_sketch_drift(production_sketch, pd.concat([train_df, test_df], ignore_index=True)):
+                        logging.info("Drift from the production model training data detected.")
+                        validation_error_msg += ", drift from production model detected"
+                    else:
+                        validation_error_msg += ", drift from production model not detected"
             else:
                 logging.info(f"Validation_error: {validation_error_msg}")
                 
@@ -2,15 +2,16 @@ from us_visa.entity.config_entity import ModelEvaluationConfig
 from us_visa.entity.artifact_entity import ModelTrainerArtifact, DataIngestionArtifact, ModelEvaluationArtifact
 from sklearn.metrics import f1_score
 from us_visa.exception import USvisaException
-from us_visa.constants import TARGET_COLUMN, CURRENT_YEAR
+from us_visa.constants import TARGET_COLUMN, SCHEMA_FILE_PATH
 from us_visa.logger import logging
 import sys
-import pandas as pd
 from typing import Optional
 from us_visa.entity.s3_estimator import USvisaEstimator
 from dataclasses import dataclass
 from us_visa.entity.estimator import USvisaModel
-from us_visa.entity.estimator import TargetValueMapping
+from us_visa.utils.main_utils import add_age_columns, read_yaml_file
+from us_visa.data_access.feature_store import apply_schema_dtypes, get_transformer_columns, read_feature_store
+from us_visa.utils.artifact_store import ArtifactStore
 
 @dataclass
 class EvaluateModelResponse:
@@ -23,9 +24,10 @@ class EvaluateModelResponse:
 class ModelEvaluation:
 
     def __init__(self, model_eval_config: ModelEvaluationConfig, data_ingestion_artifact: DataIngestionArtifact,
-                 model_trainer_artifact: ModelTrainerArtifact):
+                 model_trainer_artifact: ModelTrainerArtifact, artifact_store: Optional[ArtifactStore] = None):
         try:
             self.model_eval_config = model_eval_config
+            self.artifact_store = artifact_store if artifact_store is not None else ArtifactStore(background=False)
             self.data_ingestion_artifact = data_ingestion_artifact
             self.model_trainer_artifact = model_trainer_artifact
         except Exception as e:
@@ -36,7 +38,7 @@ class ModelEvaluation:
         Method Name :   get_best_model
         Description :   This function is used to get model in production
         
-        Output      :   Returns model object if available in s3 storage
+        Output      :   Returns model object if a latest version is available in the model registry
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
@@ -61,13 +63,15 @@ class ModelEvaluation:
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
-            test_df = pd.read_csv(self.data_ingestion_artifact.test_file_path)
-            test_df['company_age'] = CURRENT_YEAR-test_df['yr_of_estab']
+            schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+            columns = get_transformer_columns(schema_config) + [TARGET_COLUMN]
+            test_df = self.artifact_store.get(self.data_ingestion_artifact.test_file_path,
+                                              lambda path: read_feature_store(path, columns=columns))
+            test_df = apply_schema_dtypes(test_df[[column for column in test_df.columns if column in columns]],
+                                          schema_config, encode_target=True)
+            test_df = add_age_columns(df=test_df, age_columns=schema_config.get('age_columns', {}))
 
             x, y = test_df.drop(TARGET_COLUMN, axis=1), test_df[TARGET_COLUMN]
-            y = y.replace(
-                TargetValueMapping()._asdict()
-            )
 
             # trained_model = load_object(file_path=self.model_trainer_artifact.trained_model_file_path)
             trained_model_f1_score = self.model_trainer_artifact.metric_artifact.f1_score
@@ -106,7 +110,9 @@ class ModelEvaluation:
                 is_model_accepted=evaluate_model_response.is_model_accepted,
                 s3_model_path=s3_model_path,
                 trained_model_path=self.model_trainer_artifact.trained_model_file_path,
-                changed_accuracy=evaluate_model_response.difference)
+                changed_accuracy=evaluate_model_response.difference,
+                metric_artifact=self.model_trainer_artifact.metric_artifact,
+                reference_sketch_file_path=self.model_trainer_artifact.reference_sketch_file_path)
 
             logging.info(f"Model evaluation artifact: {model_evaluation_artifact}")
             return model_evaluation_artifact
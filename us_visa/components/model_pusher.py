@@ -1,25 +1,32 @@
 import sys
+from dataclasses import asdict
+from typing import Optional
 
-from us_visa.cloud_storage.aws_storage import SimpleStorageService
+from us_visa.cloud_storage.storage_factory import get_storage_service
 from us_visa.exception import USvisaException
 from us_visa.logger import logging
 from us_visa.entity.artifact_entity import ModelPusherArtifact, ModelEvaluationArtifact
 from us_visa.entity.config_entity import ModelPusherConfig
 from us_visa.entity.s3_estimator import USvisaEstimator
+from us_visa.utils.main_utils import get_file_hash
+from us_visa.utils.artifact_store import ArtifactStore
 
 
 class ModelPusher:
     def __init__(self, model_evaluation_artifact: ModelEvaluationArtifact,
-                 model_pusher_config: ModelPusherConfig):
+                 model_pusher_config: ModelPusherConfig, artifact_store: Optional[ArtifactStore] = None):
         """
         :param model_evaluation_artifact: Output reference of data evaluation artifact stage
         :param model_pusher_config: Configuration for model pusher
+        :param artifact_store: Store whose background write of the trained model is awaited before upload
         """
-        self.s3 = SimpleStorageService()
+        self.storage = get_storage_service()
+        self.artifact_store = artifact_store if artifact_store is not None else ArtifactStore(background=False)
         self.model_evaluation_artifact = model_evaluation_artifact
         self.model_pusher_config = model_pusher_config
         self.usvisa_estimator = USvisaEstimator(bucket_name=model_pusher_config.bucket_name,
-                                model_path=model_pusher_config.s3_model_key_path)
+                                model_path=model_pusher_config.s3_model_key_path,
+                                storage=self.storage)
 
     def initiate_model_pusher(self) -> ModelPusherArtifact:
         """
@@ -32,15 +39,36 @@ class ModelPusher:
         logging.info("Entered initiate_model_pusher method of ModelTrainer class")
 
         try:
-            logging.info("Uploading artifacts folder to s3 bucket")
+            trained_model_path = self.model_evaluation_artifact.trained_model_path
+            # the upload reads the model file, make sure its background write has finished
+            self.artifact_store.wait(trained_model_path)
+            content_hash = get_file_hash(trained_model_path)
+            reference_sketch_file = self.model_evaluation_artifact.reference_sketch_file_path
+            if reference_sketch_file is not None:
+                self.artifact_store.wait(reference_sketch_file)
 
-            self.usvisa_estimator.save_model(from_file=self.model_evaluation_artifact.trained_model_path)
+            if content_hash == self.usvisa_estimator.registry.get_latest_content_hash():
+                # an identical model is already latest, re-uploading it would only make every serving worker reload
+                logging.info(f"Trained model is identical to the latest registry version [{content_hash}], "
+                             f"skipping upload")
+                registry_entry = self.usvisa_estimator.registry.get_latest()
+                is_model_uploaded = False
+            else:
+                logging.info("Uploading artifacts folder to model storage")
+                registry_entry = self.usvisa_estimator.save_model(
+                    from_file=trained_model_path,
+                    metrics=asdict(self.model_evaluation_artifact.metric_artifact),
+                    content_hash=content_hash,
+                    reference_sketch_file=reference_sketch_file)
+                is_model_uploaded = True
+                logging.info("Uploaded artifacts folder to model storage")
 
 
             model_pusher_artifact = ModelPusherArtifact(bucket_name=self.model_pusher_config.bucket_name,
-                                                        s3_model_path=self.model_pusher_config.s3_model_key_path)
+                                                        s3_model_path=registry_entry["key"],
+                                                        model_version=registry_entry["version"],
+                                                        is_model_uploaded=is_model_uploaded)
 
-            logging.info("Uploaded artifacts folder to s3 bucket")
             logging.info(f"Model pusher artifact: [{model_pusher_artifact}]")
             logging.info("Exited initiate_model_pusher method of ModelTrainer class")
             
@@ -1,8 +1,11 @@
+import os
 import sys
-from typing import Tuple
+from functools import partial
+from typing import Optional, Tuple
 
 import numpy as np
 import pandas as pd
+import scipy.sparse
 from pandas import DataFrame
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
@@ -10,25 +13,52 @@ from neuro_mf  import ModelFactory
 
 from us_visa.exception import USvisaException
 from us_visa.logger import logging
-from us_visa.utils.main_utils import load_numpy_array_data, read_yaml_file, load_object, save_object
+from us_visa.utils.main_utils import (load_numpy_array_data, load_feature_matrix, read_yaml_file, load_object,
+                                     save_object)
 from us_visa.entity.config_entity import ModelTrainerConfig
 from us_visa.entity.artifact_entity import DataTransformationArtifact, ModelTrainerArtifact, ClassificationMetricArtifact
-from us_visa.entity.estimator import USvisaModel
+from us_visa.entity.estimator import USvisaModel, accepts_sparse, to_estimator_input
+from us_visa.entity.reference_sketch import load_reference_sketch
+from us_visa.entity.resampler import Resampler
+from us_visa.utils.artifact_store import ArtifactStore
 
 class ModelTrainer:
     def __init__(self, data_transformation_artifact: DataTransformationArtifact,
-                 model_trainer_config: ModelTrainerConfig):
+                 model_trainer_config: ModelTrainerConfig,
+                 artifact_store: Optional[ArtifactStore] = None):
         """
         :param data_ingestion_artifact: Output reference of data ingestion artifact stage
         :param data_transformation_config: Configuration for data transformation
+        :param artifact_store: In-memory arrays and preprocessor of data transformation
         """
         self.data_transformation_artifact = data_transformation_artifact
         self.model_trainer_config = model_trainer_config
+        self.artifact_store = artifact_store if artifact_store is not None else ArtifactStore(background=False)
 
-    def get_model_object_and_report(self, train: np.array, test: np.array) -> Tuple[object, object]:
+    def get_features(self, file_path: str):
+        """
+        Returns the features of file_path memory-mapped when mmap_mode is set and they are dense (once their
+        background write is done), the in-memory artifact or the loaded file otherwise.
+        joblib hands memory-mapped arrays to the grid search workers as references to the file.
+        """
+        try:
+            mmap_mode = self.model_trainer_config.mmap_mode
+            if mmap_mode and os.path.splitext(file_path)[1] == ".npy":
+                self.artifact_store.wait(file_path)
+                logging.info(f"Memory-mapping features: {file_path}")
+                return load_feature_matrix(file_path, mmap_mode=mmap_mode)
+            return self.artifact_store.get(file_path, load_feature_matrix)
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def get_model_object_and_report(self, x_train, y_train: np.ndarray, x_test,
+                                    y_test: np.ndarray) -> Tuple[object, object]:
         """
         Method Name :   get_model_object_and_report
-        Description :   This function uses neuro_mf to get the best model object and report of the best model
+        Description :   This function uses neuro_mf to get the best model object and report of the best model.
+                        Sparse features are fed as they are to the estimators accepting sparse input, the
+                        others get a dense copy made once. With the class_weight resampling strategy the
+                        estimators supporting it are weighted instead of training on resampled data
         
         Output      :   Returns metric artifact object and best model object
         On Failure  :   Write an exception log and then raise an exception
@@ -36,15 +66,32 @@ class ModelTrainer:
         try:
             logging.info("Using neuro_mf to get best model object and report")
             model_factory = ModelFactory(model_config_path=self.model_trainer_config.model_config_file_path)
-            
-            x_train, y_train, x_test, y_test = train[:, :-1], train[:, -1], test[:, :-1], test[:, -1]
 
-            best_model_detail = model_factory.get_best_model(
-                X=x_train,y=y_train,base_accuracy=self.model_trainer_config.expected_accuracy
-            )
+            class_weight = Resampler(resampling_config=read_yaml_file(
+                file_path=self.model_trainer_config.resampling_config_file_path)).class_weight
+
+            dense_x_train = None
+            grid_searched_best_model_list = []
+            for initialized_model in model_factory.get_initialized_model_list():
+                if class_weight is not None:
+                    if "class_weight" in initialized_model.model.get_params():
+                        initialized_model.model.set_params(class_weight=class_weight)
+                    else:
+                        logging.info(f"{initialized_model.model_name} has no class_weight, it trains unweighted")
+                input_feature = x_train
+                if scipy.sparse.issparse(x_train) and not accepts_sparse(initialized_model.model):
+                    if dense_x_train is None:
+                        logging.info(f"Densifying the train features for {initialized_model.model_name}")
+                        dense_x_train = x_train.toarray()
+                    input_feature = dense_x_train
+                grid_searched_best_model_list.append(model_factory.initiate_best_parameter_search_for_initialized_model(
+                    initialized_model=initialized_model, input_feature=input_feature, output_feature=y_train))
+
+            best_model_detail = ModelFactory.get_best_model_from_grid_searched_best_model_list(
+                grid_searched_best_model_list, base_accuracy=self.model_trainer_config.expected_accuracy)
             model_obj = best_model_detail.best_model
 
-            y_pred = model_obj.predict(x_test)
+            y_pred = model_obj.predict(to_estimator_input(model_obj, x_test))
             
             accuracy = accuracy_score(y_test, y_pred) 
             f1 = f1_score(y_test, y_pred)  
@@ -68,27 +115,39 @@ class ModelTrainer:
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
-            train_arr = load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_train_file_path)
-            test_arr = load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_test_file_path)
+            x_train = self.get_features(self.data_transformation_artifact.transformed_train_file_path)
+            x_test = self.get_features(self.data_transformation_artifact.transformed_test_file_path)
+            y_train = self.artifact_store.get(self.data_transformation_artifact.transformed_train_target_file_path,
+                                              load_numpy_array_data)
+            y_test = self.artifact_store.get(self.data_transformation_artifact.transformed_test_target_file_path,
+                                             load_numpy_array_data)
             
-            best_model_detail ,metric_artifact = self.get_model_object_and_report(train=train_arr, test=test_arr)
+            best_model_detail ,metric_artifact = self.get_model_object_and_report(x_train=x_train, y_train=y_train,
+                                                                                  x_test=x_test, y_test=y_test)
             
-            preprocessing_obj = load_object(file_path=self.data_transformation_artifact.transformed_object_file_path)
+            preprocessing_obj = self.artifact_store.get(self.data_transformation_artifact.transformed_object_file_path,
+                                                        load_object)
 
 
             if best_model_detail.best_score < self.model_trainer_config.expected_accuracy:
                 logging.info("No best model found with score more than base score")
                 raise Exception("No best model found with score more than base score")
 
+            reference_sketch = self.artifact_store.get(self.data_transformation_artifact.reference_sketch_file_path,
+                                                       load_reference_sketch)
+
             usvisa_model = USvisaModel(preprocessing_object=preprocessing_obj,
-                                       trained_model_object=best_model_detail.best_model)
-            logging.info("Created usvisa model object with preprocessor and model")
+                                       trained_model_object=best_model_detail.best_model,
+                                       reference_sketch=reference_sketch)
+            logging.info("Created usvisa model object with preprocessor, model and reference sketch")
             logging.info("Created best model file path.")
-            save_object(self.model_trainer_config.trained_model_file_path, usvisa_model)
+            self.artifact_store.put(self.model_trainer_config.trained_model_file_path, usvisa_model,
+                                    partial(save_object, codec=self.model_trainer_config.trained_model_codec))
 
             model_trainer_artifact = ModelTrainerArtifact(
                 trained_model_file_path=self.model_trainer_config.trained_model_file_path,
                 metric_artifact=metric_artifact,
+                reference_sketch_file_path=self.data_transformation_artifact.reference_sketch_file_path,
             )
             logging.info(f"Model trainer artifact: {model_trainer_artifact}")
             return model_trainer_artifact
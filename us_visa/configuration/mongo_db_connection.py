@@ -4,7 +4,7 @@ from us_visa.exception import USvisaException
 from us_visa.logger import logging
 
 import os
-from us_visa.constants import DATABASE_NAME, MONGODB_URL_KEY
+from us_visa.constants import DATABASE_NAME, MONGODB_URL_KEY, MONGODB_COMPRESSORS
 import pymongo
 import certifi
 
@@ -26,7 +26,7 @@ class MongoDBClient:
                 mongo_db_url = os.getenv(MONGODB_URL_KEY)
                 if mongo_db_url is None:
                     raise Exception(f"Environment key: {MONGODB_URL_KEY} is not set.")
-                MongoDBClient.client = pymongo.MongoClient(mongo_db_url, tlsCAFile=ca)
+                MongoDBClient.client = pymongo.MongoClient(mongo_db_url, tlsCAFile=ca, compressors=MONGODB_COMPRESSORS)
             self.client = MongoDBClient.client
             self.database = self.client[database_name]
             self.database_name = database_name
@@ -6,27 +6,54 @@ DATABASE_NAME = "US_VISA"
 COLLECTION_NAME = "visa_data"
 
 MONGODB_URL_KEY = "MONGODB_URL"
+# wire compression offered to the server in order of preference, zstd and snappy need the
+# zstandard / python-snappy packages and are skipped by pymongo when they are not installed
+MONGODB_COMPRESSORS = "zstd,snappy,zlib"
 
 PIPELINE_NAME: str = "usvisa"
 ARTIFACT_DIR: str = "artifact"
 
 
-TRAIN_FILE_NAME: str = "train.csv"
-TEST_FILE_NAME: str = "test.csv"
+# format of the feature store and train/test splits: "parquet" (typed, columnar) or "csv" for debugging
+DATA_FILE_FORMAT: str = os.getenv("DATA_FILE_FORMAT", "parquet")
+TRAIN_FILE_NAME: str = f"train.{DATA_FILE_FORMAT}"
+TEST_FILE_NAME: str = f"test.{DATA_FILE_FORMAT}"
 
-FILE_NAME: str = "usvisa.csv"
+FILE_NAME: str = f"usvisa.{DATA_FILE_FORMAT}"
 MODEL_FILE_NAME = "model.pkl"
 
 TARGET_COLUMN = "case_status"
 CURRENT_YEAR = date.today().year
 PREPROCSSING_OBJECT_FILE_NAME = "preprocessing.pkl"
+# compression of model and preprocessor artifacts: None (plain dill), "gzip", "zstd" or "lz4",
+# zstd and lz4 need the optional zstandard / lz4 packages, see benchmarks/compression_benchmark.py
+# to pick the codec with the lowest cold start on your link
+ARTIFACT_COMPRESSION_CODEC = os.getenv("ARTIFACT_COMPRESSION_CODEC")
+# concurrent background writes of stage artifacts handed over in memory, see utils/artifact_store.py
+ARTIFACT_STORE_MAX_WORKERS: int = 2
 SCHEMA_FILE_PATH = os.path.join("config", "schema.yaml")
+# class rebalancing strategy, applied by data transformation (resampling) or model training (class weights)
+RESAMPLING_CONFIG_FILE_PATH = os.path.join("config", "resampling.yaml")
 
 
 AWS_ACCESS_KEY_ID_ENV_KEY = "AWS_ACCESS_KEY_ID"
 AWS_SECRET_ACCESS_KEY_ENV_KEY = "AWS_SECRET_ACCESS_KEY"
 REGION_NAME = "us-east-1"
 
+STORAGE_BACKEND_ENV_KEY = "STORAGE_BACKEND"
+STORAGE_BACKEND_S3 = "s3"
+STORAGE_BACKEND_LOCAL = "local"
+LOCAL_STORAGE_ROOT_ENV_KEY = "LOCAL_STORAGE_ROOT"
+LOCAL_STORAGE_ROOT_DIR = "model_storage"
+STORAGE_TIMEOUT_SECONDS: float = 30.0
+STORAGE_MAX_WORKERS: int = 4
+
+"""
+Bulk loading of source files into the Mongo collection, see bulk_load.py
+"""
+BULK_LOAD_BATCH_SIZE: int = 5000
+BULK_LOAD_MAX_WORKERS: int = 4
+
 """
 Data Ingestion related constant start with DATA_INGESTION VAR NAME
 """
@@ -35,6 +62,32 @@ DATA_INGESTION_DIR_NAME: str = "data_ingestion"
 DATA_INGESTION_FEATURE_STORE_DIR: str = "feature_store"
 DATA_INGESTION_INGESTED_DIR: str = "ingested"
 DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO: float = 0.2
+# rows are assigned to the test split by hashing their id_columns into buckets, so a case keeps its split
+# across runs. Changing the bucket count or the 16 character hash key reshuffles every split
+DATA_INGESTION_SPLIT_BUCKETS: int = 1000
+DATA_INGESTION_SPLIT_HASH_KEY: str = "usvisa-split-v01"
+DATA_INGESTION_EXPORT_BATCH_SIZE: int = 10000
+DATA_INGESTION_EXPORT_PARTITIONS: int = 4
+DATA_INGESTION_PARTITION_SAMPLES: int = 100
+DATA_INGESTION_SNAPSHOT_DIR: str = os.path.join(ARTIFACT_DIR, "feature_store_snapshot")
+DATA_INGESTION_WATERMARK_FILE_NAME: str = "watermark.json"
+DATA_INGESTION_INCREMENTAL: bool = True
+# "_id" uses the ObjectId creation order, set an indexed updated_at field to also pick up changed documents
+# (bulk_load.py stamps and indexes it, and refuses --upsert with "_id")
+DATA_INGESTION_WATERMARK_FIELD: str = os.getenv("DATA_INGESTION_WATERMARK_FIELD", "_id")
+# shape documents server side with an aggregation pipeline generated from schema.yaml, the feature
+# store then holds the age_columns instead of drop_columns (id_columns are kept)
+DATA_INGESTION_SHAPE_IN_DATABASE: bool = False
+# where ingestion reads the cases from: the Mongo collection, a local csv / parquet file or an s3 object.
+# Only mongo supports incremental ingestion, the other sources are exported in full on every run
+DATA_INGESTION_SOURCE_MONGO: str = "mongo"
+DATA_INGESTION_SOURCE_CSV: str = "csv"
+DATA_INGESTION_SOURCE_PARQUET: str = "parquet"
+DATA_INGESTION_SOURCE_S3: str = "s3"
+DATA_INGESTION_SOURCE: str = os.getenv("DATA_INGESTION_SOURCE", DATA_INGESTION_SOURCE_MONGO)
+# file path for csv / parquet, object key for s3
+DATA_INGESTION_SOURCE_PATH: str = os.getenv("DATA_INGESTION_SOURCE_PATH", os.path.join("notebook", "Visadataset.csv"))
+DATA_INGESTION_SOURCE_BUCKET_NAME: str = os.getenv("DATA_INGESTION_SOURCE_BUCKET_NAME")
 
 
 """
@@ -42,7 +95,32 @@ Data Validation realted contant start with DATA_VALIDATION VAR NAME
 """
 DATA_VALIDATION_DIR_NAME: str = "data_validation"
 DATA_VALIDATION_DRIFT_REPORT_DIR: str = "drift_report"
-DATA_VALIDATION_DRIFT_REPORT_FILE_NAME: str = "report.yaml"
+DATA_VALIDATION_DRIFT_REPORT_FILE_NAME: str = "report.json"
+# a column drifts when its KS / chi-square p-value is below the threshold (or its PSI above it with the psi test),
+# the dataset drifts when at least DRIFT_SHARE_THRESHOLD of the compared columns drift
+DATA_VALIDATION_DRIFT_P_VALUE_THRESHOLD: float = 0.05
+DATA_VALIDATION_CATEGORICAL_DRIFT_TEST: str = "chi2"
+DATA_VALIDATION_PSI_THRESHOLD: float = 0.2
+DATA_VALIDATION_DRIFT_SHARE_THRESHOLD: float = 0.5
+# full compares the whole train and test sets. sample compares growing uniform or stratified (by the target)
+# samples and stops once every column verdict (or the dataset verdict) is settled at DRIFT_CONFIDENCE,
+# differences below DRIFT_MIN_EFFECT (KS distance / total variation distance) are not reported as drift
+DATA_VALIDATION_DRIFT_MODE_FULL: str = "full"
+DATA_VALIDATION_DRIFT_MODE_SAMPLE: str = "sample"
+DATA_VALIDATION_DRIFT_MODE: str = os.getenv("DATA_VALIDATION_DRIFT_MODE", DATA_VALIDATION_DRIFT_MODE_FULL)
+DATA_VALIDATION_DRIFT_SAMPLING: str = "stratified"
+DATA_VALIDATION_DRIFT_INITIAL_SAMPLE_SIZE: int = 10000
+DATA_VALIDATION_DRIFT_SAMPLE_GROWTH: int = 2
+DATA_VALIDATION_DRIFT_CONFIDENCE: float = 0.99
+DATA_VALIDATION_DRIFT_MIN_EFFECT: float = 0.02
+DATA_VALIDATION_DRIFT_SAMPLE_SEED: int = 42
+DATA_VALIDATION_SCHEMA_REPORT_FILE_NAME: str = "schema_report.json"
+# the ingested data is also compared with the reference sketch published with the production model, if any
+DATA_VALIDATION_PRODUCTION_DRIFT_REPORT_FILE_NAME: str = "production_report.json"
+DATA_VALIDATION_PRODUCTION_DRIFT: bool = os.getenv("DATA_VALIDATION_PRODUCTION_DRIFT", "true").lower() == "true"
+# schema.yaml max_null_rates overrides the null rate per column
+DATA_VALIDATION_MAX_NULL_RATE: float = 0.01
+DATA_VALIDATION_MAX_OUT_OF_RANGE_RATE: float = 0.01
 
 
 """
@@ -51,6 +129,26 @@ Data Transformation ralated constant start with DATA_TRANSFORMATION VAR NAME
 DATA_TRANSFORMATION_DIR_NAME: str = "data_transformation"
 DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR: str = "transformed"
 DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR: str = "transformed_object"
+# summary of the training features stored with the model, drift checks compare new data against it
+DATA_TRANSFORMATION_REFERENCE_SKETCH_FILE_NAME: str = "reference_sketch.json"
+DATA_TRANSFORMATION_SKETCH_BINS: int = 20
+DATA_TRANSFORMATION_SKETCH_QUANTILES: tuple = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+# the preprocessor outputs a CSR matrix when the share of non zero values is below the threshold (0 keeps the
+# features dense), ColumnTransformer counts the columns of dense transformers as non zero. The visa schema
+# is at 0.5, sparse only pays off with more one-hot categories: SMOTEENN and KNN fall back to brute force
+# neighbor search on sparse input
+DATA_TRANSFORMATION_SPARSE_THRESHOLD: float = float(os.getenv("DATA_TRANSFORMATION_SPARSE_THRESHOLD", 0.3))
+DATA_TRANSFORMATION_TARGET_FILE_SUFFIX: str = "_target"
+# transformed features are stored as C contiguous float32 (what the tree models train on), the target as int8 codes
+DATA_TRANSFORMATION_FEATURE_DTYPE: str = "float32"
+DATA_TRANSFORMATION_TARGET_DTYPE: str = "int8"
+# fitted preprocessors and transformed arrays are cached by a fingerprint of the train/test files, schema.yaml,
+# resampling.yaml, the transformer config and code, a rerun on unchanged data copies them instead of refitting.
+# The oldest entries beyond MAX_ENTRIES are removed, DATA_TRANSFORMATION_CACHE=false disables the cache
+DATA_TRANSFORMATION_CACHE_DIR: str = os.path.join(ARTIFACT_DIR, "transformation_cache")
+DATA_TRANSFORMATION_CACHE: bool = os.getenv("DATA_TRANSFORMATION_CACHE", "true").lower() == "true"
+DATA_TRANSFORMATION_CACHE_MAX_ENTRIES: int = 5
+DATA_TRANSFORMATION_CACHE_MANIFEST_FILE_NAME: str = "manifest.json"
 
 """
 MODEL TRAINER related constant start with MODEL_TRAINER var name
@@ -60,6 +158,10 @@ MODEL_TRAINER_TRAINED_MODEL_DIR: str = "trained_model"
 MODEL_TRAINER_TRAINED_MODEL_NAME: str = "model.pkl"
 MODEL_TRAINER_EXPECTED_SCORE: float = 0.6
 MODEL_TRAINER_MODEL_CONFIG_FILE_PATH: str = os.path.join("config", "model.yaml")
+# dense train/test features are memory-mapped read-only from their files, the grid search workers (n_jobs of
+# grid_search in model.yaml) then share the page cache copy instead of receiving a copy each.
+# "" reads them into memory
+MODEL_TRAINER_MMAP_MODE: str = "r"
 
 """
 MODEL EVALUATION related constant 
@@ -67,6 +169,27 @@ MODEL EVALUATION related constant
 MODEL_EVALUATION_CHANGED_THRESHOLD_SCORE: float = 0.02
 MODEL_BUCKET_NAME = "usvisa-mlmodel2024"
 MODEL_PUSHER_S3_KEY = "model-registry"
+MODEL_REGISTRY_MANIFEST_FILE_NAME = "manifest.json"
+# sidecar of every version, drift checks read the training data sketch without downloading the model
+MODEL_REGISTRY_REFERENCE_SKETCH_FILE_NAME = "reference_sketch.json"
+MODEL_REGISTRY_VERSIONS_DIR = "versions"
+MODEL_REGISTRY_HISTORY_SIZE = 10
+MODEL_REGISTRY_CONTENT_HASH_METADATA_KEY = "sha256"
+MODEL_REGISTRY_CODEC_METADATA_KEY = "codec"
+
+
+MODEL_POLL_INTERVAL_SECONDS: float = 60.0
+# downloading and unpickling a model gets its own limit, far above the one of the other storage calls
+MODEL_LOAD_TIMEOUT_SECONDS: float = 900.0
+
+# online drift monitoring of the prediction requests: requests queue their inputs, a background task counts
+# them every DRAIN_SECONDS into the bins of the model's reference sketch and compares every closed window
+# with the sketch. Beyond MAX_PENDING queued requests the oldest ones are not counted
+DRIFT_MONITOR_WINDOW_SECONDS: float = 300.0
+DRIFT_MONITOR_DRAIN_SECONDS: float = 1.0
+DRIFT_MONITOR_MAX_PENDING: int = 10000
+DRIFT_MONITOR_MIN_SAMPLES: int = 50
+DRIFT_MONITOR_HISTORY_SIZE: int = 12
 
 
 APP_HOST = "0.0.0.0"
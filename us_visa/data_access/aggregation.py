@@ -0,0 +1,75 @@
+import sys
+from typing import List, Optional
+
+from us_visa.constants import CURRENT_YEAR
+from us_visa.data_access.feature_store import NA_VALUES, get_schema_columns
+from us_visa.exception import USvisaException
+
+# schema.yaml column types to $convert target types
+SCHEMA_MONGO_TYPES = {
+    "category": "string",
+    "int": "long",
+    "float": "double",
+}
+
+
+def get_shaped_columns(schema_config: dict) -> List[str]:
+    """
+    Returns the columns produced by the shaping pipeline: the schema columns without drop_columns,
+    followed by the age_columns. id_columns are kept even when dropped for training, the snapshot
+    merge and the train-test split key on them.
+    """
+    dropped_columns = set(schema_config["drop_columns"]) - set(schema_config.get("id_columns", []))
+    columns = [column for column in get_schema_columns(schema_config) if column not in dropped_columns]
+    return columns + list(schema_config.get("age_columns", {}))
+
+
+def coerce_field(field_name: str, dtype: str) -> dict:
+    """
+    Aggregation expression casting a field to its schema type, "na" placeholders, missing fields
+    and values that cannot be converted become null.
+    """
+    value = f"${field_name}"
+    return {
+        "$convert": {
+            "input": {"$cond": [{"$in": [value, list(NA_VALUES)]}, None, value]},
+            "to": SCHEMA_MONGO_TYPES[dtype],
+            "onError": None,
+            "onNull": None,
+        }
+    }
+
+
+def build_shaping_pipeline(schema_config: dict, query: Optional[dict] = None,
+                           current_year: int = CURRENT_YEAR) -> List[dict]:
+    """
+    Generates the aggregation pipeline that shapes documents server side the way data
+    transformation expects them: typed schema columns, age columns derived from their year
+    column (CURRENT_YEAR - yr_of_estab) and drop_columns removed.
+
+    :param schema_config: Parsed schema.yaml
+    :param query: Optional filter applied first, e.g. a partition or watermark range
+    :param current_year: Reference year of the age columns
+    :return: List of pipeline stages
+    """
+    try:
+        pipeline = []
+        if query:
+            pipeline.append({"$match": query})
+
+        pipeline.append({"$project": {"_id": 0, **{name: coerce_field(name, dtype)
+                                                   for column in schema_config["columns"]
+                                                   for name, dtype in column.items()}}})
+
+        age_columns = schema_config.get("age_columns", {})
+        if age_columns:
+            pipeline.append({"$addFields": {age_column: {"$subtract": [current_year, f"${year_column}"]}
+                                            for age_column, year_column in age_columns.items()}})
+
+        shaped_columns = set(get_shaped_columns(schema_config))
+        dropped_columns = [column for column in get_schema_columns(schema_config) if column not in shaped_columns]
+        if dropped_columns:
+            pipeline.append({"$project": {column: 0 for column in dropped_columns}})
+        return pipeline
+    except Exception as e:
+        raise USvisaException(e, sys) from e
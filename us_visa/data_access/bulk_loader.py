@@ -0,0 +1,158 @@
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator, List
+
+import pyarrow as pa
+from pymongo import ASCENDING, ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from us_visa.configuration.mongo_db_connection import MongoDBClient
+from us_visa.constants import (DATABASE_NAME, SCHEMA_FILE_PATH, BULK_LOAD_BATCH_SIZE, BULK_LOAD_MAX_WORKERS,
+                               DATA_INGESTION_COLLECTION_NAME, DATA_INGESTION_WATERMARK_FIELD)
+from us_visa.data_access.feature_store import iter_file_batches
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+from us_visa.utils.main_utils import read_yaml_file
+
+
+@dataclass
+class BulkLoadReport:
+    num_documents: int
+    num_written: int
+    num_skipped: int
+    elapsed_seconds: float
+    docs_per_second: float
+
+
+class USvisaBulkLoader:
+    """
+    Loads a csv or parquet file of visa cases into the Mongo collection read by data ingestion.
+    The file is streamed in batches typed with schema.yaml and the batches are written concurrently,
+    either with unordered insert_many (duplicate case_ids are skipped) or as upserts by id_columns.
+    """
+
+    def __init__(self, collection_name: str = DATA_INGESTION_COLLECTION_NAME, database_name: str = DATABASE_NAME,
+                 batch_size: int = BULK_LOAD_BATCH_SIZE, max_workers: int = BULK_LOAD_MAX_WORKERS,
+                 watermark_field: str = DATA_INGESTION_WATERMARK_FIELD):
+        """
+        :param collection_name: Target collection
+        :param database_name: Target database
+        :param batch_size: Documents per insert_many / bulk_write call
+        :param max_workers: Concurrent write calls
+        :param watermark_field: Field used by incremental ingestion, stamped with the load time unless it is _id
+        """
+        try:
+            self.mongo_client = MongoDBClient(database_name=database_name)
+            self.collection = self.mongo_client.database[collection_name]
+            self.batch_size = batch_size
+            self.max_workers = max_workers
+            self.watermark_field = watermark_field
+            self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+            self.id_columns = self._schema_config["id_columns"]
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def create_indexes(self) -> List[str]:
+        """
+        Method Name :   create_indexes
+        Description :   This method creates the indexes the loader and data ingestion rely on: a unique
+                        index on the id columns (duplicate rejection, upsert lookups, snapshot merge key)
+                        and an index on the watermark field when it is not _id
+
+        Output      :   Returns the index names
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            index_names = [self.collection.create_index([(column, ASCENDING) for column in self.id_columns],
+                                                        unique=True)]
+            if self.watermark_field != "_id":
+                index_names.append(self.collection.create_index([(self.watermark_field, ASCENDING)]))
+            logging.info(f"Created indexes {index_names} on collection {self.collection.name}")
+            return index_names
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def iter_file_batches(self, file_path: str) -> Iterator[pa.RecordBatch]:
+        """
+        Streams the file as record batches of batch_size rows cast to the schema types
+        """
+        return iter_file_batches(file_path, self._schema_config, self.batch_size)
+
+    def to_documents(self, record_batch: pa.RecordBatch) -> List[dict]:
+        documents = record_batch.to_pylist()
+        if self.watermark_field != "_id":
+            loaded_at = datetime.utcnow()
+            for document in documents:
+                document[self.watermark_field] = loaded_at
+        return documents
+
+    def insert_documents(self, documents: List[dict]) -> int:
+        """
+        Unordered insert_many, documents whose ids already exist are skipped
+        return number of inserted documents
+        """
+        try:
+            return len(self.collection.insert_many(documents, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            duplicate_errors = [error for error in e.details["writeErrors"] if error["code"] == 11000]
+            if len(duplicate_errors) != len(e.details["writeErrors"]):
+                raise USvisaException(e, sys) from e
+            return e.details["nInserted"]
+
+    def upsert_documents(self, documents: List[dict]) -> int:
+        """
+        Unordered bulk_write replacing the documents by id columns, inserting the new ones
+        return number of inserted or replaced documents
+        """
+        operations = [ReplaceOne({column: document[column] for column in self.id_columns}, document, upsert=True)
+                      for document in documents]
+        result = self.collection.bulk_write(operations, ordered=False)
+        return result.upserted_count + result.matched_count
+
+    def load_file(self, file_path: str, upsert: bool = False) -> BulkLoadReport:
+        """
+        Method Name :   load_file
+        Description :   This method streams file_path into the collection. At most 2 * max_workers
+                        batches are in flight, so memory stays bounded for files of any size.
+                        Upserts need a watermark field stamped by the loader: replaced documents keep
+                        their _id, so incremental ingestion on _id would never see them
+
+        Output      :   Returns a BulkLoadReport with the throughput
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        logging.info("Entered load_file method of USvisaBulkLoader class")
+        try:
+            if upsert and self.watermark_field == "_id":
+                raise ValueError("Upserts replace documents in place and keep their _id, incremental ingestion on "
+                                 "the _id watermark would never see them. Set DATA_INGESTION_WATERMARK_FIELD "
+                                 "(e.g. updated_at) for the loader and the training pipeline to upsert")
+            self.create_indexes()
+            write_documents = self.upsert_documents if upsert else self.insert_documents
+            start = time.perf_counter()
+            num_documents, num_written = 0, 0
+
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bulk-load") as executor:
+                in_flight = set()
+                for record_batch in self.iter_file_batches(file_path):
+                    documents = self.to_documents(record_batch)
+                    num_documents += len(documents)
+                    in_flight.add(executor.submit(write_documents, documents))
+                    if len(in_flight) >= 2 * self.max_workers:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        num_written += sum(future.result() for future in done)
+                num_written += sum(future.result() for future in in_flight)
+
+            elapsed_seconds = time.perf_counter() - start
+            report = BulkLoadReport(num_documents=num_documents,
+                                    num_written=num_written,
+                                    num_skipped=num_documents - num_written,
+                                    elapsed_seconds=elapsed_seconds,
+                                    docs_per_second=num_documents / elapsed_seconds if elapsed_seconds else 0.0)
+            logging.info(f"Bulk load report: {report}")
+            logging.info("Exited load_file method of USvisaBulkLoader class")
+            return report
+        except Exception as e:
+            raise USvisaException(e, sys) from e
@@ -0,0 +1,144 @@
+import sys
+from abc import ABC, abstractmethod
+from typing import Iterator, List, Optional
+
+import pyarrow as pa
+
+from us_visa.constants import (DATA_INGESTION_SOURCE_MONGO, DATA_INGESTION_SOURCE_CSV, DATA_INGESTION_SOURCE_PARQUET,
+                               DATA_INGESTION_SOURCE_S3)
+from us_visa.data_access.feature_store import (FeatureStoreWriter, get_arrow_schema, get_file_format,
+                                               get_schema_columns, iter_file_batches)
+from us_visa.entity.config_entity import DataIngestionConfig
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+class DataSourceConnector(ABC):
+    """
+    Source of the visa cases read by data ingestion. Every connector streams typed record batches
+    into the feature store writer, sources that can be read incrementally also expose a high watermark.
+    """
+
+    def __init__(self, schema_config: dict):
+        """
+        :param schema_config: Parsed schema.yaml
+        """
+        self._schema_config = schema_config
+
+    def get_feature_store_columns(self) -> List[str]:
+        return get_schema_columns(self._schema_config)
+
+    def get_high_watermark(self, watermark_field: str):
+        """
+        Largest value of watermark_field in the source, None when the source cannot be read incrementally
+        """
+        return None
+
+    @abstractmethod
+    def iter_batches(self, batch_size: int, query: Optional[dict] = None) -> Iterator[pa.RecordBatch]:
+        pass
+
+    def export_to_feature_store(self, file_path: str, batch_size: int, query: Optional[dict] = None) -> int:
+        """
+        Streams the source (the records matching query) into the feature store file
+        return number of exported records
+        """
+        try:
+            arrow_schema = get_arrow_schema(self._schema_config, columns=self.get_feature_store_columns())
+            with FeatureStoreWriter(file_path=file_path, arrow_schema=arrow_schema) as writer:
+                return writer.write_batches(self.iter_batches(batch_size=batch_size, query=query))
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+class MongoDataSource(DataSourceConnector):
+    """
+    The Mongo collection, read with partitioned cursors (or the shaping pipeline) through USvisaData
+    """
+
+    def __init__(self, schema_config: dict, collection_name: str, num_partitions: int = 1, shaped: bool = False):
+        super().__init__(schema_config)
+        # imported here so file sources work without a Mongo connection
+        from us_visa.data_access.usvisa_data import USvisaData
+        self.usvisa_data = USvisaData()
+        self.collection_name = collection_name
+        self.num_partitions = num_partitions
+        self.shaped = shaped
+
+    def get_feature_store_columns(self) -> List[str]:
+        return self.usvisa_data.get_feature_store_columns(self.shaped)
+
+    def get_high_watermark(self, watermark_field: str):
+        return self.usvisa_data.get_high_watermark(collection_name=self.collection_name,
+                                                   watermark_field=watermark_field)
+
+    def iter_batches(self, batch_size: int, query: Optional[dict] = None) -> Iterator[pa.RecordBatch]:
+        return self.usvisa_data.iter_collection_batches(collection_name=self.collection_name, batch_size=batch_size,
+                                                        query=query, shaped=self.shaped)
+
+    def export_to_feature_store(self, file_path: str, batch_size: int, query: Optional[dict] = None) -> int:
+        # full exports are split into parallel _id ranges, watermark deltas are small enough for one cursor
+        return self.usvisa_data.export_collection_to_feature_store(
+            collection_name=self.collection_name, file_path=file_path, batch_size=batch_size,
+            num_partitions=1 if query else self.num_partitions, query=query, shaped=self.shaped)
+
+
+class FileDataSource(DataSourceConnector):
+    """
+    A local csv or parquet file, read in batches by the pyarrow streaming readers
+    """
+
+    def __init__(self, schema_config: dict, file_path: str, file_format: Optional[str] = None):
+        super().__init__(schema_config)
+        self.file_path = file_path
+        self.file_format = file_format
+
+    def iter_batches(self, batch_size: int, query: Optional[dict] = None) -> Iterator[pa.RecordBatch]:
+        return iter_file_batches(self.file_path, self._schema_config, batch_size, file_format=self.file_format)
+
+
+class S3DataSource(DataSourceConnector):
+    """
+    A csv or parquet object of the storage backend, downloaded once and then read in batches
+    """
+
+    def __init__(self, schema_config: dict, bucket_name: str, key: str, storage=None):
+        super().__init__(schema_config)
+        if storage is None:
+            from us_visa.cloud_storage.storage_factory import get_storage_service
+            storage = get_storage_service()
+        self.storage = storage
+        self.bucket_name = bucket_name
+        self.key = key
+
+    def iter_batches(self, batch_size: int, query: Optional[dict] = None) -> Iterator[pa.RecordBatch]:
+        data = self.storage.read_object_bytes(self.key, bucket_name=self.bucket_name)
+        logging.info(f"Downloaded {len(data)} bytes from {self.bucket_name}/{self.key}")
+        return iter_file_batches(pa.py_buffer(data), self._schema_config, batch_size,
+                                 file_format=get_file_format(self.key))
+
+
+def get_data_source_connector(data_ingestion_config: DataIngestionConfig, schema_config: dict) -> DataSourceConnector:
+    """
+    Returns the connector selected by data_ingestion_config.data_source (DATA_INGESTION_SOURCE env variable)
+
+    :param data_ingestion_config: Configuration for data ingestion
+    :param schema_config: Parsed schema.yaml
+    :return: DataSourceConnector object
+    """
+    try:
+        data_source = data_ingestion_config.data_source
+        logging.info(f"Reading visa data from the {data_source} source")
+        if data_source == DATA_INGESTION_SOURCE_MONGO:
+            return MongoDataSource(schema_config, collection_name=data_ingestion_config.collection_name,
+                                   num_partitions=data_ingestion_config.export_partitions,
+                                   shaped=data_ingestion_config.shape_in_database)
+        if data_source in (DATA_INGESTION_SOURCE_CSV, DATA_INGESTION_SOURCE_PARQUET):
+            return FileDataSource(schema_config, file_path=data_ingestion_config.source_path, file_format=data_source)
+        if data_source == DATA_INGESTION_SOURCE_S3:
+            return S3DataSource(schema_config, bucket_name=data_ingestion_config.source_bucket_name,
+                                key=data_ingestion_config.source_path)
+        raise Exception(f"Unknown data source: {data_source}, expected one of "
+                        f"{[DATA_INGESTION_SOURCE_MONGO, DATA_INGESTION_SOURCE_CSV, DATA_INGESTION_SOURCE_PARQUET, DATA_INGESTION_SOURCE_S3]}")
+    except Exception as e:
+        raise USvisaException(e, sys) from e
@@ -0,0 +1,291 @@
+import os
+import sys
+import threading
+from typing import Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from us_visa.constants import TARGET_COLUMN
+from us_visa.entity.estimator import TargetValueMapping
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+# schema.yaml column types to arrow types
+SCHEMA_ARROW_TYPES = {
+    "category": pa.string(),
+    "int": pa.int64(),
+    "float": pa.float64(),
+}
+
+NA_VALUES = ("na",)
+
+FILE_FORMAT_PARQUET = "parquet"
+FILE_FORMAT_CSV = "csv"
+SUPPORTED_FILE_FORMATS = (FILE_FORMAT_PARQUET, FILE_FORMAT_CSV)
+
+
+def get_file_format(file_path: str) -> str:
+    """
+    Returns the format of a feature store file from its extension, parquet or csv
+    """
+    file_format = os.path.splitext(file_path)[1].lstrip(".").lower()
+    if file_format not in SUPPORTED_FILE_FORMATS:
+        raise USvisaException(Exception(f"Unsupported feature store file {file_path}, expected one of "
+                                        f"{SUPPORTED_FILE_FORMATS}"), sys)
+    return file_format
+
+
+def get_schema_columns(schema_config: dict) -> List[str]:
+    """
+    Returns the column names declared under columns in schema.yaml, in declaration order
+    """
+    return [name for column in schema_config["columns"] for name in column]
+
+
+def get_arrow_schema(schema_config: dict, columns: Optional[List[str]] = None) -> pa.Schema:
+    """
+    Builds the arrow schema of the feature store from the column types declared in schema.yaml.
+
+    :param schema_config: Parsed schema.yaml
+    :param columns: Columns to keep (schema or age columns), all schema columns by default
+    :return: pyarrow Schema
+    """
+    try:
+        column_types = {name: dtype for column in schema_config["columns"] for name, dtype in column.items()}
+        column_types.update({name: "int" for name in schema_config.get("age_columns", {})})
+        columns = columns if columns is not None else get_schema_columns(schema_config)
+        return pa.schema([pa.field(name, SCHEMA_ARROW_TYPES[column_types[name]]) for name in columns])
+    except Exception as e:
+        raise USvisaException(e, sys) from e
+
+
+def dictionary_encode_schema(arrow_schema: pa.Schema) -> pa.Schema:
+    """
+    Returns the schema with the string (category) columns dictionary encoded, they are read back
+    as pandas categoricals
+    """
+    return pa.schema([pa.field(field.name, pa.dictionary(pa.int32(), pa.string()))
+                      if pa.types.is_string(field.type) else field for field in arrow_schema])
+
+
+def get_transformer_columns(schema_config: dict) -> List[str]:
+    """
+    Returns the columns the preprocessor reads, plus the year columns its age columns are derived
+    from when the data was not shaped during ingestion. Used to prune feature store reads.
+    """
+    columns = []
+    for key in ("oh_columns", "or_columns", "transform_columns", "num_features"):
+        columns += [column for column in schema_config[key] if column not in columns]
+    age_columns = schema_config.get("age_columns", {})
+    columns += [year_column for age_column, year_column in age_columns.items()
+                if age_column in columns and year_column not in columns]
+    return columns
+
+
+def records_to_record_batch(records: List[dict], arrow_schema: pa.Schema) -> pa.RecordBatch:
+    """
+    Converts a list of documents into a typed columnar record batch. Missing fields and the
+    "na" placeholder become nulls, numeric strings are parsed into the declared type.
+
+    :param records: Documents as returned by a pymongo cursor
+    :param arrow_schema: Target schema of the batch
+    :return: pyarrow RecordBatch
+    """
+    try:
+        arrays = []
+        for field in arrow_schema:
+            values = [record.get(field.name) for record in records]
+            values = [None if value in NA_VALUES else value for value in values]
+            try:
+                array = pa.array(values, type=field.type)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # mixed representations in the collection, e.g. numbers stored as strings
+                array = pa.array([None if value is None else str(value) for value in values],
+                                 type=pa.string()).cast(field.type)
+            arrays.append(array)
+        return pa.RecordBatch.from_arrays(arrays, schema=arrow_schema)
+    except Exception as e:
+        raise USvisaException(e, sys) from e
+
+
+def iter_file_batches(source: Union[str, pa.Buffer], schema_config: dict, batch_size: int,
+                      file_format: Optional[str] = None) -> Iterator[pa.RecordBatch]:
+    """
+    Streams a csv or parquet file as record batches of at most batch_size rows cast to the schema types,
+    "na" and empty cells become nulls. Only the schema columns present in the file are read.
+
+    :param source: File path, or the file content as an arrow buffer (e.g. an object downloaded from s3)
+    :param schema_config: Parsed schema.yaml
+    :param batch_size: Maximum rows per batch
+    :param file_format: parquet or csv, taken from the file extension of a path by default
+    :return: Iterator of pyarrow RecordBatch
+    """
+    try:
+        file_format = file_format or get_file_format(source)
+        open_source = (lambda: source) if isinstance(source, str) else (lambda: pa.BufferReader(source))
+        schema_columns = get_schema_columns(schema_config)
+        if file_format == FILE_FORMAT_PARQUET:
+            parquet_file = pq.ParquetFile(open_source())
+            columns = [column for column in parquet_file.schema_arrow.names if column in schema_columns]
+            arrow_schema = get_arrow_schema(schema_config, columns=columns)
+            for record_batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+                yield pa.Table.from_batches([record_batch]).cast(arrow_schema).to_batches()[0]
+        else:
+            header = pa_csv.open_csv(open_source()).schema.names
+            columns = [column for column in schema_columns if column in header]
+            arrow_schema = get_arrow_schema(schema_config, columns=columns)
+            convert_options = pa_csv.ConvertOptions(column_types=arrow_schema,
+                                                    include_columns=columns,
+                                                    null_values=list(NA_VALUES) + [""],
+                                                    strings_can_be_null=True)
+            for record_batch in pa_csv.open_csv(open_source(), convert_options=convert_options):
+                for offset in range(0, record_batch.num_rows, batch_size):
+                    yield record_batch.slice(offset, batch_size)
+    except Exception as e:
+        raise USvisaException(e, sys) from e
+
+
+class FeatureStoreWriter:
+    """
+    Writes typed record batches into the feature store file as they arrive, so memory stays
+    proportional to one batch. The file is written under a temporary name and moved into place
+    on close, readers never see a half written feature store. write_batch is thread safe so
+    parallel partition readers can share one writer.
+
+    The format follows the file extension: parquet stores the schema types with dictionary
+    encoded categoricals, csv is kept as a human readable debug format.
+    """
+
+    def __init__(self, file_path: str, arrow_schema: pa.Schema):
+        """
+        :param file_path: Path of the feature store file
+        :param arrow_schema: Schema of the record batches
+        """
+        self.file_path = file_path
+        self.arrow_schema = arrow_schema
+        self.file_format = get_file_format(file_path)
+        self.tmp_file_path = f"{file_path}.tmp"
+        self.num_rows = 0
+        self._writer = None
+        self._file_schema = None
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "FeatureStoreWriter":
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        if self.file_format == FILE_FORMAT_PARQUET:
+            self._file_schema = dictionary_encode_schema(self.arrow_schema)
+            self._writer = pq.ParquetWriter(self.tmp_file_path, self._file_schema)
+        else:
+            self._writer = pa_csv.CSVWriter(self.tmp_file_path, self.arrow_schema)
+        return self
+
+    def write_batch(self, record_batch: pa.RecordBatch) -> None:
+        with self._lock:
+            if self.file_format == FILE_FORMAT_PARQUET:
+                self._writer.write_table(pa.Table.from_batches([record_batch]).cast(self._file_schema))
+            else:
+                self._writer.write_batch(record_batch)
+            self.num_rows += record_batch.num_rows
+
+    def write_batches(self, record_batches: Iterable[pa.RecordBatch]) -> int:
+        for record_batch in record_batches:
+            self.write_batch(record_batch)
+        return self.num_rows
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._writer.close()
+        if exc_type is None:
+            os.replace(self.tmp_file_path, self.file_path)
+            logging.info(f"Wrote {self.num_rows} rows into feature store file: {self.file_path}")
+        elif os.path.exists(self.tmp_file_path):
+            os.remove(self.tmp_file_path)
+
+
+def read_feature_store(file_path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Reads a feature store file written by FeatureStoreWriter or write_feature_store. Parquet files
+    come back with the schema dtypes (categoricals for category columns).
+
+    :param file_path: Parquet or csv feature store file
+    :param columns: Columns to read, the others are not parsed. Columns absent from the file
+                    are skipped, all columns by default
+    :return: pandas DataFrame
+    """
+    try:
+        if get_file_format(file_path) == FILE_FORMAT_PARQUET:
+            if columns is not None:
+                columns = [column for column in pq.read_schema(file_path).names if column in columns]
+            return pd.read_parquet(file_path, columns=columns)
+        return pd.read_csv(file_path, usecols=None if columns is None else (lambda column: column in columns))
+    except Exception as e:
+        raise USvisaException(e, sys) from e
+
+
+def apply_schema_dtypes(dataframe: pd.DataFrame, schema_config: dict, encode_target: bool = False) -> pd.DataFrame:
+    """
+    Converts a visa dataframe to the compact dtypes implied by schema.yaml: category columns become
+    pandas categoricals (except the id_columns, unique per row), int columns are downcast to the
+    smallest integer width holding their range and float columns to float32 when no value changes.
+
+    :param dataframe: Visa data, columns outside the schema are left as they are
+    :param schema_config: Parsed schema.yaml
+    :param encode_target: Replace the target labels with their TargetValueMapping codes as int8
+    :return: DataFrame with compact dtypes
+    """
+    try:
+        column_types = {name: dtype for column in schema_config["columns"] for name, dtype in column.items()}
+        column_types.update({name: "int" for name in schema_config.get("age_columns", {})})
+        id_columns = set(schema_config.get("id_columns", []))
+        converted = {}
+        for column in dataframe.columns:
+            dtype = column_types.get(column)
+            series = dataframe[column]
+            if column == TARGET_COLUMN and encode_target:
+                codes = series.astype("string").map(TargetValueMapping()._asdict())
+                if codes.isna().any():
+                    unknown = series[codes.isna()].unique().tolist()
+                    raise Exception(f"Unknown {TARGET_COLUMN} labels {unknown}, expected one of "
+                                    f"{list(TargetValueMapping()._asdict())}")
+                converted[column] = codes.astype("int8")
+            elif dtype == "category" and column not in id_columns:
+                converted[column] = series.astype("category")
+            elif dtype == "int" and pd.api.types.is_integer_dtype(series):
+                converted[column] = pd.to_numeric(series, downcast="integer")
+            elif dtype in ("int", "float") and pd.api.types.is_float_dtype(series):
+                # int columns with nulls are read as floats, they are only narrowed when exact
+                narrow = series.astype("float32")
+                exact = np.array_equal(narrow.to_numpy(dtype="float64"), series.to_numpy(), equal_nan=True)
+                converted[column] = narrow if exact else series
+        return dataframe.assign(**converted)
+    except Exception as e:
+        raise USvisaException(e, sys) from e
+
+
+def read_visa_data(file_path: str, schema_config: dict, columns: Optional[List[str]] = None,
+                   encode_target: bool = False) -> pd.DataFrame:
+    """
+    Schema aware loader of the feature store and train/test splits, read_feature_store followed by
+    apply_schema_dtypes
+    """
+    return apply_schema_dtypes(read_feature_store(file_path, columns=columns), schema_config,
+                               encode_target=encode_target)
+
+
+def write_feature_store(dataframe: pd.DataFrame, file_path: str, arrow_schema: pa.Schema) -> int:
+    """
+    Atomically writes a dataframe as a feature store file with the schema types.
+
+    :return: Number of written rows
+    """
+    try:
+        table = pa.Table.from_pandas(dataframe[arrow_schema.names], preserve_index=False).cast(arrow_schema)
+        with FeatureStoreWriter(file_path=file_path, arrow_schema=arrow_schema) as writer:
+            for record_batch in table.to_batches():
+                writer.write_batch(record_batch)
+            return writer.num_rows
+    except Exception as e:
+        raise USvisaException(e, sys) from e
@@ -1,10 +1,35 @@
 from us_visa.configuration.mongo_db_connection import MongoDBClient
-from us_visa.constants import DATABASE_NAME
+from us_visa.constants import (DATABASE_NAME, SCHEMA_FILE_PATH, DATA_INGESTION_EXPORT_BATCH_SIZE,
+                               DATA_INGESTION_PARTITION_SAMPLES)
 from us_visa.exception import USvisaException
+from us_visa.logger import logging
+from us_visa.data_access.aggregation import build_shaping_pipeline, get_shaped_columns
+from us_visa.data_access.feature_store import (FeatureStoreWriter, apply_schema_dtypes, get_arrow_schema,
+                                               get_schema_columns, records_to_record_batch)
+from us_visa.utils.main_utils import read_yaml_file
 import pandas as pd
+import pyarrow as pa
 import sys
-from typing import Optional
-import numpy as np
+from bson import ObjectId
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional
+
+
+# BSON $type aliases of the _id types that can be split into ranges. Range queries only match values of the
+# type of their bound (all numeric types compare as one)
+def get_bson_type_alias(value) -> Optional[str]:
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, ObjectId):
+        return "objectId"
+    if isinstance(value, datetime):
+        return "date"
+    return None
 
 
 
@@ -18,9 +43,147 @@ class USvisaData:
         """
         try:
             self.mongo_client = MongoDBClient(database_name=DATABASE_NAME)
+            self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+        except Exception as e:
+            raise USvisaException(e,sys)
+
+
+    def get_collection(self,collection_name:str,database_name:Optional[str]=None):
+        if database_name is None:
+            return self.mongo_client.database[collection_name]
+        return self.mongo_client.client[database_name][collection_name]
+
+    def get_feature_store_columns(self,shaped:bool=False)->List[str]:
+        """
+        return the columns of the feature store, raw schema columns or the output of the shaping pipeline
+        """
+        return get_shaped_columns(self._schema_config) if shaped else get_schema_columns(self._schema_config)
+
+    def iter_collection_batches(self,collection_name:str,database_name:Optional[str]=None,
+                                batch_size:int=DATA_INGESTION_EXPORT_BATCH_SIZE,
+                                columns:Optional[List[str]]=None,query:Optional[dict]=None,
+                                shaped:bool=False)->Iterator[pa.RecordBatch]:
+        """
+        Streams the collection as typed arrow record batches of batch_size documents.
+        Only the schema columns are fetched (no _id) and the cursor pulls batch_size documents
+        per round trip, so at most one batch of documents is held in memory.
+        With shaped=True the documents are typed, derived and pruned server side by the
+        aggregation pipeline generated from schema.yaml and arrive in their final shape
+        """
+        try:
+            collection = self.get_collection(collection_name, database_name)
+            if shaped:
+                columns = get_shaped_columns(self._schema_config)
+                arrow_schema = get_arrow_schema(self._schema_config, columns=columns)
+                pipeline = build_shaping_pipeline(self._schema_config, query=query)
+                cursor = collection.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+            else:
+                columns = columns if columns is not None else get_schema_columns(self._schema_config)
+                arrow_schema = get_arrow_schema(self._schema_config, columns=columns)
+                projection = {"_id": 0, **{column: 1 for column in columns}}
+                cursor = collection.find(query or {}, projection=projection, batch_size=batch_size)
+
+            records = []
+            for record in cursor:
+                records.append(record)
+                if len(records) == batch_size:
+                    yield records_to_record_batch(records, arrow_schema)
+                    records = []
+            if records:
+                yield records_to_record_batch(records, arrow_schema)
+        except Exception as e:
+            raise USvisaException(e,sys)
+
+    def get_partition_queries(self,collection_name:str,num_partitions:int,database_name:Optional[str]=None,
+                              samples_per_partition:int=DATA_INGESTION_PARTITION_SAMPLES)->List[dict]:
+        """
+        Splits the collection into num_partitions contiguous _id ranges. Split points are quantiles
+        of a $sample of _ids, so partitions hold roughly the same number of documents without a
+        collection scan. A last partition holds the documents whose _id has another BSON type than
+        the split points (range queries never match them). Falls back to one partition when the
+        sampled _ids are not of one orderable type
+        return list of find queries, one per partition
+        """
+        try:
+            if num_partitions <= 1:
+                return [{}]
+            collection = self.get_collection(collection_name, database_name)
+            pipeline = [{"$sample": {"size": num_partitions * samples_per_partition}}, {"$project": {"_id": 1}}]
+            sample_ids = [document["_id"] for document in collection.aggregate(pipeline)]
+            type_aliases = {get_bson_type_alias(sample_id) for sample_id in sample_ids}
+            if len(type_aliases) != 1 or None in type_aliases:
+                logging.info("Collection _ids are not of one orderable type, exporting with a single cursor")
+                return [{}]
+            type_alias = type_aliases.pop()
+            sample_ids.sort()
+
+            split_points = []
+            for i in range(1, num_partitions):
+                split_point = sample_ids[len(sample_ids) * i // num_partitions] if sample_ids else None
+                if split_point is not None and (not split_points or split_point > split_points[-1]):
+                    split_points.append(split_point)
+            if not split_points:
+                return [{}]
+
+            queries = [{"_id": {"$lt": split_points[0]}}]
+            queries += [{"_id": {"$gte": lower, "$lt": upper}} for lower, upper in zip(split_points, split_points[1:])]
+            queries.append({"_id": {"$gte": split_points[-1]}})
+            # _ids of other types than the sample, e.g. a few documents loaded with custom _ids
+            queries.append({"_id": {"$not": {"$type": type_alias}}})
+            return queries
+        except Exception as e:
+            raise USvisaException(e,sys)
+
+    def get_high_watermark(self,collection_name:str,watermark_field:str="_id",database_name:Optional[str]=None):
+        """
+        return the largest value of watermark_field in the collection (None for an empty collection),
+        served from the index on watermark_field
+        """
+        try:
+            collection = self.get_collection(collection_name, database_name)
+            documents = list(collection.find({watermark_field: {"$exists": True}}, projection={watermark_field: 1})
+                             .sort(watermark_field, -1).limit(1))
+            return documents[0][watermark_field] if documents else None
+        except Exception as e:
+            raise USvisaException(e,sys)
+
+    def export_collection_to_feature_store(self,collection_name:str,file_path:str,
+                                           database_name:Optional[str]=None,
+                                           batch_size:int=DATA_INGESTION_EXPORT_BATCH_SIZE,
+                                           num_partitions:int=1,query:Optional[dict]=None,
+                                           shaped:bool=False)->int:
+        """
+        export entire collection (or the documents matching query) into the feature store file batch
+        by batch. With num_partitions > 1 the _id ranges are read concurrently on a thread pool sharing
+        the pooled MongoDBClient and their batches are appended to the same feature store file.
+        shaped=True exports through the schema.yaml aggregation pipeline, see iter_collection_batches:
+        return number of exported records
+        """
+        try:
+            arrow_schema = get_arrow_schema(self._schema_config, columns=self.get_feature_store_columns(shaped))
+            queries = self.get_partition_queries(collection_name, num_partitions, database_name=database_name)
+            if query:
+                queries = [{"$and": [query, partition_query]} if partition_query else query
+                           for partition_query in queries]
+            logging.info(f"Exporting collection {collection_name} in {len(queries)} partition(s)")
+
+            with FeatureStoreWriter(file_path=file_path, arrow_schema=arrow_schema) as writer:
+                def export_partition(query:dict)->None:
+                    writer.write_batches(self.iter_collection_batches(collection_name=collection_name,
+                                                                      database_name=database_name,
+                                                                      batch_size=batch_size,
+                                                                      query=query,
+                                                                      shaped=shaped))
+
+                if len(queries) == 1:
+                    export_partition(queries[0])
+                else:
+                    with ThreadPoolExecutor(max_workers=len(queries), thread_name_prefix="mongo-export") as executor:
+                        # list() re-raises the first partition failure
+                        list(executor.map(export_partition, queries))
+                return writer.num_rows
         except Exception as e:
             raise USvisaException(e,sys)
-        
 
     def export_collection_as_dataframe(self,collection_name:str,database_name:Optional[str]=None)->pd.DataFrame:
         try:
@@ -28,15 +191,9 @@ class USvisaData:
             export entire collectin as dataframe:
             return pd.DataFrame of collection
             """
-            if database_name is None:
-                collection = self.mongo_client.database[collection_name]
-            else:
-                collection = self.mongo_client[database_name][collection_name]
-
-            df = pd.DataFrame(list(collection.find()))
-            if "_id" in df.columns.to_list():
-                df = df.drop(columns=["_id"], axis=1)
-            df.replace({"na":np.nan},inplace=True)
-            return df
+            arrow_schema = get_arrow_schema(self._schema_config)
+            batches = self.iter_collection_batches(collection_name=collection_name, database_name=database_name)
+            dataframe = pa.Table.from_batches(batches, schema=arrow_schema).to_pandas()
+            return apply_schema_dtypes(dataframe, self._schema_config)
         except Exception as e:
-            raise USvisaException(e,sys)
\ No newline at end of file
+            raise USvisaException(e,sys)
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Optional
 
 
 @dataclass
@@ -17,6 +18,9 @@ class DataTransformationArtifact:
     transformed_object_file_path:str 
     transformed_train_file_path:str
     transformed_test_file_path:str
+    transformed_train_target_file_path:str
+    transformed_test_target_file_path:str
+    reference_sketch_file_path:str
 
 @dataclass
 class ClassificationMetricArtifact:
@@ -28,6 +32,7 @@ class ClassificationMetricArtifact:
 class ModelTrainerArtifact:
     trained_model_file_path:str 
     metric_artifact:ClassificationMetricArtifact
+    reference_sketch_file_path:Optional[str] = None
 
 @dataclass
 class ModelEvaluationArtifact:
@@ -35,9 +40,13 @@ class ModelEvaluationArtifact:
     changed_accuracy:float
     s3_model_path:str 
     trained_model_path:str
+    metric_artifact:ClassificationMetricArtifact
+    reference_sketch_file_path:Optional[str] = None
 
 
 @dataclass
 class ModelPusherArtifact:
     bucket_name:str
-    s3_model_path:str
\ No newline at end of file
+    s3_model_path:str
+    model_version:str
+    is_model_uploaded:bool
\ No newline at end of file
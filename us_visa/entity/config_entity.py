@@ -1,6 +1,6 @@
 import os
 from us_visa.constants import *
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 
 TIMESTAMP: str = datetime.now().strftime("%m_%d_%Y_%H_%M_%S")
@@ -24,25 +24,75 @@ class DataIngestionConfig:
     training_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_INGESTED_DIR, TRAIN_FILE_NAME)
     testing_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_INGESTED_DIR, TEST_FILE_NAME)
     train_test_split_ratio: float = DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO
+    split_buckets: int = DATA_INGESTION_SPLIT_BUCKETS
+    split_hash_key: str = DATA_INGESTION_SPLIT_HASH_KEY
     collection_name:str = DATA_INGESTION_COLLECTION_NAME
+    export_batch_size:int = DATA_INGESTION_EXPORT_BATCH_SIZE
+    export_partitions:int = DATA_INGESTION_EXPORT_PARTITIONS
+    incremental:bool = DATA_INGESTION_INCREMENTAL
+    watermark_field:str = DATA_INGESTION_WATERMARK_FIELD
+    shape_in_database:bool = DATA_INGESTION_SHAPE_IN_DATABASE
+    data_source:str = DATA_INGESTION_SOURCE
+    source_path:str = DATA_INGESTION_SOURCE_PATH
+    source_bucket_name:str = DATA_INGESTION_SOURCE_BUCKET_NAME
+    snapshot_file_path: str = os.path.join(DATA_INGESTION_SNAPSHOT_DIR, FILE_NAME)
+    watermark_file_path: str = os.path.join(DATA_INGESTION_SNAPSHOT_DIR, DATA_INGESTION_WATERMARK_FILE_NAME)
 
 @dataclass
 class DataValidationConfig:
     data_validation_dir: str = os.path.join(training_pipeline_config.artifact_dir, DATA_VALIDATION_DIR_NAME)
     drift_report_file_path: str = os.path.join(data_validation_dir, DATA_VALIDATION_DRIFT_REPORT_DIR,
                                                DATA_VALIDATION_DRIFT_REPORT_FILE_NAME)
+    drift_p_value_threshold: float = DATA_VALIDATION_DRIFT_P_VALUE_THRESHOLD
+    categorical_drift_test: str = DATA_VALIDATION_CATEGORICAL_DRIFT_TEST
+    psi_threshold: float = DATA_VALIDATION_PSI_THRESHOLD
+    drift_share_threshold: float = DATA_VALIDATION_DRIFT_SHARE_THRESHOLD
+    drift_mode: str = DATA_VALIDATION_DRIFT_MODE
+    drift_sampling: str = DATA_VALIDATION_DRIFT_SAMPLING
+    drift_initial_sample_size: int = DATA_VALIDATION_DRIFT_INITIAL_SAMPLE_SIZE
+    drift_sample_growth: int = DATA_VALIDATION_DRIFT_SAMPLE_GROWTH
+    drift_confidence: float = DATA_VALIDATION_DRIFT_CONFIDENCE
+    drift_min_effect: float = DATA_VALIDATION_DRIFT_MIN_EFFECT
+    drift_sample_seed: int = DATA_VALIDATION_DRIFT_SAMPLE_SEED
+    schema_report_file_path: str = os.path.join(data_validation_dir, DATA_VALIDATION_SCHEMA_REPORT_FILE_NAME)
+    max_null_rate: float = DATA_VALIDATION_MAX_NULL_RATE
+    max_out_of_range_rate: float = DATA_VALIDATION_MAX_OUT_OF_RANGE_RATE
+    production_drift: bool = DATA_VALIDATION_PRODUCTION_DRIFT
+    production_drift_report_file_path: str = os.path.join(data_validation_dir, DATA_VALIDATION_DRIFT_REPORT_DIR,
+                                                          DATA_VALIDATION_PRODUCTION_DRIFT_REPORT_FILE_NAME)
+    model_bucket_name: str = MODEL_BUCKET_NAME
+    s3_model_key_path: str = MODEL_PUSHER_S3_KEY
 
 
 @dataclass
 class DataTransformationConfig:
     data_transformation_dir: str = os.path.join(training_pipeline_config.artifact_dir, DATA_TRANSFORMATION_DIR_NAME)
     transformed_train_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
-                                                    TRAIN_FILE_NAME.replace("csv", "npy"))
+                                                    os.path.splitext(TRAIN_FILE_NAME)[0] + ".npy")
     transformed_test_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
-                                                   TEST_FILE_NAME.replace("csv", "npy"))
+                                                   os.path.splitext(TEST_FILE_NAME)[0] + ".npy")
+    transformed_train_target_file_path: str = os.path.join(
+        data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+        os.path.splitext(TRAIN_FILE_NAME)[0] + DATA_TRANSFORMATION_TARGET_FILE_SUFFIX + ".npy")
+    transformed_test_target_file_path: str = os.path.join(
+        data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+        os.path.splitext(TEST_FILE_NAME)[0] + DATA_TRANSFORMATION_TARGET_FILE_SUFFIX + ".npy")
     transformed_object_file_path: str = os.path.join(data_transformation_dir,
                                                      DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR,
                                                      PREPROCSSING_OBJECT_FILE_NAME)
+    transformed_object_codec: str = ARTIFACT_COMPRESSION_CODEC
+    reference_sketch_file_path: str = os.path.join(data_transformation_dir,
+                                                   DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR,
+                                                   DATA_TRANSFORMATION_REFERENCE_SKETCH_FILE_NAME)
+    sketch_bins: int = DATA_TRANSFORMATION_SKETCH_BINS
+    sketch_quantiles: tuple = DATA_TRANSFORMATION_SKETCH_QUANTILES
+    sparse_threshold: float = DATA_TRANSFORMATION_SPARSE_THRESHOLD
+    feature_dtype: str = DATA_TRANSFORMATION_FEATURE_DTYPE
+    target_dtype: str = DATA_TRANSFORMATION_TARGET_DTYPE
+    resampling_config_file_path: str = RESAMPLING_CONFIG_FILE_PATH
+    cache_enabled: bool = DATA_TRANSFORMATION_CACHE
+    cache_dir: str = DATA_TRANSFORMATION_CACHE_DIR
+    cache_max_entries: int = DATA_TRANSFORMATION_CACHE_MAX_ENTRIES
 
 @dataclass
 class ModelTrainerConfig:
@@ -50,20 +100,40 @@ class ModelTrainerConfig:
     trained_model_file_path: str = os.path.join(model_trainer_dir, MODEL_TRAINER_TRAINED_MODEL_DIR, MODEL_FILE_NAME)
     expected_accuracy: float = MODEL_TRAINER_EXPECTED_SCORE
     model_config_file_path: str = MODEL_TRAINER_MODEL_CONFIG_FILE_PATH
+    trained_model_codec: str = ARTIFACT_COMPRESSION_CODEC
+    mmap_mode: str = MODEL_TRAINER_MMAP_MODE
+    resampling_config_file_path: str = RESAMPLING_CONFIG_FILE_PATH
 
 @dataclass
 class ModelEvaluationConfig:
     changed_threshold_score: float = MODEL_EVALUATION_CHANGED_THRESHOLD_SCORE
     bucket_name: str = MODEL_BUCKET_NAME
-    s3_model_key_path: str = MODEL_FILE_NAME   
+    s3_model_key_path: str = MODEL_PUSHER_S3_KEY
 
 @dataclass
 class ModelPusherConfig:
     bucket_name: str = MODEL_BUCKET_NAME
-    s3_model_key_path: str = MODEL_FILE_NAME
+    s3_model_key_path: str = MODEL_PUSHER_S3_KEY
+
+@dataclass
+class StorageConfig:
+    backend: str = field(default_factory=lambda: os.getenv(STORAGE_BACKEND_ENV_KEY, STORAGE_BACKEND_S3))
+    local_storage_root: str = field(default_factory=lambda: os.getenv(LOCAL_STORAGE_ROOT_ENV_KEY,
+                                                                      LOCAL_STORAGE_ROOT_DIR))
 
 @dataclass
 class USvisaPredictorConfig:
-    model_file_path: str = MODEL_FILE_NAME
+    model_file_path: str = MODEL_PUSHER_S3_KEY
     model_bucket_name: str = MODEL_BUCKET_NAME
+    model_poll_interval: float = MODEL_POLL_INTERVAL_SECONDS
+    storage_timeout: float = STORAGE_TIMEOUT_SECONDS
+    model_load_timeout: float = MODEL_LOAD_TIMEOUT_SECONDS
+    drift_window_seconds: float = DRIFT_MONITOR_WINDOW_SECONDS
+    drift_drain_seconds: float = DRIFT_MONITOR_DRAIN_SECONDS
+    drift_max_pending: int = DRIFT_MONITOR_MAX_PENDING
+    drift_min_samples: int = DRIFT_MONITOR_MIN_SAMPLES
+    drift_history_size: int = DRIFT_MONITOR_HISTORY_SIZE
+    drift_p_value_threshold: float = DATA_VALIDATION_DRIFT_P_VALUE_THRESHOLD
+    categorical_drift_test: str = DATA_VALIDATION_CATEGORICAL_DRIFT_TEST
+    psi_threshold: float = DATA_VALIDATION_PSI_THRESHOLD
 
@@ -1,13 +1,36 @@
 import sys
+from typing import Optional
 
+import scipy.sparse
 from pandas import DataFrame
 from sklearn.pipeline import Pipeline
+from sklearn.utils import get_tags
 
+from us_visa.entity.reference_sketch import ReferenceSketch
 from us_visa.exception import USvisaException
 from us_visa.logger import logging
 
 
 
+def accepts_sparse(estimator: object) -> bool:
+    """
+    True when the estimator can be fitted and predict on scipy sparse matrices, per its sklearn input tags
+    """
+    try:
+        return bool(get_tags(estimator).input_tags.sparse)
+    except Exception:
+        return False
+
+
+def to_estimator_input(estimator: object, features):
+    """
+    Returns the features as they are, densified when they are sparse and the estimator needs arrays
+    """
+    if scipy.sparse.issparse(features) and not accepts_sparse(estimator):
+        return features.toarray()
+    return features
+
+
 class TargetValueMapping:
     def __init__(self):
         self.Certified:int = 0
@@ -22,13 +45,16 @@ class TargetValueMapping:
 
 
 class USvisaModel:
-    def __init__(self, preprocessing_object: Pipeline, trained_model_object: object):
+    def __init__(self, preprocessing_object: Pipeline, trained_model_object: object,
+                 reference_sketch: Optional[ReferenceSketch] = None):
         """
         :param preprocessing_object: Input Object of preprocesser
         :param trained_model_object: Input Object of trained model 
+        :param reference_sketch: Sketch of the training features, the reference of drift checks
         """
         self.preprocessing_object = preprocessing_object
         self.trained_model_object = trained_model_object
+        self.reference_sketch = reference_sketch
 
     def predict(self, dataframe: DataFrame) -> DataFrame:
         """
@@ -41,7 +67,8 @@ class USvisaModel:
         try:
             logging.info("Using the trained model to get predictions")
 
-            transformed_feature = self.preprocessing_object.transform(dataframe)
+            transformed_feature = to_estimator_input(self.trained_model_object,
+                                                     self.preprocessing_object.transform(dataframe))
 
             logging.info("Used the trained model to get predictions")
             return self.trained_model_object.predict(transformed_feature)
@@ -0,0 +1,143 @@
+import json
+import sys
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+from us_visa.utils.main_utils import write_json_file
+
+
+@dataclass
+class NumericalSketch:
+    """
+    Histogram of a numerical column over fixed bin edges (training quantiles, the outer bins are open
+    ended so values outside the training range are still counted), with its quantiles and null rate
+    """
+    bin_edges: List[float]
+    counts: List[int]
+    quantiles: Dict[str, float]
+    minimum: float
+    maximum: float
+    null_rate: float
+    count: int
+
+    def histogram(self, values: np.ndarray) -> np.ndarray:
+        """
+        Counts the non null values in the bins of the sketch, the result is aligned with counts
+        """
+        values = values[~np.isnan(values)]
+        bins = np.searchsorted(np.asarray(self.bin_edges), values, side="right")
+        return np.bincount(bins, minlength=len(self.counts))
+
+
+@dataclass
+class CategoricalSketch:
+    """
+    Frequency table of a categorical column with its null rate
+    """
+    frequencies: Dict[str, int]
+    null_rate: float
+    count: int
+
+    def frequency_counts(self, values: pd.Series) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """
+        Counts the values over the sketch categories plus the categories unseen in training
+
+        :return: Categories, reference counts and current counts
+        """
+        current = values.dropna().astype(str).value_counts()
+        categories = list(self.frequencies) + [category for category in current.index if category not in self.frequencies]
+        reference_counts = np.array([self.frequencies.get(category, 0) for category in categories])
+        current_counts = current.reindex(categories, fill_value=0).to_numpy()
+        return categories, reference_counts, current_counts
+
+
+@dataclass
+class ReferenceSketch:
+    """
+    Compact summary of the training features, stored next to the preprocessor and inside the model,
+    so drift checks compare new data in O(bins) per column without reading the training data
+    """
+    num_rows: int
+    numerical: Dict[str, NumericalSketch]
+    categorical: Dict[str, CategoricalSketch]
+
+    @classmethod
+    def from_dataframe(cls, dataframe: DataFrame, numerical_columns: Sequence[str],
+                       categorical_columns: Sequence[str], bins: int,
+                       quantiles: Sequence[float]) -> "ReferenceSketch":
+        """
+        Method Name :   from_dataframe
+        Description :   This method sketches the numerical columns as equal frequency histograms of at most
+                        bins bins plus quantiles, and the categorical columns as frequency tables
+
+        Output      :   Returns a ReferenceSketch
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            numerical = {}
+            for column in numerical_columns:
+                values = dataframe[column].to_numpy(dtype="float64", na_value=np.nan)
+                valid = values[~np.isnan(values)]
+                if len(valid):
+                    # inner edges only, the first and last bins extend to -inf and +inf
+                    bin_edges = np.unique(np.quantile(valid, np.linspace(0, 1, bins + 1)[1:-1]))
+                    quantile_values = np.quantile(valid, quantiles)
+                    minimum, maximum = float(valid.min()), float(valid.max())
+                else:
+                    bin_edges, quantile_values, minimum, maximum = np.array([]), [np.nan] * len(quantiles), np.nan, np.nan
+                sketch = NumericalSketch(bin_edges=bin_edges.tolist(), counts=[0] * (len(bin_edges) + 1),
+                                         quantiles={str(q): float(v) for q, v in zip(quantiles, quantile_values)},
+                                         minimum=minimum, maximum=maximum,
+                                         null_rate=float(np.isnan(values).mean()) if len(values) else 0.0,
+                                         count=int(len(valid)))
+                sketch.counts = sketch.histogram(valid).tolist()
+                numerical[column] = sketch
+
+            categorical = {}
+            for column in categorical_columns:
+                series = dataframe[column]
+                frequencies = series.dropna().astype(str).value_counts()
+                categorical[column] = CategoricalSketch(
+                    frequencies={category: int(count) for category, count in frequencies.items() if count > 0},
+                    null_rate=float(series.isna().mean()) if len(series) else 0.0,
+                    count=int(frequencies.sum()))
+
+            logging.info(f"Sketched {len(numerical)} numerical and {len(categorical)} categorical columns "
+                         f"of {len(dataframe)} rows")
+            return cls(num_rows=len(dataframe), numerical=numerical, categorical=categorical)
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, content: dict) -> "ReferenceSketch":
+        return cls(num_rows=content["num_rows"],
+                   numerical={column: NumericalSketch(**sketch) for column, sketch in content["numerical"].items()},
+                   categorical={column: CategoricalSketch(**sketch)
+                                for column, sketch in content["categorical"].items()})
+
+
+def save_reference_sketch(file_path: str, sketch: ReferenceSketch) -> None:
+    """
+    Writes the sketch as JSON
+    """
+    write_json_file(file_path=file_path, content=sketch.to_dict())
+
+
+def load_reference_sketch(file_path: str) -> ReferenceSketch:
+    """
+    Reads a sketch written by save_reference_sketch
+    """
+    try:
+        with open(file_path) as file:
+            return ReferenceSketch.from_dict(json.load(file))
+    except Exception as e:
+        raise USvisaException(e, sys) from e
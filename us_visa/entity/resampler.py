@@ -0,0 +1,88 @@
+import importlib
+import sys
+from typing import Optional, Tuple
+
+import numpy as np
+from imblearn.combine import SMOTEENN
+from imblearn.over_sampling import SMOTE, RandomOverSampler
+from imblearn.under_sampling import RandomUnderSampler
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+RESAMPLING_SMOTEENN = "smoteenn"
+RESAMPLING_SMOTE = "smote"
+RESAMPLING_RANDOM_UNDER = "random_under"
+RESAMPLING_RANDOM_OVER = "random_over"
+RESAMPLING_CLASS_WEIGHT = "class_weight"
+RESAMPLING_STRATEGIES = (RESAMPLING_SMOTEENN, RESAMPLING_SMOTE, RESAMPLING_RANDOM_UNDER, RESAMPLING_RANDOM_OVER,
+                         RESAMPLING_CLASS_WEIGHT)
+
+
+class Resampler:
+    """
+    Class rebalancing of the training features configured by resampling.yaml, applied to training data only
+    """
+
+    def __init__(self, resampling_config: dict, strategy: Optional[str] = None):
+        """
+        :param resampling_config: Parsed resampling.yaml
+        :param strategy: Strategy to use instead of the one of resampling_config
+        """
+        try:
+            self.strategy = strategy or resampling_config["strategy"]
+            if self.strategy not in RESAMPLING_STRATEGIES:
+                raise ValueError(f"Unknown resampling strategy {self.strategy}, expected one of {RESAMPLING_STRATEGIES}")
+            self.params = dict(resampling_config.get("strategies", {}).get(self.strategy) or {})
+            self.random_state = resampling_config.get("random_state")
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    @property
+    def class_weight(self) -> Optional[object]:
+        """
+        class_weight for the estimators, None unless the strategy is class_weight
+        """
+        return self.params.get("class_weight", "balanced") if self.strategy == RESAMPLING_CLASS_WEIGHT else None
+
+    def get_sampler(self) -> Optional[object]:
+        """
+        imblearn sampler of the strategy, None for class_weight
+        """
+        sampling_strategy = self.params.get("sampling_strategy", "auto")
+        if self.strategy == RESAMPLING_SMOTEENN:
+            return SMOTEENN(sampling_strategy=sampling_strategy, random_state=self.random_state)
+        if self.strategy == RESAMPLING_SMOTE:
+            neighbors = self.params.get("neighbors")
+            if neighbors is not None:
+                neighbors_class = getattr(importlib.import_module(neighbors["module"]), neighbors["class"])
+                k_neighbors = neighbors_class(**(neighbors.get("params") or {}))
+            else:
+                k_neighbors = self.params.get("k_neighbors", 5)
+            return SMOTE(sampling_strategy=sampling_strategy, k_neighbors=k_neighbors, random_state=self.random_state)
+        if self.strategy == RESAMPLING_RANDOM_UNDER:
+            return RandomUnderSampler(sampling_strategy=sampling_strategy, random_state=self.random_state)
+        if self.strategy == RESAMPLING_RANDOM_OVER:
+            return RandomOverSampler(sampling_strategy=sampling_strategy, random_state=self.random_state)
+        return None
+
+    def fit_resample(self, features, target: np.ndarray) -> Tuple[object, np.ndarray]:
+        """
+        Method Name :   fit_resample
+        Description :   This method rebalances the training features and target, they are returned as they are
+                        for the class_weight strategy
+
+        Output      :   Returns the resampled features and target
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            sampler = self.get_sampler()
+            if sampler is None:
+                logging.info(f"No resampling, class_weight={self.class_weight} is passed to the estimators")
+                return features, target
+            resampled_features, resampled_target = sampler.fit_resample(features, target)
+            logging.info(f"Resampled {features.shape[0]} training rows to {resampled_features.shape[0]} "
+                         f"with {type(sampler).__name__}")
+            return resampled_features, resampled_target
+        except Exception as e:
+            raise USvisaException(e, sys) from e
@@ -1,54 +1,76 @@
-from us_visa.cloud_storage.aws_storage import SimpleStorageService
+from us_visa.cloud_storage.storage_factory import get_storage_service
+from us_visa.cloud_storage.model_registry import ModelRegistry
+from us_visa.cloud_storage.async_storage import AsyncStorageService
+from us_visa.constants import MODEL_LOAD_TIMEOUT_SECONDS, MODEL_POLL_INTERVAL_SECONDS, STORAGE_TIMEOUT_SECONDS
 from us_visa.exception import USvisaException
 from us_visa.entity.estimator import USvisaModel
+from us_visa.logger import logging
+import asyncio
 import sys
 from pandas import DataFrame
 
 
 class USvisaEstimator:
     """
-    This class is used to save and retrieve us_visas model in s3 bucket and to do prediction
+    This class is used to save and retrieve us_visas model in the model storage (s3 bucket or
+    local volume, see StorageConfig) and to do prediction
     """
 
-    def __init__(self,bucket_name,model_path,):
+    def __init__(self,bucket_name,model_path,storage=None):
         """
         :param bucket_name: Name of your model bucket
-        :param model_path: Location of your model in bucket
+        :param model_path: Key prefix of the model registry in bucket
+        :param storage: Storage backend, by default the one selected by StorageConfig
         """
         self.bucket_name = bucket_name
-        self.s3 = SimpleStorageService()
+        self.storage = storage if storage is not None else get_storage_service()
         self.model_path = model_path
+        self.registry = ModelRegistry(storage=self.storage, bucket_name=bucket_name, registry_prefix=model_path)
         self.loaded_model:USvisaModel=None
+        self.loaded_model_version=None
 
 
     def is_model_present(self,model_path):
         try:
-            return self.s3.s3_key_path_available(bucket_name=self.bucket_name, s3_key=model_path)
+            if model_path != self.registry.registry_prefix:
+                return ModelRegistry(storage=self.storage, bucket_name=self.bucket_name,
+                                     registry_prefix=model_path).get_latest() is not None
+            return self.registry.get_latest() is not None
         except USvisaException as e:
             print(e)
             return False
 
     def load_model(self,)->USvisaModel:
         """
-        Load the model from the model_path
+        Load the latest model version of the registry at model_path
         :return:
         """
+        try:
+            latest = self.registry.get_latest()
+            if latest is None:
+                raise Exception(f"No model found in registry {self.model_path} of bucket {self.bucket_name}")
+            model = self.storage.load_model(latest["key"],bucket_name=self.bucket_name,
+                                            expected_sha256=latest.get("content_hash"))
+            self.loaded_model_version = latest["version"]
+            return model
+        except Exception as e:
+            raise USvisaException(e, sys)
 
-        return self.s3.load_model(self.model_path,bucket_name=self.bucket_name)
-
-    def save_model(self,from_file,remove:bool=False)->None:
+    def save_model(self,from_file,remove:bool=False,metrics:dict=None,content_hash:str=None,
+                   reference_sketch_file:str=None)->dict:
         """
-        Save the model to the model_path
+        Save the model as a new version of the registry at model_path
         :param from_file: Your local system model path
         :param remove: By default it is false that mean you will have your model locally available in your system folder
-        :return:
+        :param metrics: Metrics of the model recorded in the registry manifest
+        :param content_hash: sha256 of from_file if it is already known
+        :param reference_sketch_file: Reference sketch of the training data, published next to the model
+        :return: manifest entry of the new version
         """
         try:
-            self.s3.upload_file(from_file,
-                                to_filename=self.model_path,
-                                bucket_name=self.bucket_name,
-                                remove=remove
-                                )
+            return self.registry.register_model(from_file, metrics=metrics, remove=remove,
+                                                content_hash=content_hash,
+                                                reference_sketch_file=reference_sketch_file)
         except Exception as e:
             raise USvisaException(e, sys)
 
@@ -63,4 +85,104 @@ class USvisaEstimator:
                 self.loaded_model = self.load_model()
             return self.loaded_model.predict(dataframe=dataframe)
         except Exception as e:
-            raise USvisaException(e, sys)
\ No newline at end of file
+            raise USvisaException(e, sys)
+
+class AsyncUSvisaEstimator:
+    """
+    This class serves a USvisaEstimator from an asyncio application. Storage calls run on the
+    AsyncStorageService thread pool, a background task polls the version token of the registry
+    manifest and swaps in a new model only when it changed, so requests never wait on the network
+    once a model is loaded
+    """
+
+    def __init__(self,usvisa_estimator:USvisaEstimator,poll_interval:float=MODEL_POLL_INTERVAL_SECONDS,
+                 timeout:float=STORAGE_TIMEOUT_SECONDS,load_timeout:float=MODEL_LOAD_TIMEOUT_SECONDS):
+        """
+        :param usvisa_estimator: Estimator whose registry is served
+        :param poll_interval: Seconds between two checks of the registry manifest
+        :param timeout: Seconds after which a storage call is abandoned
+        :param load_timeout: Seconds a refresh waits for the model download and unpickling
+        """
+        self.usvisa_estimator = usvisa_estimator
+        self.storage = AsyncStorageService(usvisa_estimator.storage, timeout=timeout)
+        self.poll_interval = poll_interval
+        self.load_timeout = load_timeout
+        self.model_token = None
+        self._load_lock = None
+        self._load_future = None
+        self._load_token = None
+        self._poll_task = None
+
+    @property
+    def loaded_model(self)->USvisaModel:
+        return self.usvisa_estimator.loaded_model
+
+    async def is_model_present(self)->bool:
+        registry = self.usvisa_estimator.registry
+        return await self.storage.get_version_token(registry.manifest_key,
+                                                    bucket_name=registry.bucket_name) is not None
+
+    async def refresh_model(self)->bool:
+        """
+        Loads the latest model if the manifest token changed since the last load. A load that outlived
+        load_timeout keeps running in its worker thread and is awaited again by the next refresh, a second
+        download never starts alongside it
+        :return: True if a new model was loaded
+        """
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        registry = self.usvisa_estimator.registry
+        async with self._load_lock:
+            token = await self.storage.get_version_token(registry.manifest_key, bucket_name=registry.bucket_name)
+            if token is None or (token == self.model_token and self.loaded_model is not None):
+                return False
+            load_future = self._load_future
+            if load_future is None or (load_future.done() and (self._load_token != token or load_future.cancelled()
+                                                                or load_future.exception() is not None)):
+                self._load_future = self.storage.submit(self.usvisa_estimator.load_model)
+                self._load_token = token
+            # shielded, a timeout abandons the wait but not the load
+            model = await asyncio.wait_for(asyncio.shield(self._load_future), timeout=self.load_timeout)
+            self._load_future = None
+            self.usvisa_estimator.loaded_model = model
+            self.model_token = self._load_token
+            logging.info(f"Loaded model version {self.usvisa_estimator.loaded_model_version}")
+            return True
+
+    async def poll_model(self)->None:
+        while True:
+            try:
+                await self.refresh_model()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.info(f"Model refresh failed, keeping the current model: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def start_polling(self)->None:
+        if self._poll_task is None or self._poll_task.done():
+            self._poll_task = asyncio.get_running_loop().create_task(self.poll_model())
+
+    async def stop_polling(self)->None:
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            try:
+                await self._poll_task
+            except asyncio.CancelledError:
+                pass
+            self._poll_task = None
+        self.storage.shutdown()
+
+    async def predict(self,dataframe:DataFrame):
+        """
+        :param dataframe:
+        :return:
+        """
+        try:
+            if self.loaded_model is None:
+                await self.refresh_model()
+            if self.loaded_model is None:
+                raise Exception("No model available in the model registry")
+            return self.loaded_model.predict(dataframe=dataframe)
+        except Exception as e:
+            raise USvisaException(e, sys)
@@ -0,0 +1,137 @@
+import sys
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from us_visa.constants import DATA_VALIDATION_MAX_NULL_RATE, DATA_VALIDATION_MAX_OUT_OF_RANGE_RATE
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+# invalid values listed per column in the report
+MAX_REPORTED_VALUES = 10
+
+
+@dataclass(frozen=True)
+class ColumnRule:
+    dtype: str
+    domain: Optional[FrozenSet[str]] = None
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    max_null_rate: float = DATA_VALIDATION_MAX_NULL_RATE
+    unique: bool = False
+
+
+class SchemaValidator:
+    """
+    Validator compiled once from schema.yaml: column types, category domains, numeric ranges,
+    null rates and id uniqueness. Every column is checked in one vectorized pass, a hash based
+    unique for categorical columns (the domain check then runs on the distinct values) and numpy
+    masks for numerical ones, so it is cheap enough to guard batch scoring as well as training.
+    """
+
+    def __init__(self, schema_config: dict, max_null_rate: float = DATA_VALIDATION_MAX_NULL_RATE,
+                 max_out_of_range_rate: float = DATA_VALIDATION_MAX_OUT_OF_RANGE_RATE):
+        """
+        :param schema_config: Parsed schema.yaml
+        :param max_null_rate: Default share of missing values allowed per column
+        :param max_out_of_range_rate: Share of numerical values allowed outside their range
+        """
+        try:
+            self.max_out_of_range_rate = max_out_of_range_rate
+            column_types = {name: dtype for column in schema_config["columns"] for name, dtype in column.items()}
+            column_types.update({name: "int" for name in schema_config.get("age_columns", {})})
+            domains = schema_config.get("domains", {})
+            ranges = schema_config.get("ranges", {})
+            max_null_rates = schema_config.get("max_null_rates") or {}
+            id_columns = schema_config.get("id_columns", [])
+            self.rules: Dict[str, ColumnRule] = {
+                name: ColumnRule(dtype=dtype,
+                                 domain=frozenset(str(value) for value in domains[name]) if name in domains else None,
+                                 minimum=ranges.get(name, {}).get("min"),
+                                 maximum=ranges.get(name, {}).get("max"),
+                                 max_null_rate=max_null_rates.get(name, max_null_rate),
+                                 unique=name in id_columns)
+                for name, dtype in column_types.items()}
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def validate_categorical(self, series: pd.Series, rule: ColumnRule) -> dict:
+        report = {"dtype_ok": not pd.api.types.is_numeric_dtype(series)}
+        if rule.domain is not None:
+            # the domain is checked on the distinct values, rows are only scanned again when some are invalid
+            invalid = [value for value in pd.unique(series) if not pd.isna(value) and str(value) not in rule.domain]
+            report["n_invalid_values"] = int(series.isin(invalid).sum()) if invalid else 0
+            report["invalid_values"] = [str(value) for value in invalid[:MAX_REPORTED_VALUES]]
+        if rule.unique:
+            report["n_duplicates"] = int(series.count() - series.nunique())
+        report["passed"] = report["dtype_ok"] and not report.get("n_invalid_values") and not report.get("n_duplicates")
+        return report
+
+    def validate_numerical(self, series: pd.Series, rule: ColumnRule) -> dict:
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            values = series.to_numpy(dtype="float64", na_value=np.nan)
+            n_unparsable = 0
+        else:
+            # text inputs (csv debug files, form posts) are parsed, values that are not numbers fail
+            values = pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+            n_unparsable = int(np.isnan(values).sum() - series.isna().sum())
+        valid = values[~np.isnan(values)]
+        report = {"n_unparsable": n_unparsable}
+        if rule.dtype == "int":
+            report["n_non_integer"] = int(np.count_nonzero(valid != np.round(valid)))
+        report["dtype_ok"] = n_unparsable == 0 and not report.get("n_non_integer")
+        out_of_range = np.zeros(len(valid), dtype=bool)
+        if rule.minimum is not None:
+            out_of_range |= valid < rule.minimum
+        if rule.maximum is not None:
+            out_of_range |= valid > rule.maximum
+        report["n_out_of_range"] = int(out_of_range.sum())
+        report["out_of_range_rate"] = report["n_out_of_range"] / len(valid) if len(valid) else 0.0
+        if len(valid):
+            report["min"], report["max"] = float(valid.min()), float(valid.max())
+        if rule.unique:
+            report["n_duplicates"] = int(len(valid) - len(np.unique(valid)))
+        report["passed"] = (report["dtype_ok"] and report["out_of_range_rate"] <= self.max_out_of_range_rate
+                            and not report.get("n_duplicates"))
+        return report
+
+    def validate(self, dataframe: DataFrame, required_columns: Optional[List[str]] = None) -> dict:
+        """
+        Method Name :   validate
+        Description :   This method checks every schema column of dataframe against its rule, columns
+                        outside the schema are ignored
+
+        :param dataframe: Data to validate
+        :param required_columns: Columns that must be present, none by default
+        Output      :   Returns the report, passed is False when a column fails or a required column is missing
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            columns = {}
+            for name, rule in self.rules.items():
+                if name not in dataframe.columns:
+                    continue
+                series = dataframe[name]
+                if rule.dtype == "category":
+                    report = self.validate_categorical(series, rule)
+                else:
+                    report = self.validate_numerical(series, rule)
+                null_rate = float(series.isna().mean()) if len(series) else 0.0
+                report["null_rate"] = null_rate
+                report["passed"] = report["passed"] and null_rate <= rule.max_null_rate
+                columns[name] = {"dtype": str(series.dtype), "expected_dtype": rule.dtype, **report}
+
+            missing_columns = [column for column in required_columns or [] if column not in dataframe.columns]
+            failed_columns = [name for name, report in columns.items() if not report["passed"]]
+            if failed_columns or missing_columns:
+                logging.info(f"Schema validation failed for columns {failed_columns}, missing columns {missing_columns}")
+            return {"passed": not failed_columns and not missing_columns,
+                    "num_rows": len(dataframe),
+                    "failed_columns": failed_columns,
+                    "missing_columns": missing_columns,
+                    "columns": columns}
+        except Exception as e:
+            raise USvisaException(e, sys) from e
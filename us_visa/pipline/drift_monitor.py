@@ -0,0 +1,243 @@
+import asyncio
+import sys
+import time
+from collections import Counter, deque
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from us_visa.constants import (DATA_VALIDATION_CATEGORICAL_DRIFT_TEST, DATA_VALIDATION_DRIFT_P_VALUE_THRESHOLD,
+                               DATA_VALIDATION_PSI_THRESHOLD, DRIFT_MONITOR_DRAIN_SECONDS, DRIFT_MONITOR_HISTORY_SIZE,
+                               DRIFT_MONITOR_MAX_PENDING, DRIFT_MONITOR_MIN_SAMPLES, DRIFT_MONITOR_WINDOW_SECONDS)
+from us_visa.entity.reference_sketch import ReferenceSketch
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+from us_visa.utils.drift import DRIFT_TEST_KS, binned_ks_test, categorical_drift, population_stability_index
+
+
+class FeatureWindow:
+    """
+    Counts of the features of one time window in the bins and categories of a reference sketch.
+    Only the drift monitor task writes into a window, so the counts need no lock.
+    """
+
+    def __init__(self, reference_sketch: ReferenceSketch):
+        """
+        :param reference_sketch: Sketch whose bins the window counts into
+        """
+        self.reference_sketch = reference_sketch
+        self.start = time.time()
+        self.num_rows = 0
+        self.numerical = {column: np.zeros(len(sketch.counts), dtype=np.int64)
+                          for column, sketch in reference_sketch.numerical.items()}
+        self.categorical = {column: Counter() for column in reference_sketch.categorical}
+        self.nulls = Counter()
+        self._bin_edges = {column: np.asarray(sketch.bin_edges) for column, sketch in reference_sketch.numerical.items()}
+
+    def observe(self, dataframe: DataFrame) -> None:
+        """
+        Adds the rows of dataframe to the counts, columns missing from the sketch are ignored
+        """
+        for column, bin_edges in self._bin_edges.items():
+            if column in dataframe.columns:
+                # form inputs arrive as strings, unparsable values are counted as nulls
+                values = pd.to_numeric(dataframe[column], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+                valid = values[~np.isnan(values)]
+                bins = np.searchsorted(bin_edges, valid, side="right")
+                self.numerical[column] += np.bincount(bins, minlength=len(self.numerical[column]))
+                self.nulls[column] += len(values) - len(valid)
+        for column in self.reference_sketch.categorical:
+            if column in dataframe.columns:
+                values = dataframe[column].dropna().astype(str)
+                self.categorical[column].update(values.value_counts().to_dict())
+                self.nulls[column] += len(dataframe) - len(values)
+        self.num_rows += len(dataframe)
+
+
+class DriftMonitor:
+    """
+    Online drift monitoring of the prediction requests. A request only appends its input frame to a
+    bounded deque (atomic, no lock on the request path). A background task drains the deque every
+    drain_seconds into the FeatureWindow of the served model's reference sketch, closes the window
+    every window_seconds and compares it with the sketch (binned KS for numerical features,
+    chi-square / PSI for categorical ones). The last history_size results are kept for the /drift
+    endpoint and the metrics.
+    """
+
+    def __init__(self, get_reference_sketch: Callable[[], Optional[ReferenceSketch]],
+                 window_seconds: float = DRIFT_MONITOR_WINDOW_SECONDS,
+                 drain_seconds: float = DRIFT_MONITOR_DRAIN_SECONDS, max_pending: int = DRIFT_MONITOR_MAX_PENDING,
+                 min_samples: int = DRIFT_MONITOR_MIN_SAMPLES, history_size: int = DRIFT_MONITOR_HISTORY_SIZE,
+                 p_value_threshold: float = DATA_VALIDATION_DRIFT_P_VALUE_THRESHOLD,
+                 categorical_drift_test: str = DATA_VALIDATION_CATEGORICAL_DRIFT_TEST,
+                 psi_threshold: float = DATA_VALIDATION_PSI_THRESHOLD):
+        """
+        :param get_reference_sketch: Returns the sketch of the served model, None while no model (or a model
+                                     trained without sketch) is loaded
+        :param window_seconds: Length of a window
+        :param drain_seconds: Seconds between two drains of the queued requests
+        :param max_pending: Maximum number of queued requests, the oldest are dropped beyond it
+        :param min_samples: Windows with fewer requests are reported without drift scores
+        :param history_size: Number of closed windows kept
+        """
+        self.get_reference_sketch = get_reference_sketch
+        self.window_seconds = window_seconds
+        self.drain_seconds = drain_seconds
+        self.min_samples = min_samples
+        self.p_value_threshold = p_value_threshold
+        self.categorical_drift_test = categorical_drift_test
+        self.psi_threshold = psi_threshold
+        self.history = deque(maxlen=history_size)
+        self._pending = deque(maxlen=max_pending)
+        self._window: Optional[FeatureWindow] = None
+        self._task = None
+
+    def observe(self, dataframe: DataFrame) -> None:
+        """
+        Queues the prediction inputs for the next drain, the frame must not be modified afterwards
+        """
+        self._pending.append(dataframe)
+
+    def drain(self) -> int:
+        """
+        Counts the queued requests into the current window, opened on the first drain after a model
+        with a sketch was loaded. Requests queued while no sketch is available are discarded.
+        return number of drained requests
+        """
+        frames = []
+        while self._pending:
+            frames.append(self._pending.popleft())
+        if self._window is None:
+            reference_sketch = self.get_reference_sketch()
+            self._window = FeatureWindow(reference_sketch) if reference_sketch is not None else None
+        if frames and self._window is not None:
+            try:
+                self._window.observe(pd.concat(frames, ignore_index=True))
+            except Exception as e:
+                logging.info(f"Drift monitor could not count {len(frames)} requests: {e}")
+        return len(frames)
+
+    def compare(self, window: FeatureWindow) -> dict:
+        """
+        Method Name :   compare
+        Description :   This method compares the counts of a closed window with its reference sketch,
+                        in O(bins) per feature. Windows with fewer than min_samples rows (idle traffic) get
+                        no feature scores, their PSI against an empty histogram would be meaningless
+
+        Output      :   Returns the drift result of the window
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            reference_sketch = window.reference_sketch
+            enough_samples = window.num_rows >= self.min_samples
+            features = {}
+            numerical = reference_sketch.numerical if enough_samples else {}
+            categorical = reference_sketch.categorical if enough_samples else {}
+
+            for column, sketch in numerical.items():
+                reference_counts, current_counts = np.asarray(sketch.counts), window.numerical[column]
+                statistic, p_value = binned_ks_test(reference_counts, current_counts)
+                features[column] = {"type": "numerical", "test": DRIFT_TEST_KS, "statistic": statistic,
+                                    "p_value": p_value,
+                                    "psi": population_stability_index(reference_counts, current_counts),
+                                    "drift_detected": p_value < self.p_value_threshold}
+
+            for column, sketch in categorical.items():
+                current = window.categorical[column]
+                categories = list(sketch.frequencies) + [category for category in current
+                                                         if category not in sketch.frequencies]
+                reference_counts = np.array([sketch.frequencies.get(category, 0) for category in categories])
+                current_counts = np.array([current.get(category, 0) for category in categories])
+                features[column] = categorical_drift(reference_counts, current_counts,
+                                                     test=self.categorical_drift_test,
+                                                     p_value_threshold=self.p_value_threshold,
+                                                     psi_threshold=self.psi_threshold)
+
+            for column, feature in features.items():
+                feature["null_rate"] = window.nulls[column] / window.num_rows if window.num_rows else 0.0
+
+            return {"window_start": window.start,
+                    "window_end": time.time(),
+                    "num_rows": window.num_rows,
+                    "enough_samples": enough_samples,
+                    "n_drifted_features": sum(feature["drift_detected"] for feature in features.values()),
+                    "features": features}
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def rotate(self) -> Optional[dict]:
+        """
+        Drains the queue, closes the current window and returns its drift result (None without window).
+        The next window counts into the bins of the model served at that time.
+        """
+        self.drain()
+        window, self._window = self._window, None
+        if window is None:
+            return None
+        result = self.compare(window)
+        self.history.append(result)
+        logging.info(f"Drift monitor window of {result['num_rows']} requests: "
+                     f"{result['n_drifted_features']}/{len(result['features'])} features drifted")
+        return result
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.drain_seconds)
+            try:
+                # counting runs off the event loop, only this task writes into the windows
+                if self._window is not None and time.time() - self._window.start >= self.window_seconds:
+                    await asyncio.to_thread(self.rotate)
+                else:
+                    await asyncio.to_thread(self.drain)
+            except Exception as e:
+                logging.info(f"Drift monitor update failed: {e}")
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_report(self) -> dict:
+        """
+        Latest window result, the earlier ones and the number of requests counted in the open window
+        """
+        window = self._window
+        return {"window_seconds": self.window_seconds,
+                "current_window": {"window_start": window.start, "num_rows": window.num_rows}
+                if window is not None else None,
+                "pending_requests": len(self._pending),
+                "latest": self.history[-1] if self.history else None,
+                "history": list(self.history)[:-1]}
+
+    def get_metrics(self) -> str:
+        """
+        Per feature drift scores of the latest window in the Prometheus text exposition format
+        """
+        window = self._window
+        latest: Optional[Dict] = self.history[-1] if self.history else None
+        lines: List[str] = ["# HELP usvisa_drift_window_requests Requests counted in the open drift window",
+                            "# TYPE usvisa_drift_window_requests gauge",
+                            f"usvisa_drift_window_requests {window.num_rows if window is not None else 0}"]
+        if latest is not None:
+            lines += ["# HELP usvisa_drift_last_window_requests Requests of the last closed drift window",
+                      "# TYPE usvisa_drift_last_window_requests gauge",
+                      f"usvisa_drift_last_window_requests {latest['num_rows']}"]
+            for metric, key, description in (("usvisa_feature_drift_statistic", "statistic", "Drift test statistic"),
+                                             ("usvisa_feature_drift_p_value", "p_value", "Drift test p-value"),
+                                             ("usvisa_feature_drift_psi", "psi", "Population stability index"),
+                                             ("usvisa_feature_drift_detected", "drift_detected", "1 if drift detected"),
+                                             ("usvisa_feature_null_rate", "null_rate", "Share of missing values")):
+                lines += [f"# HELP {metric} {description} of the last closed window", f"# TYPE {metric} gauge"]
+                lines += [f'{metric}{{feature="{column}"}} {float(feature[key])}'
+                          for column, feature in latest["features"].items()]
+        return "\n".join(lines) + "\n"
@@ -1,10 +1,15 @@
 import os
 import sys
+from typing import Optional
 
 import numpy as np
 import pandas as pd
+from us_visa.constants import SCHEMA_FILE_PATH
 from us_visa.entity.config_entity import USvisaPredictorConfig
-from us_visa.entity.s3_estimator import USvisaEstimator
+from us_visa.entity.reference_sketch import ReferenceSketch
+from us_visa.entity.s3_estimator import USvisaEstimator, AsyncUSvisaEstimator
+from us_visa.entity.schema_validator import SchemaValidator
+from us_visa.pipline.drift_monitor import DriftMonitor
 from us_visa.exception import USvisaException
 from us_visa.logger import logging
 from us_visa.utils.main_utils import read_yaml_file
@@ -86,25 +91,60 @@ class USvisaData:
         except Exception as e:
             raise USvisaException(e, sys) from e
 
+class InvalidInputError(ValueError):
+    """
+    Raised for scoring input that fails the schema.yaml checks, a client error rather than a server failure
+    """
+
+
 class USvisaClassifier:
     def __init__(self,prediction_pipeline_config: USvisaPredictorConfig = USvisaPredictorConfig(),) -> None:
         """
         :param prediction_pipeline_config: Configuration for prediction the value
         """
         try:
-            # self.schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+            self.schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+            self.schema_validator = SchemaValidator(self.schema_config)
             self.prediction_pipeline_config = prediction_pipeline_config
+            self.async_estimator: AsyncUSvisaEstimator = None
+            self.drift_monitor = DriftMonitor(get_reference_sketch=self.get_reference_sketch,
+                                              window_seconds=prediction_pipeline_config.drift_window_seconds,
+                                              drain_seconds=prediction_pipeline_config.drift_drain_seconds,
+                                              max_pending=prediction_pipeline_config.drift_max_pending,
+                                              min_samples=prediction_pipeline_config.drift_min_samples,
+                                              history_size=prediction_pipeline_config.drift_history_size,
+                                              p_value_threshold=prediction_pipeline_config.drift_p_value_threshold,
+                                              categorical_drift_test=prediction_pipeline_config.categorical_drift_test,
+                                              psi_threshold=prediction_pipeline_config.psi_threshold)
         except Exception as e:
             raise USvisaException(e, sys)
 
 
+    def validate_input(self, dataframe: DataFrame) -> None:
+        """
+        Checks a scoring batch against schema.yaml (types, category domains, ranges, null rates) and
+        raises with the failing columns instead of letting the preprocessor fail on them
+        """
+        input_columns = []
+        for key in ("oh_columns", "or_columns", "num_features"):
+            input_columns += [column for column in self.schema_config[key] if column not in input_columns]
+        report = self.schema_validator.validate(dataframe, required_columns=input_columns)
+        if not report["passed"]:
+            failures = {column: {key: value for key, value in report["columns"][column].items()
+                                 if key in ("invalid_values", "n_unparsable", "n_non_integer", "n_out_of_range",
+                                            "null_rate")}
+                        for column in report["failed_columns"]}
+            raise InvalidInputError(f"Invalid scoring input, missing columns {report['missing_columns']}, "
+                            f"failed columns {failures}")
+
     def predict(self, dataframe) -> str:
         """
-        This is the method of USvisaClassifier
+        This is the method of USvisaClassifier, the batch is validated against the schema first
         Returns: Prediction in string format
         """
         try:
             logging.info("Entered predict method of USvisaClassifier class")
+            self.validate_input(dataframe)
             model = USvisaEstimator(
                 bucket_name=self.prediction_pipeline_config.model_bucket_name,
                 model_path=self.prediction_pipeline_config.model_file_path,
@@ -114,4 +154,66 @@ class USvisaClassifier:
             return result
         
         except Exception as e:
-            raise USvisaException(e, sys)
\ No newline at end of file
+            raise USvisaException(e, sys)
+
+    def get_async_estimator(self) -> AsyncUSvisaEstimator:
+        """
+        Returns the estimator shared by all requests of the serving process, created on first use
+        """
+        if self.async_estimator is None:
+            usvisa_estimator = USvisaEstimator(
+                bucket_name=self.prediction_pipeline_config.model_bucket_name,
+                model_path=self.prediction_pipeline_config.model_file_path,
+            )
+            self.async_estimator = AsyncUSvisaEstimator(
+                usvisa_estimator=usvisa_estimator,
+                poll_interval=self.prediction_pipeline_config.model_poll_interval,
+                timeout=self.prediction_pipeline_config.storage_timeout,
+                load_timeout=self.prediction_pipeline_config.model_load_timeout,
+            )
+        return self.async_estimator
+
+    def get_reference_sketch(self) -> Optional[ReferenceSketch]:
+        """
+        Returns the reference sketch of the served model, None before a model is loaded or for
+        models trained without sketch
+        """
+        if self.async_estimator is None or self.async_estimator.loaded_model is None:
+            return None
+        return getattr(self.async_estimator.loaded_model, "reference_sketch", None)
+
+    async def start(self) -> None:
+        """
+        Starts polling the model registry and the drift monitor in the background of the running event loop
+        """
+        try:
+            self.get_async_estimator().start_polling()
+            self.drift_monitor.start()
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    async def stop(self) -> None:
+        try:
+            await self.drift_monitor.stop()
+            if self.async_estimator is not None:
+                await self.async_estimator.stop_polling()
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    async def predict_async(self, dataframe) -> str:
+        """
+        This is the asyncio variant of predict, the model is loaded once and reloaded in the
+        background when a new version is pushed. The request is validated against the schema first,
+        invalid input raises InvalidInputError unwrapped
+        Returns: Prediction in string format
+        """
+        try:
+            logging.info("Entered predict_async method of USvisaClassifier class")
+            self.validate_input(dataframe)
+            prediction = await self.get_async_estimator().predict(dataframe)
+            self.drift_monitor.observe(dataframe)
+            return prediction
+        except InvalidInputError:
+            raise
+        except Exception as e:
+            raise USvisaException(e, sys)
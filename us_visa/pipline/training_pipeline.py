@@ -31,6 +31,7 @@ from us_visa.entity.artifact_entity import  (DataIngestionArtifact,
                                              ModelTrainerArtifact,
                                              ModelEvaluationArtifact,
                                              ModelPusherArtifact)
+from us_visa.utils.artifact_store import ArtifactStore
 
 
 
@@ -54,6 +55,9 @@ class TrainPipeline:
 
         self.model_pusher_config = ModelPusherConfig()
 
+        # Stage outputs are handed over in memory and written to the artifact folder in the background
+        self.artifact_store = ArtifactStore()
+
         
 
     
@@ -67,7 +71,8 @@ class TrainPipeline:
             logging.info("Getting the data from MongoDB")
             
             # Create an instance of the DataIngestion class and initiate data ingestion
-            data_ingestion = DataIngestion(data_ingestion_config=self.data_ingestion_config)
+            data_ingestion = DataIngestion(data_ingestion_config=self.data_ingestion_config,
+                                           artifact_store=self.artifact_store)
             data_ingestion_artifact = data_ingestion.initiate_data_ingestion()
             
             logging.info("Got the train_set and test_set from MongoDB")
@@ -86,7 +91,8 @@ class TrainPipeline:
 
         try:
             data_validation = DataValidation(data_ingestion_artifact=data_ingestion_artifact,
-                                             data_validation_config=self.data_validation_config
+                                             data_validation_config=self.data_validation_config,
+                                             artifact_store=self.artifact_store
                                              )
 
             data_validation_artifact = data_validation.initiate_data_validation()
@@ -109,7 +115,8 @@ class TrainPipeline:
         try:
             data_transformation = DataTransformation(data_ingestion_artifact=data_ingestion_artifact,
                                                      data_transformation_config=self.data_transformation_config,
-                                                     data_validation_artifact=data_validation_artifact)
+                                                     data_validation_artifact=data_validation_artifact,
+                                                     artifact_store=self.artifact_store)
             data_transformation_artifact = data_transformation.initiate_data_transformation()
             return data_transformation_artifact
         except Exception as e:
@@ -121,7 +128,8 @@ class TrainPipeline:
         """
         try:
             model_trainer = ModelTrainer(data_transformation_artifact=data_transformation_artifact,
-                                         model_trainer_config=self.model_trainer_config
+                                         model_trainer_config=self.model_trainer_config,
+                                         artifact_store=self.artifact_store
                                          )
             model_trainer_artifact = model_trainer.initiate_model_trainer()
             return model_trainer_artifact
@@ -137,7 +145,8 @@ class TrainPipeline:
         try:
             model_evaluation = ModelEvaluation(model_eval_config=self.model_evaluation_config,
                                                data_ingestion_artifact=data_ingestion_artifact,
-                                               model_trainer_artifact=model_trainer_artifact)
+                                               model_trainer_artifact=model_trainer_artifact,
+                                               artifact_store=self.artifact_store)
             model_evaluation_artifact = model_evaluation.initiate_model_evaluation()
             return model_evaluation_artifact
         except Exception as e:
@@ -149,7 +158,8 @@ class TrainPipeline:
         """
         try:
             model_pusher = ModelPusher(model_evaluation_artifact=model_evaluation_artifact,
-                                       model_pusher_config=self.model_pusher_config
+                                       model_pusher_config=self.model_pusher_config,
+                                       artifact_store=self.artifact_store
                                        )
             model_pusher_artifact = model_pusher.initiate_model_pusher()
             return model_pusher_artifact
@@ -166,6 +176,7 @@ class TrainPipeline:
         - Model Training
         - Model Evaluation
         - Model Pushing (if the model is accepted)
+        The artifacts still being written in the background are flushed before returning.
         """
         try:
             # Step 1: Data Ingestion
@@ -179,7 +190,14 @@ class TrainPipeline:
             
             if not model_evaluation_artifact.is_model_accepted:
                 logging.info(f"Model not accepted.")
+                self.artifact_store.flush()
                 return None
             model_pusher_artifact = self.start_model_pusher(model_evaluation_artifact=model_evaluation_artifact)
+            self.artifact_store.flush()
         except Exception as e:
+            # a failed background write must not replace the exception of the failed stage
+            try:
+                self.artifact_store.flush()
+            except Exception as flush_error:
+                logging.info(f"Could not flush the artifacts after the pipeline failure: {flush_error}")
             raise USvisaException(e, sys)  # Handling any exceptions that occur in the pipeline
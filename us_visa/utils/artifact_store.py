@@ -0,0 +1,94 @@
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from us_visa.constants import ARTIFACT_STORE_MAX_WORKERS
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+class ArtifactStore:
+    """
+    Hands stage outputs to the next stages in memory while they are written to disk in the background.
+
+    Artifacts are keyed by the file path recorded in the stage artifact, so the artifact dataclasses
+    stay the same and a stage running in a fresh process (resume) simply loads the file. Objects put
+    into the store are shared with the background writer and the consumers, they must not be
+    modified in place after put.
+    """
+
+    def __init__(self, background: bool = True, max_workers: int = ARTIFACT_STORE_MAX_WORKERS):
+        """
+        :param background: Persist on a thread pool, False writes synchronously inside put
+        :param max_workers: Number of concurrent background writes
+        """
+        self._objects: Dict[str, object] = {}
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="artifact-store") \
+            if background else None
+
+    def put(self, file_path: str, obj: object, persist: Callable[[str, object], object]) -> None:
+        """
+        Publishes obj for the following stages and schedules persist(file_path, obj)
+
+        :param file_path: Artifact file path, the key of obj
+        :param obj: Artifact object
+        :param persist: Function writing obj to file_path, e.g. save_object or save_numpy_array_data
+        """
+        try:
+            with self._lock:
+                self._objects[file_path] = obj
+            if self._executor is None:
+                persist(file_path, obj)
+                return
+            future = self._executor.submit(persist, file_path, obj)
+            with self._lock:
+                self._pending[file_path] = future
+            logging.info(f"Scheduled background write of artifact: {file_path}")
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def get(self, file_path: str, load: Callable[[str], object]) -> object:
+        """
+        Returns the in-memory artifact published under file_path, or load(file_path) when it was
+        produced by another process. Loaded objects are not cached, load may prune columns.
+
+        :param file_path: Artifact file path
+        :param load: Function reading the artifact file, e.g. load_object or load_numpy_array_data
+        """
+        try:
+            with self._lock:
+                if file_path in self._objects:
+                    logging.info(f"Using in-memory artifact: {file_path}")
+                    return self._objects[file_path]
+            return load(file_path)
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def wait(self, file_path: Optional[str] = None) -> None:
+        """
+        Blocks until the artifact file_path (every artifact when None) is written to disk,
+        re-raises the first failed write
+        """
+        try:
+            with self._lock:
+                pending = {path: future for path, future in self._pending.items()
+                           if file_path is None or path == file_path}
+            for path, future in pending.items():
+                future.result()
+                with self._lock:
+                    self._pending.pop(path, None)
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def flush(self) -> None:
+        """
+        Waits for the pending writes and releases the in-memory artifacts, later gets read the files
+        """
+        try:
+            self.wait()
+        finally:
+            with self._lock:
+                self._objects.clear()
@@ -0,0 +1,83 @@
+import gzip
+import sys
+from typing import BinaryIO, Optional
+
+from us_visa.exception import USvisaException
+
+CODEC_GZIP = "gzip"
+CODEC_ZSTD = "zstd"
+CODEC_LZ4 = "lz4"
+SUPPORTED_CODECS = (CODEC_GZIP, CODEC_ZSTD, CODEC_LZ4)
+
+# frame magic numbers, an uncompressed pickle starts with the PROTO opcode 0x80 instead
+_CODEC_MAGIC = {
+    CODEC_GZIP: b"\x1f\x8b",
+    CODEC_ZSTD: b"\x28\xb5\x2f\xfd",
+    CODEC_LZ4: b"\x04\x22\x4d\x18",
+}
+
+
+def detect_codec(header: bytes) -> Optional[str]:
+    """
+    Returns the codec of a compressed stream from its first bytes, None for an uncompressed stream.
+
+    :param header: At least the first 4 bytes of the stream
+    :return: Codec name or None
+    """
+    for codec, magic in _CODEC_MAGIC.items():
+        if header.startswith(magic):
+            return codec
+    return None
+
+
+def open_compressed_writer(file_obj: BinaryIO, codec: Optional[str], level: Optional[int] = None) -> BinaryIO:
+    """
+    Wraps a binary file object so everything written to it is compressed with codec.
+    Closing the returned object flushes the last frame but leaves file_obj open.
+    zstandard and lz4 are optional dependencies and only imported when their codec is used.
+
+    :param file_obj: Destination binary file object
+    :param codec: One of SUPPORTED_CODECS, None writes uncompressed
+    :param level: Compression level of the codec, its default when None
+    :return: Writable binary file object
+    """
+    try:
+        if codec is None:
+            return file_obj
+        if codec == CODEC_GZIP:
+            return gzip.GzipFile(fileobj=file_obj, mode="wb", compresslevel=6 if level is None else level, mtime=0)
+        if codec == CODEC_ZSTD:
+            import zstandard
+            compressor = zstandard.ZstdCompressor(level=3 if level is None else level, threads=-1)
+            return compressor.stream_writer(file_obj, closefd=False)
+        if codec == CODEC_LZ4:
+            import lz4.frame
+            return lz4.frame.LZ4FrameFile(file_obj, mode="wb", compression_level=0 if level is None else level)
+        raise Exception(f"Unsupported compression codec: {codec}, expected one of {SUPPORTED_CODECS}")
+    except Exception as e:
+        raise USvisaException(e, sys) from e
+
+
+def open_decompressed_reader(file_obj: BinaryIO, codec: Optional[str]) -> BinaryIO:
+    """
+    Wraps a binary file object so reading from it returns the decompressed stream, data is
+    decompressed chunk by chunk as the consumer (e.g. pickle.load) reads it.
+
+    :param file_obj: Source binary file object
+    :param codec: One of SUPPORTED_CODECS, None reads the stream as is
+    :return: Readable binary file object
+    """
+    try:
+        if codec is None:
+            return file_obj
+        if codec == CODEC_GZIP:
+            return gzip.GzipFile(fileobj=file_obj, mode="rb")
+        if codec == CODEC_ZSTD:
+            import zstandard
+            return zstandard.ZstdDecompressor().stream_reader(file_obj, read_across_frames=True, closefd=False)
+        if codec == CODEC_LZ4:
+            import lz4.frame
+            return lz4.frame.LZ4FrameFile(file_obj, mode="rb")
+        raise Exception(f"Unsupported compression codec: {codec}, expected one of {SUPPORTED_CODECS}")
+    except Exception as e:
+        raise USvisaException(e, sys) from e
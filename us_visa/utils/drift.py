@@ -0,0 +1,94 @@
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+DRIFT_TEST_KS = "ks"
+DRIFT_TEST_CHI2 = "chi2"
+DRIFT_TEST_PSI = "psi"
+DRIFT_TEST_TV = "tv"
+
+# floor of the bin shares in PSI, an empty bin would make the log ratio infinite
+PSI_EPSILON = 1e-4
+
+
+def ks_2samp_test(reference: np.ndarray, current: np.ndarray) -> Tuple[float, float]:
+    """
+    Two sample Kolmogorov-Smirnov test of two numeric samples, nulls (NaN) are ignored.
+    Both empirical CDFs are evaluated on the pooled values with searchsorted, O(n log n).
+
+    :return: KS statistic and its asymptotic two sided p-value
+    """
+    reference = np.sort(reference[~np.isnan(reference)])
+    current = np.sort(current[~np.isnan(current)])
+    if len(reference) == 0 or len(current) == 0:
+        return 0.0, 1.0
+    pooled = np.concatenate([reference, current])
+    cdf_reference = np.searchsorted(reference, pooled, side="right") / len(reference)
+    cdf_current = np.searchsorted(current, pooled, side="right") / len(current)
+    statistic = float(np.max(np.abs(cdf_reference - cdf_current)))
+    effective_size = len(reference) * len(current) / (len(reference) + len(current))
+    return statistic, float(stats.kstwo.sf(statistic, np.round(effective_size)))
+
+
+def binned_ks_test(reference_counts: np.ndarray, current_counts: np.ndarray) -> Tuple[float, float]:
+    """
+    Kolmogorov-Smirnov test of two histograms over the same bins, O(bins). The statistic is the largest
+    CDF gap at the bin edges, a lower bound of the exact statistic of the underlying samples
+
+    :return: KS statistic and its asymptotic two sided p-value
+    """
+    reference_size, current_size = reference_counts.sum(), current_counts.sum()
+    if reference_size == 0 or current_size == 0:
+        return 0.0, 1.0
+    statistic = float(np.max(np.abs(np.cumsum(reference_counts) / reference_size -
+                                    np.cumsum(current_counts) / current_size)))
+    effective_size = reference_size * current_size / (reference_size + current_size)
+    return statistic, float(stats.kstwo.sf(statistic, np.round(effective_size)))
+
+
+def get_category_counts(reference: pd.Series, current: pd.Series) -> Tuple[List, np.ndarray, np.ndarray]:
+    """
+    Counts the categories of two samples over the union of their categories, nulls are ignored
+    and categories absent from both samples (unused categorical levels) are dropped.
+
+    :return: Categories, reference counts and current counts
+    """
+    counts = pd.DataFrame({"reference": reference.value_counts(), "current": current.value_counts()}).fillna(0)
+    counts = counts[(counts["reference"] > 0) | (counts["current"] > 0)]
+    return counts.index.tolist(), counts["reference"].to_numpy(), counts["current"].to_numpy()
+
+
+def chi2_test(reference_counts: np.ndarray, current_counts: np.ndarray) -> Tuple[float, float]:
+    """
+    Chi-square test of homogeneity of two category count vectors
+
+    :return: Chi-square statistic and p-value
+    """
+    if len(reference_counts) < 2 or reference_counts.sum() == 0 or current_counts.sum() == 0:
+        return 0.0, 1.0
+    result = stats.chi2_contingency(np.vstack([reference_counts, current_counts]))
+    return float(result.statistic), float(result.pvalue)
+
+
+def population_stability_index(reference_counts: np.ndarray, current_counts: np.ndarray) -> float:
+    """
+    Population stability index of the current bin (category) counts against the reference ones,
+    below 0.1 is usually read as stable and above 0.2 as a significant shift
+    """
+    reference_share = np.clip(reference_counts / max(reference_counts.sum(), 1), PSI_EPSILON, None)
+    current_share = np.clip(current_counts / max(current_counts.sum(), 1), PSI_EPSILON, None)
+    return float(np.sum((current_share - reference_share) * np.log(current_share / reference_share)))
+
+
+def categorical_drift(reference_counts: np.ndarray, current_counts: np.ndarray, test: str,
+                      p_value_threshold: float, psi_threshold: float) -> dict:
+    """
+    Chi-square test and PSI of two aligned category count vectors, drift is decided by test (chi2 or psi)
+    """
+    statistic, p_value = chi2_test(reference_counts, current_counts)
+    psi = population_stability_index(reference_counts, current_counts)
+    drift_detected = psi > psi_threshold if test == DRIFT_TEST_PSI else p_value < p_value_threshold
+    return {"type": "categorical", "test": test, "statistic": statistic, "p_value": p_value, "psi": psi,
+            "drift_detected": drift_detected}
@@ -1,13 +1,20 @@
+import hashlib
+import json
 import os
+import shutil
 import sys
+from typing import Optional
 
 import numpy as np
+import scipy.sparse
 import dill  # Used for serializing and deserializing Python objects
 import yaml  # For reading and writing YAML files
 from pandas import DataFrame  # For handling pandas DataFrame operations
 
+from us_visa.constants import CURRENT_YEAR
 from us_visa.exception import USvisaException  # Custom exception class for handling errors
 from us_visa.logger import logging  # Custom logging for tracking information
+from us_visa.utils.compression import detect_codec, open_compressed_writer, open_decompressed_reader
 
 
 # Function to read data from a YAML file and return it as a dictionary
@@ -53,6 +60,25 @@ def write_yaml_file(file_path: str, content: object, replace: bool = False) -> N
         raise USvisaException(e, sys) from e
 
 
+# Function to write content to a JSON file
+def write_json_file(file_path: str, content: object) -> None:
+    """
+    Writes content to a JSON file.
+    
+    :param file_path: Path to save the JSON file
+    :param content: The content to write into the JSON file
+    """
+    try:
+        # Create directories if they do not exist
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        with open(file_path, "w") as file:
+            json.dump(content, file, indent=2)
+    except Exception as e:
+        # Raise a custom exception if an error occurs
+        raise USvisaException(e, sys) from e
+
+
 # Function to load a serialized object using dill
 def load_object(file_path: str) -> object:
     logging.info("Entered the load_object method of utils")  # Log entry into method
@@ -60,7 +86,11 @@ def load_object(file_path: str) -> object:
     try:
         # Open the file in binary mode and load the serialized object
         with open(file_path, "rb") as file_obj:
-            obj = dill.load(file_obj)  # Use dill to deserialize the object
+            # Compressed artifacts are recognised by their frame header and decompressed while dill reads
+            codec = detect_codec(file_obj.read(4))
+            file_obj.seek(0)
+            with open_decompressed_reader(file_obj, codec) as reader:
+                obj = dill.load(reader)  # Use dill to deserialize the object
 
         logging.info("Exited the load_object method of utils")  # Log exit from method
 
@@ -92,14 +122,18 @@ def save_numpy_array_data(file_path: str, array: np.array):
 
 
 # Function to load a numpy array from a file
-def load_numpy_array_data(file_path: str) -> np.array:
+def load_numpy_array_data(file_path: str, mmap_mode: Optional[str] = None) -> np.array:
     """
     Load numpy array data from a file.
     
     :param file_path: Path to the file containing the numpy array
+    :param mmap_mode: Memory-map the file instead of reading it ('r' for read-only), see numpy.load
     :return: Loaded numpy array data
     """
     try:
+        if mmap_mode is not None:
+            # the pages are read on access and shared with every process mapping the file
+            return np.load(file_path, mmap_mode=mmap_mode)
         # Open the file in binary read mode and load the numpy array
         with open(file_path, 'rb') as file_obj:
             return np.load(file_obj)
@@ -108,8 +142,57 @@ def load_numpy_array_data(file_path: str) -> np.array:
         raise USvisaException(e, sys) from e
 
 
+# Function to get the file path of a feature matrix for its format, .npz for sparse matrices and .npy for arrays
+def get_feature_matrix_file_path(file_path: str, sparse: bool) -> str:
+    return os.path.splitext(file_path)[0] + (".npz" if sparse else ".npy")
+
+
+# Function to save a feature matrix, sparse matrices with scipy.sparse.save_npz and arrays with numpy
+def save_feature_matrix(file_path: str, matrix) -> None:
+    """
+    Save a scipy sparse matrix (.npz file_path) or a numpy array (.npy file_path).
+
+    :param file_path: The path where the matrix will be saved, see get_feature_matrix_file_path
+    :param matrix: The sparse matrix or numpy array to save
+    """
+    try:
+        if not scipy.sparse.issparse(matrix):
+            save_numpy_array_data(file_path, matrix)
+            return
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'wb') as file_obj:
+            scipy.sparse.save_npz(file_obj, matrix.tocsr())
+    except Exception as e:
+        raise USvisaException(e, sys) from e
+
+
+# Function to load a feature matrix saved by save_feature_matrix
+def load_feature_matrix(file_path: str, mmap_mode: Optional[str] = None):
+    """
+    Load a feature matrix, a CSR matrix from a .npz file and a numpy array otherwise.
+
+    :param file_path: Path to the file containing the matrix
+    :param mmap_mode: Memory-map numpy arrays, sparse matrices are always read into memory
+    :return: Loaded sparse matrix or numpy array
+    """
+    try:
+        if os.path.splitext(file_path)[1] != ".npz":
+            return load_numpy_array_data(file_path, mmap_mode=mmap_mode)
+        with open(file_path, 'rb') as file_obj:
+            return scipy.sparse.load_npz(file_obj).tocsr()
+    except Exception as e:
+        raise USvisaException(e, sys) from e
+
+
 # Function to save a Python object using dill
-def save_object(file_path: str, obj: object) -> None:
+def save_object(file_path: str, obj: object, codec: Optional[str] = None) -> None:
+    """
+    Saves a Python object using dill, optionally compressed.
+    
+    :param file_path: Path where the object will be saved
+    :param obj: The object to save
+    :param codec: Compression codec (gzip, zstd, lz4), None writes an uncompressed dill stream
+    """
     logging.info("Entered the save_object method of utils")  # Log entry into method
 
     try:
@@ -118,7 +201,11 @@ def save_object(file_path: str, obj: object) -> None:
 
         # Open the file in binary write mode and save the object using dill
         with open(file_path, "wb") as file_obj:
-            dill.dump(obj, file_obj)
+            if codec is None:
+                dill.dump(obj, file_obj)
+            else:
+                with open_compressed_writer(file_obj, codec) as writer:
+                    dill.dump(obj, writer)
 
         logging.info("Exited the save_object method of utils")  # Log exit from method
     except Exception as e:
@@ -139,7 +226,7 @@ def drop_columns(df: DataFrame, cols: list) -> DataFrame:
 
     try:
         # Drop the specified columns from the DataFrame
-        df = df.drop(columns=cols, axis=1)
+        df = df.drop(columns=cols)
 
         logging.info("Exited the drop_columns method of utils")  # Log exit from method
 
@@ -147,3 +234,62 @@ def drop_columns(df: DataFrame, cols: list) -> DataFrame:
     except Exception as e:
         # Raise a custom exception if an error occurs
         raise USvisaException(e, sys) from e
+
+
+# Function to derive age columns (CURRENT_YEAR - year column) missing from a pandas DataFrame
+def add_age_columns(df: DataFrame, age_columns: dict, current_year: int = CURRENT_YEAR) -> DataFrame:
+    """
+    Adds every age column of schema.yaml age_columns that is not in the DataFrame yet.
+    
+    :param df: The pandas DataFrame to modify
+    :param age_columns: Mapping of age column name to the year column it is derived from
+    :param current_year: Reference year of the ages
+    :return: DataFrame with the age columns
+    """
+    try:
+        for age_column, year_column in age_columns.items():
+            if age_column not in df.columns:
+                df[age_column] = current_year - df[year_column]
+        return df
+    except Exception as e:
+        # Raise a custom exception if an error occurs
+        raise USvisaException(e, sys) from e
+
+
+# Function to compute the content hash of a file without loading it into memory
+def get_file_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Computes the sha256 hash of a file by streaming it in chunks.
+    
+    :param file_path: Path to the file
+    :param chunk_size: Number of bytes read per chunk
+    :return: Hex digest of the file content
+    """
+    try:
+        file_hash = hashlib.sha256()
+        with open(file_path, "rb") as file_obj:
+            for chunk in iter(lambda: file_obj.read(chunk_size), b""):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+    except Exception as e:
+        # Raise a custom exception if an error occurs
+        raise USvisaException(e, sys) from e
+
+
+# Function to copy a file to a new path, the copy is renamed into place so readers never see a partial file
+def copy_file(source_path: str, destination_path: str) -> None:
+    """
+    Copies source_path to destination_path. The artifact writers rewrite their files in place, so the copy must
+    not share its content with the source (a hard link would).
+    
+    :param source_path: Existing file
+    :param destination_path: Path of the copy, replaced when it exists
+    """
+    try:
+        os.makedirs(os.path.dirname(destination_path) or ".", exist_ok=True)
+        tmp_path = f"{destination_path}.tmp-{os.getpid()}"
+        shutil.copy2(source_path, tmp_path)
+        os.replace(tmp_path, destination_path)
+    except Exception as e:
+        # Raise a custom exception if an error occurs
+        raise USvisaException(e, sys) from e